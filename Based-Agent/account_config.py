@@ -0,0 +1,119 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+
+class AccountConfigCache:
+    """Per-symbol cache of account configuration: leverage, margin type and
+    position mode.
+
+    Filled lazily as the trader changes settings, or in bulk from a position
+    risk snapshot. A symbol is invalidated whenever a request that depends on
+    its configuration fails, so the next call goes back to the exchange.
+    """
+
+    def __init__(self):
+        self._leverage: Dict[str, int] = {}
+        self._margin_type: Dict[str, str] = {}
+        self._position_mode: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get_leverage(self, symbol: str) -> Optional[int]:
+        return self._leverage.get(symbol)
+
+    def get_margin_type(self, symbol: str) -> Optional[str]:
+        return self._margin_type.get(symbol)
+
+    def get_position_mode(self, symbol: str) -> Optional[str]:
+        """'HEDGE' or 'ONE_WAY', if known"""
+        return self._position_mode.get(symbol)
+
+    def set_leverage(self, symbol: str, leverage: int) -> None:
+        with self._lock:
+            self._leverage[symbol] = int(leverage)
+
+    def set_margin_type(self, symbol: str, margin_type: str) -> None:
+        with self._lock:
+            self._margin_type[symbol] = margin_type.upper()
+
+    def set_position_mode(self, symbol: str, position_mode: str) -> None:
+        with self._lock:
+            self._position_mode[symbol] = position_mode.upper()
+
+    def needs_leverage(self, symbol: str, leverage: int) -> bool:
+        """Check whether the exchange must be told about this leverage"""
+        return self._leverage.get(symbol) != int(leverage)
+
+    def needs_margin_type(self, symbol: str, margin_type: str) -> bool:
+        """Check whether the exchange must be told about this margin type"""
+        return self._margin_type.get(symbol) != margin_type.upper()
+
+    def needs_position_mode(self, symbol: str, position_mode: str) -> bool:
+        """Check whether the exchange must be told about this position mode"""
+        return self._position_mode.get(symbol) != position_mode.upper()
+
+    def position_side(self,
+                      symbol: str,
+                      side: str,
+                      position_side: Optional[str] = None,
+                      reduce_only: bool = False) -> Optional[str]:
+        """positionSide to send with an order in the symbol's position mode
+
+        Hedge mode needs LONG or SHORT. When the caller gave none it is
+        taken from the order side: a BUY opens a LONG, while a reduce-only
+        BUY closes a SHORT (and SELL the other way round). One-way mode only
+        accepts BOTH. While the mode is unknown, position_side is passed
+        through unchanged.
+        """
+        mode = self._position_mode.get(symbol)
+        if mode == 'HEDGE':
+            if position_side:
+                return position_side
+            return 'LONG' if (side == 'BUY') != reduce_only else 'SHORT'
+        if mode == 'ONE_WAY':
+            return 'BOTH'
+        return position_side
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """Forget a symbol's configuration, or everything if symbol is None"""
+        with self._lock:
+            if symbol is None:
+                self._leverage.clear()
+                self._margin_type.clear()
+                self._position_mode.clear()
+            else:
+                self._leverage.pop(symbol, None)
+                self._margin_type.pop(symbol, None)
+                self._position_mode.pop(symbol, None)
+
+    def load_positions(self,
+                       positions: Union[List[Dict[str, Any]], Dict[str, Any]],
+                       symbols: Optional[Iterable[str]] = None) -> int:
+        """Populate the cache from a /api/v3/positionRisk response
+
+        Args:
+            positions: Position risk rows (a list, or a dict wrapping one in 'data')
+            symbols: Only load these symbols (default: all rows)
+
+        Returns:
+            Number of symbols loaded
+        """
+        if isinstance(positions, dict):
+            positions = positions.get('data') or []
+        wanted = set(symbols) if symbols is not None else None
+
+        loaded = set()
+        with self._lock:
+            for row in positions:
+                symbol = row.get('symbol')
+                if not symbol or (wanted is not None and symbol not in wanted):
+                    continue
+                if row.get('leverage') is not None:
+                    self._leverage[symbol] = int(float(row['leverage']))
+                if row.get('marginType'):
+                    self._margin_type[symbol] = row['marginType'].upper()
+                if row.get('positionSide'):
+                    # Hedge-mode accounts report separate LONG/SHORT rows
+                    one_way = row['positionSide'] == 'BOTH'
+                    self._position_mode[symbol] = 'ONE_WAY' if one_way else 'HEDGE'
+                loaded.add(symbol)
+        return len(loaded)
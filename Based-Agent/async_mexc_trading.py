@@ -0,0 +1,692 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import aiohttp
+
+from mexc_trading import (
+    CLOSING_ORDER_TYPES,
+    BaseMEXCTrader,
+    BracketOrderError,
+    OrderStateUnknownError,
+    calculate_bracket_prices,
+    realised_pnl_percent,
+)
+from price_book import PriceBook
+from rate_limiter import RequestScheduler
+from risk_manager import RiskManager
+from stop_engine import STOP_LOSS, TAKE_PROFIT, StopEvent
+from trade_journal import TradeJournal
+
+
+class AsyncMEXCTrader(BaseMEXCTrader):
+    """asyncio counterpart of MEXCTrader.
+
+    Every request goes through a pooled aiohttp session, so awaiting an order
+    or a price lookup never blocks the event loop.
+    """
+
+    def __init__(self,
+                 api_key: str,
+                 api_secret: str,
+                 testnet: bool = False,
+                 pool_size: int = 10,
+                 timeout: Union[float, Tuple[float, float]] = 10.0,
+                 base_url: Optional[str] = None,
+                 scheduler: Optional[RequestScheduler] = None,
+                 max_retries: int = 3,
+                 retry_backoff: float = 0.2):
+        """
+        Args:
+            api_key: MEXC API key
+            api_secret: MEXC API secret
+            testnet: Use the MEXC test endpoint
+            pool_size: Maximum number of keep-alive connections kept per host
+            timeout: Request timeout in seconds, or a (connect, read) tuple
+            base_url: Override the exchange URL, e.g. for a local stand-in
+            scheduler: Rate limiter shared by all requests (default: MEXC limits)
+            max_retries: Retries for orders failing with a network error,
+                429 or 5xx (see MEXCTrader._submit_order)
+            retry_backoff: Base delay in seconds for jittered exponential backoff
+        """
+        super().__init__(api_key, api_secret, testnet, base_url,
+                         max_retries, retry_backoff)
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._exchange_info_task: Optional[asyncio.Task] = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Create a keep-alive session with a per-host connection pool"""
+        if isinstance(self.timeout, tuple):
+            connect, read = self.timeout
+            timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        else:
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit_per_host=self.pool_size)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self) -> None:
+        """Close pooled connections"""
+        if self._exchange_info_task is not None:
+            self._exchange_info_task.cancel()
+            self._exchange_info_task = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _send_request(self,
+                            method: str,
+                            endpoint: str,
+                            params: Dict = None,
+                            signed: bool = True) -> Dict:
+        if method == 'GET':
+            # Identical concurrent reads share one round trip
+            key = (endpoint, tuple(sorted((params or {}).items())))
+            return await self.scheduler.coalesce_async(
+                key, lambda: self._dispatch(method, endpoint, params, signed))
+        return await self._dispatch(method, endpoint, params, signed)
+
+    async def _dispatch(self,
+                        method: str,
+                        endpoint: str,
+                        params: Dict = None,
+                        signed: bool = True) -> Dict:
+        # Sign only once the scheduler lets us through so the timestamp is fresh
+        await self.scheduler.acquire_async(method, endpoint)
+        url, headers, params = self._prepare_request(endpoint, params, signed)
+
+        # The session is created lazily so it binds to the running loop
+        if self.session is None:
+            self.session = self._create_session()
+
+        query = None
+        if params and method != 'POST':
+            query = {k: str(v) for k, v in params.items()}
+        body = params if method == 'POST' else None
+        async with self.session.request(method,
+                                        url,
+                                        headers=headers,
+                                        params=query,
+                                        json=body) as response:
+            if response.status == 429:
+                self.scheduler.penalize(float(response.headers.get('Retry-After', 1)))
+            if response.status >= 400:
+                # Keep the body: callers inspect the exchange error code
+                raise aiohttp.ClientResponseError(response.request_info,
+                                                  response.history,
+                                                  status=response.status,
+                                                  message=await response.text(),
+                                                  headers=response.headers)
+            return await response.json(content_type=None)
+
+    async def get_account_info(self) -> Dict:
+        """Get account information including balances"""
+        return await self._send_request('GET', '/api/v3/account')
+
+    async def place_order(self,
+                          symbol: str,
+                          side: str,
+                          order_type: str,
+                          quantity: float,
+                          price: float = None,
+                          leverage: int = None,
+                          stop_price: float = None,
+                          position_side: str = None,
+                          client_order_id: str = None,
+                          reduce_only: bool = False) -> Dict:
+        """Place a new order, see MEXCTrader.place_order"""
+        client_order_id = client_order_id or self.new_client_order_id()
+        known = self._known_order(client_order_id)
+        if known is not None:
+            return known
+
+        # Stop and take profit orders only ever close a position
+        reduce_only = reduce_only or order_type in CLOSING_ORDER_TYPES
+        position_side = self.account_config.position_side(symbol, side, position_side,
+                                                          reduce_only)
+        params = self._order_params(symbol, side, order_type, quantity,
+                                    price, stop_price, position_side, client_order_id)
+        # Quantise to tick/lot size locally instead of paying for a rejection
+        params = self.exchange_info.normalize_order(params)
+
+        if leverage and self.account_config.needs_leverage(symbol, leverage):
+            # Set leverage first for futures trading
+            leverage_params = {
+                'symbol': symbol,
+                'leverage': leverage
+            }
+            try:
+                await self._send_request('POST', '/api/v3/margin/leverage',
+                                         leverage_params)
+            except Exception:
+                self.account_config.invalidate(symbol)
+                raise
+            self.account_config.set_leverage(symbol, leverage)
+
+        try:
+            return await self._submit_order(params)
+        except Exception:
+            # The rejection may come from configuration changed behind our back
+            self.account_config.invalidate(symbol)
+            raise
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Network errors, timeouts, 429 and 5xx are worth retrying"""
+        if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+            return True
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status == 429 or error.status >= 500
+        return False
+
+    async def _find_order(self, symbol: str, client_order_id: str) -> Optional[Dict]:
+        """Look up an order by client order id, None if the exchange never saw it"""
+        try:
+            return await self.get_order(symbol, client_order_id=client_order_id)
+        except aiohttp.ClientResponseError as e:
+            if self._is_missing_order(e.status, e.message):
+                return None
+            raise
+
+    async def _submit_order(self, params: Dict) -> Dict:
+        """Send an order with idempotent retries, see MEXCTrader._submit_order"""
+        symbol, client_order_id = params['symbol'], params['newClientOrderId']
+        attempt = 0
+        while True:
+            try:
+                ack = await self._send_request('POST', '/api/v3/order', dict(params))
+                self._remember_order(client_order_id, ack)
+                return ack
+            except Exception as e:
+                if not self._is_retryable(e):
+                    raise
+                error = e
+
+            while True:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise OrderStateUnknownError(symbol, client_order_id,
+                                                 error) from error
+                await asyncio.sleep(self._backoff_delay(attempt))
+                try:
+                    existing = await self._find_order(symbol, client_order_id)
+                    break
+                except Exception as e:
+                    if not self._is_retryable(e):
+                        raise OrderStateUnknownError(symbol, client_order_id, e) from e
+
+            if existing is not None:
+                self._remember_order(client_order_id, existing)
+                return existing
+
+    async def get_order(self,
+                        symbol: str,
+                        order_id: int = None,
+                        client_order_id: str = None) -> Dict:
+        """Query an order by exchange order id or client order id"""
+        params = {'symbol': symbol}
+        if order_id is not None:
+            params['orderId'] = order_id
+        if client_order_id is not None:
+            params['origClientOrderId'] = client_order_id
+        return await self._send_request('GET', '/api/v3/order', params)
+
+    async def get_open_orders(self, symbol: str = None) -> Dict:
+        """Get all open orders or orders for a specific symbol"""
+        params = {}
+        if symbol:
+            params['symbol'] = symbol
+        return await self._send_request('GET', '/api/v3/openOrders', params)
+
+    async def cancel_order(self, symbol: str, order_id: int) -> Dict:
+        """Cancel an existing order"""
+        params = {
+            'symbol': symbol,
+            'orderId': order_id
+        }
+        return await self._send_request('DELETE', '/api/v3/order', params)
+
+    async def get_position_info(self, symbol: str = None) -> Dict:
+        """Get current position information"""
+        params = {}
+        if symbol:
+            params['symbol'] = symbol
+        return await self._send_request('GET', '/api/v3/positionRisk', params)
+
+    async def get_leverage_brackets(self, symbol: str) -> Dict:
+        """Get leverage brackets for futures trading"""
+        params = {'symbol': symbol}
+        return await self._send_request('GET', '/api/v3/leverageBracket', params)
+
+    async def change_margin_type(self, symbol: str, margin_type: str) -> Dict:
+        """Change margin type between 'ISOLATED' and 'CROSSED'
+
+        Skipped when the symbol is already known to use margin_type.
+        """
+        if not self.account_config.needs_margin_type(symbol, margin_type):
+            return {'symbol': symbol, 'marginType': margin_type, 'cached': True}
+
+        params = {
+            'symbol': symbol,
+            'marginType': margin_type
+        }
+        try:
+            result = await self._send_request('POST', '/api/v3/marginType', params)
+        except Exception:
+            self.account_config.invalidate(symbol)
+            raise
+        self.account_config.set_margin_type(symbol, margin_type)
+        return result
+
+    async def set_leverage(self, symbol: str, leverage: int) -> Dict:
+        """Set leverage for a symbol
+
+        Skipped when the symbol is already known to use this leverage.
+        """
+        self.exchange_info.check_leverage(symbol, leverage)
+        if not self.account_config.needs_leverage(symbol, leverage):
+            return {'symbol': symbol, 'leverage': leverage, 'cached': True}
+
+        params = {
+            'symbol': symbol,
+            'leverage': leverage
+        }
+        try:
+            result = await self._send_request('POST', '/api/v3/leverage', params)
+        except Exception:
+            self.account_config.invalidate(symbol)
+            raise
+        self.account_config.set_leverage(symbol, leverage)
+        return result
+
+    async def set_position_mode(self, symbol: str, position_mode: str) -> Dict:
+        """Switch a symbol between 'HEDGE' and 'ONE_WAY' position mode
+
+        Skipped when the symbol is already known to use position_mode.
+        """
+        position_mode = position_mode.upper()
+        if not self.account_config.needs_position_mode(symbol, position_mode):
+            return {'symbol': symbol, 'positionMode': position_mode, 'cached': True}
+
+        params = {
+            'symbol': symbol,
+            'positionMode': position_mode
+        }
+        try:
+            result = await self._send_request('POST', '/api/v3/positionMode', params)
+        except Exception:
+            self.account_config.invalidate(symbol)
+            raise
+        self.account_config.set_position_mode(symbol, position_mode)
+        return result
+
+    async def warm_up_account_config(self, symbols: List[str] = None) -> int:
+        """Load leverage, margin type and position mode for all (or the given)
+        symbols with one position risk request. Returns symbols loaded"""
+        positions = await self.get_position_info()
+        return self.account_config.load_positions(positions, symbols)
+
+    async def get_mark_price(self, symbol: str) -> Dict:
+        """Get current mark price and funding rate for a symbol"""
+        params = {'symbol': symbol}
+        return await self._send_request('GET', '/api/v3/premiumIndex', params)
+
+    async def get_exchange_info(self) -> Dict:
+        """Get trading rules and symbol information"""
+        return await self._send_request('GET', '/api/v3/exchangeInfo', signed=False)
+
+    async def load_exchange_info(self, refresh: bool = True) -> int:
+        """Load symbol filters used to quantise orders, optionally keeping
+        them refreshed by a background task. Returns symbols loaded"""
+        count = self.exchange_info.load(await self.get_exchange_info())
+        if refresh and self._exchange_info_task is None:
+            self._exchange_info_task = asyncio.ensure_future(
+                self._refresh_exchange_info())
+        return count
+
+    async def _refresh_exchange_info(self) -> None:
+        while True:
+            await asyncio.sleep(self.exchange_info.refresh_interval)
+            try:
+                self.exchange_info.load(await self.get_exchange_info())
+            except Exception as e:
+                print(f"Exchange info refresh failed: {str(e)}")
+
+# asyncio counterpart of TradingBot
+class AsyncTradingBot:
+    def __init__(self,
+                 api_key: str,
+                 api_secret: str,
+                 testnet: bool = False,
+                 pool_size: int = 10,
+                 timeout: Union[float, Tuple[float, float]] = 10.0,
+                 base_url: Optional[str] = None,
+                 concurrent_brackets: bool = False,
+                 price_book: Optional[PriceBook] = None,
+                 journal: Optional[TradeJournal] = None):
+        self.trader = AsyncMEXCTrader(api_key, api_secret, testnet,
+                                      pool_size=pool_size,
+                                      timeout=timeout,
+                                      base_url=base_url)
+        self.active_trades = {}
+        self.concurrent_brackets = concurrent_brackets
+        self.price_book = price_book
+        if price_book is not None:
+            # MARKET orders are checked against min notional at the book's price
+            self.trader.exchange_info.price_source = price_book.get_mark_price
+        self.journal = journal
+        if journal is not None:
+            self.active_trades = dict(journal.open_trades)
+        self._unfollow_stops = None
+        # Serialises stop changes so a trade's orders reach the exchange in order
+        self._stop_lock = asyncio.Lock()
+
+    async def _get_mark_price(self, symbol: str) -> float:
+        """Read the mark price from the price book, falling back to REST"""
+        if self.price_book is not None:
+            price = self.price_book.get_mark_price(symbol)
+            if price is not None:
+                return price
+        price = float((await self.trader.get_mark_price(symbol))['markPrice'])
+        if self.price_book is not None:
+            self.price_book.update(symbol, mark=price)
+        return price
+
+    async def close(self) -> None:
+        """Release the trader's pooled connections"""
+        if self._unfollow_stops is not None:
+            self._unfollow_stops()
+            self._unfollow_stops = None
+        if self.journal is not None:
+            # The commit fsyncs; keep it off the event loop
+            await asyncio.to_thread(self.journal.flush)
+        await self.trader.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def place_leveraged_trade(self,
+                                    symbol: str,
+                                    side: str,
+                                    quantity: float,
+                                    leverage: int = 10,
+                                    stop_loss_percent: float = 5.0,
+                                    take_profit_percent: float = 10.0) -> Dict:
+        """Place a leveraged trade with stop loss and take profit,
+        see TradingBot.place_leveraged_trade"""
+        if self.concurrent_brackets:
+            return await self._place_concurrent_bracket(
+                symbol, side, quantity, leverage,
+                stop_loss_percent, take_profit_percent)
+
+        # Get current mark price
+        mark_price = await self._get_mark_price(symbol)
+
+        # Set leverage
+        await self.trader.set_leverage(symbol, leverage)
+
+        # Calculate stop loss and take profit prices
+        entry_side, stop_loss, take_profit = calculate_bracket_prices(
+            mark_price, side, stop_loss_percent, take_profit_percent)
+        stop_loss = self.trader.exchange_info.round_price(symbol, stop_loss)
+        take_profit = self.trader.exchange_info.round_price(symbol, take_profit)
+
+        # Place main order
+        entry_order = await self.trader.place_order(
+            symbol=symbol,
+            side=entry_side,
+            order_type='MARKET',
+            quantity=quantity,
+            position_side=side
+        )
+
+        # Place stop loss order
+        stop_loss_order = await self.trader.place_order(
+            symbol=symbol,
+            side='SELL' if side == 'LONG' else 'BUY',
+            order_type='STOP_MARKET',
+            quantity=quantity,
+            stop_price=stop_loss,
+            position_side=side
+        )
+
+        # Place take profit order
+        take_profit_order = await self.trader.place_order(
+            symbol=symbol,
+            side='SELL' if side == 'LONG' else 'BUY',
+            order_type='TAKE_PROFIT_MARKET',
+            quantity=quantity,
+            stop_price=take_profit,
+            position_side=side
+        )
+
+        trade_details = {
+            'symbol': symbol,
+            'side': side,
+            'leverage': leverage,
+            'entry_order': entry_order,
+            'stop_loss_order': stop_loss_order,
+            'take_profit_order': take_profit_order,
+            'entry_price': mark_price,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit
+        }
+
+        self.active_trades[symbol] = trade_details
+        if self.journal is not None:
+            self.journal.record_open(symbol, trade_details)
+        return trade_details
+
+    async def _place_concurrent_bracket(self,
+                                        symbol: str,
+                                        side: str,
+                                        quantity: float,
+                                        leverage: int,
+                                        stop_loss_percent: float,
+                                        take_profit_percent: float) -> Dict:
+        """Overlapped bracket placement, see TradingBot._place_concurrent_bracket"""
+        mark_price, _ = await asyncio.gather(self._get_mark_price(symbol),
+                                             self.trader.set_leverage(symbol, leverage))
+
+        entry_side, stop_loss, take_profit = calculate_bracket_prices(
+            mark_price, side, stop_loss_percent, take_profit_percent)
+        stop_loss = self.trader.exchange_info.round_price(symbol, stop_loss)
+        take_profit = self.trader.exchange_info.round_price(symbol, take_profit)
+
+        entry_order = await self.trader.place_order(
+            symbol=symbol,
+            side=entry_side,
+            order_type='MARKET',
+            quantity=quantity,
+            position_side=side
+        )
+
+        exit_side = 'SELL' if side == 'LONG' else 'BUY'
+        legs = ('stop_loss_order', 'take_profit_order')
+        results = await asyncio.gather(
+            self.trader.place_order(symbol=symbol, side=exit_side,
+                                    order_type='STOP_MARKET', quantity=quantity,
+                                    stop_price=stop_loss, position_side=side),
+            self.trader.place_order(symbol=symbol, side=exit_side,
+                                    order_type='TAKE_PROFIT_MARKET', quantity=quantity,
+                                    stop_price=take_profit, position_side=side),
+            return_exceptions=True
+        )
+        outcomes = dict(zip(legs, results, strict=True))
+        failed = {leg: r for leg, r in outcomes.items() if isinstance(r, BaseException)}
+        placed = {leg: r for leg, r in outcomes.items() if leg not in failed}
+
+        if failed:
+            filled = entry_order.get('executedQty', quantity)
+            rollback = await self._unwind_bracket(symbol, side, exit_side,
+                                                  filled, placed)
+            raise BracketOrderError(symbol, failed, rollback)
+
+        trade_details = {
+            'symbol': symbol,
+            'side': side,
+            'leverage': leverage,
+            'entry_order': entry_order,
+            'stop_loss_order': placed['stop_loss_order'],
+            'take_profit_order': placed['take_profit_order'],
+            'entry_price': mark_price,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit
+        }
+
+        self.active_trades[symbol] = trade_details
+        if self.journal is not None:
+            self.journal.record_open(symbol, trade_details)
+        return trade_details
+
+    async def _unwind_bracket(self,
+                              symbol: str,
+                              side: str,
+                              exit_side: str,
+                              quantity: float,
+                              placed: Dict[str, Dict]) -> Dict[str, Any]:
+        """Cancel surviving protective legs and flatten the entry"""
+        legs = list(placed)
+        results = await asyncio.gather(
+            *(self.trader.cancel_order(symbol, placed[leg]['orderId']) for leg in legs),
+            return_exceptions=True
+        )
+        rollback = dict(zip(legs, results, strict=True))
+        try:
+            rollback['close_order'] = await self.trader.place_order(
+                symbol=symbol,
+                side=exit_side,
+                order_type='MARKET',
+                quantity=quantity,
+                position_side=side
+            )
+        except Exception as e:
+            rollback['close_order'] = e
+        return rollback
+
+    async def close_position(self, symbol: str) -> Dict:
+        """Close an open position"""
+        if symbol not in self.active_trades:
+            raise ValueError(f'No active trade found for {symbol}')
+
+        trade = self.active_trades[symbol]
+
+        # Cancel stop loss and take profit orders
+        await self.trader.cancel_order(symbol, trade['stop_loss_order']['orderId'])
+        await self.trader.cancel_order(symbol, trade['take_profit_order']['orderId'])
+
+        # Place market order to close position
+        close_order = await self.trader.place_order(
+            symbol=symbol,
+            side='SELL' if trade['side'] == 'LONG' else 'BUY',
+            order_type='MARKET',
+            quantity=trade['entry_order']['executedQty'],
+            position_side=trade['side']
+        )
+
+        del self.active_trades[symbol]
+        if self.journal is not None:
+            self.journal.record_close(symbol, {'close_order': close_order})
+        return close_order
+
+    async def move_stop(self, symbol: str, stop_price: float) -> Dict:
+        """Replace a trade's stop loss order, see TradingBot.move_stop"""
+        if symbol not in self.active_trades:
+            raise ValueError(f'No active trade found for {symbol}')
+
+        trade = self.active_trades[symbol]
+        stop_price = self.trader.exchange_info.round_price(symbol, stop_price)
+        stop_loss_order = await self.trader.place_order(
+            symbol=symbol,
+            side='SELL' if trade['side'] == 'LONG' else 'BUY',
+            order_type='STOP_MARKET',
+            quantity=trade['entry_order']['executedQty'],
+            stop_price=stop_price,
+            position_side=trade['side']
+        )
+        await self.trader.cancel_order(symbol, trade['stop_loss_order']['orderId'])
+
+        changes = {'stop_loss_order': stop_loss_order, 'stop_loss': stop_price}
+        trade.update(changes)
+        if self.journal is not None:
+            self.journal.record_update(symbol, changes)
+        return stop_loss_order
+
+    async def settle_exit(self, symbol: str, kind: str = STOP_LOSS) -> Dict:
+        """Finish a trade whose stop loss or take profit price was crossed,
+        see TradingBot.settle_exit"""
+        if symbol not in self.active_trades:
+            raise ValueError(f'No active trade found for {symbol}')
+
+        trade = self.active_trades[symbol]
+        legs = ['stop_loss_order', 'take_profit_order']
+        if kind == TAKE_PROFIT:
+            legs.reverse()
+        hit, other = legs
+        order = await self.trader.get_order(symbol, order_id=trade[hit]['orderId'])
+        if order.get('status') != 'FILLED':
+            return await self.close_position(symbol)
+
+        try:
+            await self.trader.cancel_order(symbol, trade[other]['orderId'])
+        except Exception as e:
+            # Reduce-only, so a leg left behind can never open a position
+            print(f"Could not cancel {other} for {symbol}: {str(e)}")
+        del self.active_trades[symbol]
+        if self.journal is not None:
+            self.journal.record_close(symbol, {'close_order': order})
+        return order
+
+    def follow_stops(self, risk_manager: RiskManager) -> Callable[[], None]:
+        """Carry risk_manager's stop engine over to the exchange, see
+        TradingBot.follow_stops. Call from the event loop the bot runs on;
+        events raised on other threads are handed over to it"""
+        loop = asyncio.get_running_loop()
+
+        def on_events(events: List[StopEvent]):
+            asyncio.run_coroutine_threadsafe(
+                self._on_stop_events(risk_manager, events), loop)
+
+        unsubscribe = risk_manager.stop_engine.subscribe(on_events)
+        self._unfollow_stops = unsubscribe
+        return unsubscribe
+
+    async def _on_stop_events(self,
+                              risk_manager: RiskManager,
+                              events: List[StopEvent]) -> None:
+        async with self._stop_lock:
+            for event in events:
+                trade = self.active_trades.get(event.key)
+                if trade is None:
+                    continue
+                try:
+                    if event.kind in (STOP_LOSS, TAKE_PROFIT):
+                        close_order = await self.settle_exit(event.key, event.kind)
+                        exit_price = (float(close_order.get('avgPrice') or 0)
+                                      or event.price)
+                        pnl = realised_pnl_percent(trade, exit_price)
+                        risk_manager.update_position(event.key, pnl, is_closed=True)
+                    else:
+                        await self.move_stop(event.key, event.stop_loss)
+                except Exception as e:
+                    print(f"Stop {event.kind} for {event.key} failed: {str(e)}")
+
+    async def reconcile(self) -> Dict:
+        """Check journaled trades against the exchange with one bulk
+        open-orders request, dropping trades whose brackets are gone"""
+        if self.journal is None:
+            raise ValueError('No trade journal configured')
+        result = self.journal.reconcile(await self.trader.get_open_orders())
+        for symbol in result['closed']:
+            self.active_trades.pop(symbol, None)
+        return result
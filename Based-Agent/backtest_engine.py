@@ -0,0 +1,521 @@
+"""Bar-level simulation cores for the Backtester.
+
+simulate_loop is the reference: one bar at a time, as the strategy would
+see them. simulate_vectorized produces identical trades and equity curve
+(bit for bit) with array operations: exits are found by scanning the
+highs and lows after each entry in exponentially growing NumPy slices,
+and the equity curve is assembled from per-trade arrays in one pass. Only
+the trades themselves are walked in Python, to compound capital in
+exactly the order the loop does.
+
+crossover_signals computes the strategy's indicator and signal columns as
+arrays, optionally memoised in an IndicatorCache so parameter sweeps reuse
+them; CrossoverSignal produces the same signals bar by bar for live use,
+or chunk by chunk for ChunkedSimulation, which runs the vectorised core
+over history paged in piece by piece. merge_equity_curves combines the
+per-pair results into one portfolio curve.
+"""
+import heapq
+import math
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+from indicators import EMA, RSI, ema, rsi
+
+EXIT_STOP_LOSS = 'stop_loss'
+EXIT_TAKE_PROFIT = 'take_profit'
+EXIT_END_OF_DATA = 'end_of_data'
+
+def _trade(entry_time, exit_time, direction: int, entry_price: float,
+           exit_price: float, size: float, pnl: float, capital_before: float,
+           reason: str) -> Dict[str, Any]:
+    return {
+        'entry_time': entry_time,
+        'date': exit_time,
+        'side': 'LONG' if direction == 1 else 'SHORT',
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'size': size,
+        'pnl': pnl,
+        'profit': pnl / capital_before * 100,
+        'reason': reason
+    }
+
+def _result(trades: List[Dict[str, Any]], equity_curve: List[Dict[str, Any]],
+            capital: float, initial_capital: float) -> Dict[str, Any]:
+    return {
+        'trades': trades,
+        'equity_curve': equity_curve,
+        'final_capital': capital,
+        'total_return': (capital - initial_capital) / initial_capital * 100
+    }
+
+def _position_size(capital: float,
+                   risk_per_trade: float,
+                   entry_price: float,
+                   stop_loss: float,
+                   leverage: Optional[float]) -> float:
+    """Risk-based size, capped at leverage x capital of notional when given"""
+    size = capital * risk_per_trade / abs(entry_price - stop_loss)
+    if leverage is not None:
+        size = min(size, capital * leverage / entry_price)
+    return size
+
+def simulate_loop(timestamps, high, low, close, signals,
+                  initial_capital: float, risk_per_trade: float,
+                  stop_loss_percent: float, take_profit_percent: float,
+                  leverage: Optional[float] = None) -> Dict[str, Any]:
+    """Reference bar-by-bar simulation (see Backtester.simulate_trades)"""
+    timestamps, high, low, close = (list(np.asarray(a).tolist())
+                                    for a in (timestamps, high, low, close))
+    signals = np.asarray(signals).tolist()
+    stop_fraction = stop_loss_percent / 100
+    target_fraction = take_profit_percent / 100
+
+    capital = float(initial_capital)
+    trades = []
+    equity_curve = []
+    position = None
+    for i in range(len(close)):
+        if position is not None:
+            direction = position['direction']
+            stop_loss, take_profit = position['stop_loss'], position['take_profit']
+            entry_price, size = position['entry_price'], position['size']
+            exit_price = reason = None
+            long = direction == 1
+            if (low[i] <= stop_loss) if long else (high[i] >= stop_loss):
+                exit_price, reason = stop_loss, EXIT_STOP_LOSS
+            elif (high[i] >= take_profit) if long else (low[i] <= take_profit):
+                exit_price, reason = take_profit, EXIT_TAKE_PROFIT
+            if exit_price is not None:
+                pnl = (exit_price - entry_price) * size * direction
+                trades.append(_trade(position['entry_time'], timestamps[i], direction,
+                                     entry_price, exit_price, size, pnl, capital,
+                                     reason))
+                capital += pnl
+                position = None
+
+        if position is None and signals[i] != 0:
+            direction = 1 if signals[i] > 0 else -1
+            entry_price = close[i]
+            stop_loss = entry_price * (1 - stop_fraction * direction)
+            position = {
+                'direction': direction,
+                'entry_time': timestamps[i],
+                'entry_price': entry_price,
+                'stop_loss': stop_loss,
+                'take_profit': entry_price * (1 + target_fraction * direction),
+                'size': _position_size(capital, risk_per_trade, entry_price, stop_loss,
+                                       leverage)
+            }
+
+        if position is not None:
+            equity = capital + ((close[i] - position['entry_price']) *
+                                position['size'] * position['direction'])
+        else:
+            equity = capital
+        equity_curve.append({'timestamp': timestamps[i], 'equity': equity})
+
+    if position is not None:
+        direction = position['direction']
+        pnl = (close[-1] - position['entry_price']) * position['size'] * direction
+        trades.append(_trade(position['entry_time'], timestamps[-1], direction,
+                             position['entry_price'], close[-1], position['size'], pnl,
+                             capital, EXIT_END_OF_DATA))
+        capital += pnl
+
+    return _result(trades, equity_curve, capital, initial_capital)
+
+def _first_exit(high: np.ndarray, low: np.ndarray, start: int, direction: int,
+                stop_loss: float, take_profit: float) -> Optional[Tuple[int, str]]:
+    """First bar from start that touches the stop or target, scanning
+    slices that grow 4x so short trades stay cheap and long ones take
+    O(log n) slices"""
+    n = len(high)
+    width = 64
+    while start < n:
+        end = min(start + width, n)
+        if direction == 1:
+            stop_hit = low[start:end] <= stop_loss
+            target_hit = high[start:end] >= take_profit
+        else:
+            stop_hit = high[start:end] >= stop_loss
+            target_hit = low[start:end] <= take_profit
+        hit = stop_hit | target_hit
+        if hit.any():
+            k = int(hit.argmax())
+            return start + k, EXIT_STOP_LOSS if stop_hit[k] else EXIT_TAKE_PROFIT
+        start = end
+        width *= 4
+    return None
+
+def _simulate_bars(timestamps: np.ndarray,
+                   high: np.ndarray,
+                   low: np.ndarray,
+                   close: np.ndarray,
+                   signals: np.ndarray,
+                   capital: float,
+                   position: Optional[Dict[str, Any]],
+                   risk_per_trade: float,
+                   stop_fraction: float,
+                   target_fraction: float,
+                   leverage: Optional[float]
+                   ) -> Tuple[List[Dict[str, Any]], np.ndarray, float,
+                              Optional[Dict[str, Any]]]:
+    """Vectorised core over a run of bars, starting from capital and the
+    position carried in (as simulate_loop holds it, or None).
+
+    Returns:
+        Trades closed in these bars, equity at each bar, capital after them
+        and the position still open at the last bar (or None)
+    """
+    n = len(close)
+
+    # Path-dependent part: which signals are taken and where they exit.
+    # This depends only on prices, not on capital. A carried position
+    # entered before bar 0; it is the first trade, at entry bar -1.
+    candidates = np.flatnonzero(signals)
+    entries, exits, directions, stops, exit_prices, reasons = [], [], [], [], [], []
+    cursor = 0
+    carried = position
+    if position is not None:
+        entries.append(-1)
+        directions.append(position['direction'])
+        stops.append(position['stop_loss'])
+        found = _first_exit(high, low, 0, position['direction'], position['stop_loss'],
+                            position['take_profit'])
+        if found is None:
+            exits.append(n)
+            cursor = n
+        else:
+            j, reason = found
+            exits.append(j)
+            exit_prices.append(position['stop_loss'] if reason == EXIT_STOP_LOSS
+                               else position['take_profit'])
+            reasons.append(reason)
+            cursor = j
+    while cursor < n:
+        k = np.searchsorted(candidates, cursor)
+        if k == len(candidates):
+            break
+        i = int(candidates[k])
+        direction = 1 if signals[i] > 0 else -1
+        entry_price = float(close[i])
+        stop_loss = entry_price * (1 - stop_fraction * direction)
+        take_profit = entry_price * (1 + target_fraction * direction)
+        found = _first_exit(high, low, i + 1, direction, stop_loss, take_profit)
+
+        entries.append(i)
+        directions.append(direction)
+        stops.append(stop_loss)
+        if found is None:
+            # Still open after the last bar
+            exits.append(n)
+            position = {'direction': direction, 'entry_time': timestamps[i],
+                        'entry_price': entry_price, 'stop_loss': stop_loss,
+                        'take_profit': take_profit}
+            break
+        j, reason = found
+        exits.append(j)
+        exit_prices.append(stop_loss if reason == EXIT_STOP_LOSS else take_profit)
+        reasons.append(reason)
+        # The loop closes before it checks for entries, so the exit bar may re-enter
+        cursor = j
+
+    # Compound capital trade by trade, in the loop's operation order
+    ts = timestamps.tolist()
+    closes = close.tolist()
+    initial_capital = capital
+    trades = []
+    sizes, entry_prices, capital_after = [], [], []
+    rows = zip(entries, directions, stops, strict=True)
+    for k, (entry, direction, stop_loss) in enumerate(rows):
+        if entry < 0:
+            entry_time = carried['entry_time']
+            entry_price, size = carried['entry_price'], carried['size']
+        else:
+            entry_time, entry_price = ts[entry], closes[entry]
+            size = _position_size(capital, risk_per_trade, entry_price, stop_loss,
+                                  leverage)
+        sizes.append(size)
+        entry_prices.append(entry_price)
+        if k == len(exit_prices):
+            position = dict(position, entry_time=entry_time, entry_price=entry_price,
+                            size=size)
+            break
+        pnl = (exit_prices[k] - entry_price) * size * direction
+        trades.append(_trade(entry_time, ts[exits[k]], direction, entry_price,
+                             exit_prices[k], size, pnl, capital, reasons[k]))
+        capital += pnl
+        capital_after.append(capital)
+    else:
+        position = None
+
+    # Equity curve: realised capital plus the open trade's mark-to-market
+    equity = np.full(n, float(initial_capital))
+    if entries:
+        bars = np.arange(n)
+        exit_bars = np.asarray(exits)
+        realised = np.searchsorted(exit_bars, bars, side='right') - 1
+        booked = realised >= 0
+        equity[booked] = np.asarray(capital_after)[realised[booked]]
+
+        open_trade = np.searchsorted(np.asarray(entries), bars, side='right') - 1
+        in_trade = (open_trade >= 0) & (bars < exit_bars[np.maximum(open_trade, 0)])
+        t = open_trade[in_trade]
+        open_pnl = ((close[in_trade] - np.asarray(entry_prices)[t]) *
+                    np.asarray(sizes)[t] * np.asarray(directions)[t])
+        equity[in_trade] = equity[in_trade] + open_pnl
+    return trades, equity, capital, position
+
+def _close_at_end(trades: List[Dict[str, Any]],
+                  position: Dict[str, Any],
+                  timestamp,
+                  price: float,
+                  capital: float) -> float:
+    """Mark an open position to the last close as an end_of_data trade"""
+    direction = position['direction']
+    pnl = (price - position['entry_price']) * position['size'] * direction
+    trades.append(_trade(position['entry_time'], timestamp, direction,
+                         position['entry_price'], price, position['size'], pnl, capital,
+                         EXIT_END_OF_DATA))
+    return capital + pnl
+
+def simulate_vectorized(timestamps, high, low, close, signals,
+                        initial_capital: float, risk_per_trade: float,
+                        stop_loss_percent: float, take_profit_percent: float,
+                        leverage: Optional[float] = None,
+                        records: bool = True) -> Dict[str, Any]:
+    """Array-based simulation with the same results as simulate_loop.
+    With records=False the equity curve is returned as a float array
+    aligned with timestamps instead of a list of dicts"""
+    timestamps = np.asarray(timestamps)
+    close = np.asarray(close, dtype=float)
+    trades, equity, capital, position = _simulate_bars(
+        timestamps, np.asarray(high, dtype=float), np.asarray(low, dtype=float), close,
+        np.asarray(signals), float(initial_capital), None, risk_per_trade,
+        stop_loss_percent / 100, take_profit_percent / 100, leverage)
+    if position is not None:
+        capital = _close_at_end(trades, position, timestamps[-1].item(),
+                                float(close[-1]), capital)
+
+    if not records:
+        return _result(trades, equity, capital, initial_capital)
+    equity_curve = [{'timestamp': t, 'equity': e}
+                    for t, e in zip(timestamps.tolist(), equity.tolist(), strict=True)]
+    return _result(trades, equity_curve, capital, initial_capital)
+
+class ChunkedSimulation:
+    """simulate_vectorized fed a chunk of bars at a time, for histories too
+    long to hold in memory. The open position and capital carry across
+    chunks, so the trades and equity are exactly those of one run over
+    the concatenated bars, however they are split. Only trades are kept;
+    feed() returns each chunk's equity for the caller to keep or reduce.
+    """
+
+    def __init__(self,
+                 initial_capital: float,
+                 risk_per_trade: float,
+                 stop_loss_percent: float,
+                 take_profit_percent: float,
+                 leverage: Optional[float] = None):
+        self.initial_capital = float(initial_capital)
+        self.capital = float(initial_capital)
+        self.risk_per_trade = risk_per_trade
+        self.stop_fraction = stop_loss_percent / 100
+        self.target_fraction = take_profit_percent / 100
+        self.leverage = leverage
+        self.position: Optional[Dict[str, Any]] = None
+        self.trades: List[Dict[str, Any]] = []
+        self._last = None
+
+    def feed(self, timestamps, high, low, close, signals) -> np.ndarray:
+        """Simulate the next chunk of bars. Returns equity at each bar"""
+        timestamps = np.asarray(timestamps)
+        close = np.asarray(close, dtype=float)
+        trades, equity, self.capital, self.position = _simulate_bars(
+            timestamps, np.asarray(high, dtype=float), np.asarray(low, dtype=float),
+            close, np.asarray(signals), self.capital, self.position,
+            self.risk_per_trade, self.stop_fraction, self.target_fraction,
+            self.leverage)
+        self.trades.extend(trades)
+        if len(close):
+            self._last = (timestamps[-1].item(), float(close[-1]))
+        return equity
+
+    def finish(self) -> Dict[str, Any]:
+        """Close any open position at the last close. Returns the
+        simulate_vectorized result without its equity curve"""
+        if self.position is not None:
+            self.capital = _close_at_end(self.trades, self.position, *self._last,
+                                         self.capital)
+            self.position = None
+        return _result(self.trades, [], self.capital, self.initial_capital)
+
+class IndicatorCache:
+    """Indicator columns keyed by (symbol, indicator, params), least recently
+    used first out. Entries are only valid for the data they were computed
+    from, so use one cache per dataset (or clear() when it changes)"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._columns: 'OrderedDict[Tuple, np.ndarray]' = OrderedDict()
+
+    def get(self, symbol: str, indicator: str, params: Tuple[Hashable, ...],
+            compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """Cached column, computing (and storing) it on a miss"""
+        key = (symbol, indicator, params)
+        column = self._columns.get(key)
+        if column is not None:
+            self._columns.move_to_end(key)
+            self.hits += 1
+            return column
+        self.misses += 1
+        column = compute()
+        # Shared between callers, so nobody may write to it
+        column.flags.writeable = False
+        self._columns[key] = column
+        if len(self._columns) > self.max_entries:
+            self._columns.popitem(last=False)
+        return column
+
+    def clear(self) -> None:
+        self._columns.clear()
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+def crossover_signals(close,
+                      fast_period: int = 9,
+                      slow_period: int = 21,
+                      rsi_period: int = 14,
+                      rsi_upper: float = 70,
+                      rsi_lower: float = 30,
+                      indicators: Optional[IndicatorCache] = None,
+                      symbol: str = '') -> Dict[str, np.ndarray]:
+    """EMA crossover signals with an RSI filter (see Backtester.analyze_signals).
+
+    Returns:
+        Dict of ema_fast, ema_slow, rsi and signal arrays. Every column only
+        looks back, so signals for a prefix of close are a prefix of these
+    """
+    close = np.asarray(close, dtype=float)
+
+    def column(name: str,
+               params: Tuple,
+               compute: Callable[[], np.ndarray]) -> np.ndarray:
+        if indicators is None:
+            return compute()
+        return indicators.get(symbol, name, params, compute)
+
+    ema_fast = column('ema', (fast_period,), lambda: ema(close, span=fast_period))
+    ema_slow = column('ema', (slow_period,), lambda: ema(close, span=slow_period))
+    strength = column('rsi', (rsi_period,), lambda: rsi(close, rsi_period))
+
+    def signal() -> np.ndarray:
+        above = ema_fast > ema_slow
+        previous = np.concatenate(([False], above[:-1]))
+        result = np.zeros(len(close), dtype=np.int64)
+        result[above & ~previous & (strength < rsi_upper)] = 1
+        result[~above & previous & (strength > rsi_lower)] = -1
+        return result
+
+    params = (fast_period, slow_period, rsi_period, rsi_upper, rsi_lower)
+    return {'ema_fast': ema_fast, 'ema_slow': ema_slow, 'rsi': strength,
+            'signal': column('signal', params, signal)}
+
+class CrossoverSignal:
+    """Streaming crossover_signals for live bars, built on the same
+    indicators: feeding closes one by one gives exactly the batch signals"""
+
+    def __init__(self,
+                 fast_period: int = 9,
+                 slow_period: int = 21,
+                 rsi_period: int = 14,
+                 rsi_upper: float = 70,
+                 rsi_lower: float = 30):
+        self.ema_fast = EMA(span=fast_period)
+        self.ema_slow = EMA(span=slow_period)
+        self.rsi = RSI(rsi_period)
+        self.rsi_upper = rsi_upper
+        self.rsi_lower = rsi_lower
+        self._above = False
+
+    def update(self, close: float) -> int:
+        """Fold in a closed bar. Returns 1 to go long, -1 to go short, else 0"""
+        above = self.ema_fast.update(close) > self.ema_slow.update(close)
+        strength = self.rsi.update(close)
+        signal = 0
+        if above and not self._above and strength < self.rsi_upper:
+            signal = 1
+        elif not above and self._above and strength > self.rsi_lower:
+            signal = -1
+        self._above = above
+        return signal
+
+    def update_many(self, close) -> np.ndarray:
+        """update() over a chunk of closed bars, returning every signal"""
+        close = np.asarray(close, dtype=float)
+        if not len(close):
+            return np.zeros(0, dtype=np.int64)
+        above = self.ema_fast.update_many(close) > self.ema_slow.update_many(close)
+        strength = self.rsi.update_many(close)
+        previous = np.concatenate(([self._above], above[:-1]))
+        signal = np.zeros(len(close), dtype=np.int64)
+        signal[above & ~previous & (strength < self.rsi_upper)] = 1
+        signal[~above & previous & (strength > self.rsi_lower)] = -1
+        self._above = bool(above[-1])
+        return signal
+
+def _tagged(curve: Iterable[Dict[str, Any]],
+            index: int) -> Iterator[Tuple[Any, int, float]]:
+    for point in curve:
+        yield point['timestamp'], index, point['equity']
+
+def merge_equity_curves(curves: Sequence[Iterable[Dict[str, Any]]],
+                        initial_equity: Sequence[float],
+                        interval_ms: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Stream a portfolio equity curve from per-pair curves.
+
+    The curves (each sorted by timestamp) are merged k-way with heapq, so
+    memory stays O(pairs) however long they are. Every pair contributes its
+    latest equity (forward-filled; initial_equity before its first point)
+    and each output point is their sum, with the drawdown from the running
+    peak in percent. With interval_ms, one point is emitted per interval,
+    labelled with the interval start and holding its closing state.
+    """
+    latest = [float(equity) for equity in initial_equity]
+    peak = -math.inf
+    label = None
+
+    def point(timestamp):
+        nonlocal peak
+        equity = math.fsum(latest)
+        peak = max(peak, equity)
+        drawdown = (peak - equity) / peak * 100 if peak > 0 else 0.0
+        return {'timestamp': timestamp, 'equity': equity, 'drawdown': drawdown}
+
+    tagged = (_tagged(curve, i) for i, curve in enumerate(curves))
+    for timestamp, index, equity in heapq.merge(*tagged):
+        bucket = timestamp - timestamp % interval_ms if interval_ms else timestamp
+        if label is not None and bucket != label:
+            yield point(label)
+        latest[index] = equity
+        label = bucket
+    if label is not None:
+        yield point(label)
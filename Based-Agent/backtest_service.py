@@ -0,0 +1,392 @@
+"""Background backtest jobs with progress events and a result cache.
+
+    service = BacktestService(max_workers=2)
+    job_id = service.submit(config)
+    for event in service.watch(job_id):
+        print(event['type'], event.get('progress'))
+
+Jobs run on a bounded thread pool, one pair at a time through
+Backtester.iter_backtest, emitting an event as each pair finishes (with
+that pair's headline numbers), so callers can poll or stream progress
+instead of holding a request open for the whole run. Cancellation takes
+effect between pairs.
+
+Finished results are cached under a hash of the canonical config (the
+fields that affect the result, plus the Backtester's strategy settings
+and a data version). Only ranges that have fully closed are cached, since
+bars in a range that is still open can change. Submitting a config that is
+already running joins the running job.
+"""
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from backtester import Backtester, format_summary
+from ohlcv_cache import INTERVAL_MS
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'error'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Config fields that change the result; anything else (UI state,
+# workers) is left out of the cache key
+RESULT_FIELDS = ('startDate', 'endDate', 'initialBalance', 'pairs', 'equityInterval',
+                 'monteCarlo')
+
+# Backtester strategy settings, also part of the cache key
+SETTING_NAMES = ('interval', 'stop_loss_percent', 'take_profit_percent', 'leverage')
+
+def default_settings() -> Dict[str, Any]:
+    """Backtester's defaults for SETTING_NAMES, read from its signature so
+    no exchange client has to be built"""
+    parameters = inspect.signature(Backtester).parameters
+    return {name: parameters[name].default for name in SETTING_NAMES}
+
+class BacktestJob:
+    """One submitted backtest: its state and every event it emitted"""
+
+    def __init__(self, job_id: str, key: str, config: Dict[str, Any]):
+        self.id = job_id
+        self.key = key
+        self.config = config
+        self.state = QUEUED
+        self.progress = 0.0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.cached = False
+        self.created = time.time()
+        self.events: List[Dict[str, Any]] = []
+        self.future: Optional[Future] = None
+        self.cancel_requested = threading.Event()
+        self._changed = threading.Condition()
+
+    def emit(self, event_type: str, **fields) -> None:
+        event = dict(fields, type=event_type, job_id=self.id, state=self.state,
+                     progress=round(self.progress, 4), time=time.time())
+        with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def events_since(self,
+                     since: int = 0,
+                     timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Events from index since on, waiting up to timeout for one when
+        there are none yet and the job is still going"""
+        with self._changed:
+            if timeout and len(self.events) <= since and self.state not in FINISHED:
+                self._changed.wait(timeout)
+            return self.events[since:]
+
+    def info(self) -> Dict[str, Any]:
+        return {'jobId': self.id, 'state': self.state,
+                'progress': round(self.progress, 4), 'cached': self.cached,
+                'error': self.error, 'events': len(self.events)}
+
+class BacktestService:
+    """Bounded pool of backtest jobs (see module docstring)"""
+
+    def __init__(self,
+                 tester_factory: Optional[Callable[[], Backtester]] = None,
+                 max_workers: int = 2,
+                 max_pending: int = 16,
+                 cache_size: int = 64,
+                 cache_dir: Optional[str] = None,
+                 data_version: str = '',
+                 max_jobs: int = 1000,
+                 workers: Optional[int] = None,
+                 settings: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            tester_factory: Creates the Backtester for each job (default:
+                exchange credentials from the environment and settings)
+            max_workers: Jobs running at once
+            max_pending: Jobs queued or running before submit refuses more
+            cache_size: Results kept in memory
+            cache_dir: Also keep results here as JSON, across restarts
+            data_version: Part of the cache key; change it to invalidate
+                results computed from older data
+            max_jobs: Finished jobs remembered for status queries
+            workers: Passed to iter_backtest for per-pair processes
+            settings: Strategy settings of tester_factory's Backtesters, for
+                the cache key; any left out are Backtester's defaults
+        """
+        self._settings = dict(default_settings(), **(settings or {}))
+        self.tester_factory = tester_factory or (lambda: Backtester(
+            api_key=os.getenv('MEXC_API_KEY'), api_secret=os.getenv('MEXC_API_SECRET'),
+            **self._settings))
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self.data_version = data_version
+        self.max_jobs = max_jobs
+        self.workers = workers
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='backtest')
+        self.jobs: 'OrderedDict[str, BacktestJob]' = OrderedDict()
+        self._running: Dict[str, str] = {}  # cache key -> job ID
+        self._results: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def config_key(self, config: Dict[str, Any]) -> str:
+        """Canonical hash of everything that determines the result"""
+        canonical = {
+            'config': {name: config[name] for name in RESULT_FIELDS if name in config},
+            'settings': self._settings,
+            'data_version': self.data_version
+        }
+        text = json.dumps(canonical, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def cacheable(self, config: Dict[str, Any]) -> bool:
+        """Whether the last bar in the range has closed, so its data is final"""
+        end = int(datetime.strptime(config['endDate'], '%Y-%m-%d').timestamp() * 1000)
+        step = INTERVAL_MS.get(self._settings['interval'], 60_000)
+        return end + step <= int(time.time() * 1000)
+
+    def submit(self, config: Dict[str, Any]) -> str:
+        """Queue a backtest and return its job ID. Cached configs finish
+        immediately; a config already running returns that job's ID"""
+        key = self.config_key(config)
+        with self._lock:
+            running = self._running.get(key)
+            if running is not None and not self.jobs[running].cancel_requested.is_set():
+                return running
+
+            cached = self._cached(key)
+            job = BacktestJob(uuid.uuid4().hex, key, dict(config))
+            self.jobs[job.id] = job
+            self._forget_old_jobs()
+            if cached is not None:
+                job.state, job.progress = DONE, 1.0
+                job.result, job.cached = cached, True
+                job.emit(DONE)
+                return job.id
+
+            pending = sum(1 for j in self.jobs.values() if j.state in (QUEUED, RUNNING))
+            if pending > self.max_pending:
+                del self.jobs[job.id]
+                raise RuntimeError(f'Backtest queue is full ({self.max_pending} jobs)')
+            self._running[key] = job.id
+            job.emit('queued')
+            job.future = self._executor.submit(self._run, job)
+        return job.id
+
+    def _forget_old_jobs(self) -> None:
+        """Drop the oldest finished jobs beyond max_jobs. Caller holds the lock"""
+        excess = len(self.jobs) - self.max_jobs
+        finished = [j.id for j in self.jobs.values() if j.state in FINISHED]
+        for job_id in finished[:max(excess, 0)]:
+            del self.jobs[job_id]
+
+    def _cached(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result for key, from memory or disk. Caller holds the lock"""
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            return result
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, f'{key}.json')
+            try:
+                with open(path) as f:
+                    result = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._remember(key, result)
+        return result
+
+    def _remember(self, key: str, result: Dict[str, Any]) -> None:
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+
+    def _store(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._remember(key, result)
+        if not self.cache_dir:
+            return
+        path = os.path.join(self.cache_dir, f'{key}.json')
+        tmp = f'{path}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(result, f, default=str)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Failed to cache backtest result: {str(e)}")
+
+    def _run(self, job: BacktestJob) -> None:
+        try:
+            if job.cancel_requested.is_set():
+                self._finish(job, CANCELLED)
+                return
+            job.state = RUNNING
+            config = job.config
+            pairs = config['pairs']
+            job.emit('started', pairs=len(pairs))
+
+            tester = self.tester_factory()
+            results = {}
+            stream = tester.iter_backtest(config, self.workers)
+            try:
+                for pair, simulation in stream:
+                    if job.cancel_requested.is_set():
+                        break
+                    results[pair] = simulation
+                    job.progress = len(results) / len(pairs)
+                    job.emit('partial', pair=pair,
+                             trades=len(simulation['trades']),
+                             total_return=round(simulation['total_return'], 2),
+                             final_capital=simulation['final_capital'])
+            finally:
+                stream.close()
+            if job.cancel_requested.is_set():
+                self._finish(job, CANCELLED)
+                return
+
+            summary = tester.summarize(config, results)
+            result = {'status': 'success', 'results': format_summary(summary)}
+            if self.cacheable(config):
+                self._store(job.key, result)
+            if job.cancel_requested.is_set():
+                # Cancelled while merging; the result is still good for the cache
+                self._finish(job, CANCELLED)
+                return
+            job.result = result
+            job.progress = 1.0
+            self._finish(job, DONE)
+        except Exception as e:
+            print(f"Backtest job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            self._finish(job, FAILED, error=str(e))
+
+    def _finish(self, job: BacktestJob, state: str, **fields) -> None:
+        with self._lock:
+            if self._running.get(job.key) == job.id:
+                del self._running[job.key]
+            if job.state in FINISHED:
+                return
+            job.state = state
+        job.emit(state, **fields)
+
+    def _job(self, job_id: str) -> BacktestJob:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise KeyError(f'Unknown backtest job {job_id}')
+        return job
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        return self._job(job_id).info()
+
+    def events(self,
+               job_id: str,
+               since: int = 0,
+               timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Events from index since on (for polling); waits up to timeout
+        for the next one"""
+        return self._job(job_id).events_since(since, timeout)
+
+    def watch(self, job_id: str, poll: float = 1.0) -> Iterator[Dict[str, Any]]:
+        """Yield a job's events as they happen, ending with its final one"""
+        job = self._job(job_id)
+        index = 0
+        while True:
+            events = job.events_since(index, poll)
+            for event in events:
+                yield event
+                if event['type'] in FINISHED:
+                    return
+            index += len(events)
+
+    def result(self,
+               job_id: str,
+               timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait for a job to finish and return its result (None if it was
+        cancelled or failed)"""
+        job = self._job(job_id)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while job.state not in FINISHED:
+            remaining = 1.0 if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f'Backtest job {job_id} still {job.state}')
+            job.events_since(len(job.events), min(remaining, 1.0))
+        return job.result
+
+    def cancel(self, job_id: str) -> bool:
+        """Stop a job. Queued jobs never start; running ones stop after the
+        pair in progress. Returns False if it had already finished"""
+        job = self._job(job_id)
+        if job.state in FINISHED:
+            return False
+        job.cancel_requested.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+        return True
+
+    def close(self) -> None:
+        """Cancel everything outstanding and wait for running jobs"""
+        for job in list(self.jobs.values()):
+            if job.state not in FINISHED:
+                self.cancel(job.id)
+        self._executor.shutdown(wait=True)
+
+_service: Optional[BacktestService] = None
+_service_lock = threading.Lock()
+
+def get_service() -> BacktestService:
+    """Process-wide service for the API routes"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            data_version = os.getenv('BACKTEST_DATA_VERSION', '')
+            _service = BacktestService(cache_dir=os.getenv('BACKTEST_CACHE_DIR'),
+                                       data_version=data_version)
+        return _service
+
+def submit_backtest(config: Dict[str, Any]) -> Dict[str, Any]:
+    """API entry point: start a backtest, or return its cached result"""
+    service = get_service()
+    try:
+        job_id = service.submit(config)
+    except (RuntimeError, KeyError, ValueError) as e:
+        return {'status': 'error', 'error': str(e)}
+    job = service.jobs[job_id]
+    if job.state == DONE:
+        return dict(job.result, jobId=job_id, cached=job.cached)
+    return {'status': 'accepted', 'jobId': job_id}
+
+def backtest_job(job_id: str,
+                 since: int = 0,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """API entry point: a job's status, new events and, once done, result"""
+    service = get_service()
+    try:
+        status = service.status(job_id)
+        events = service.events(job_id, since, timeout)
+    except KeyError as e:
+        return {'status': 'error', 'error': str(e)}
+    job = service.jobs[job_id]
+    response = dict(status, status=job.state, events=events, next=since + len(events))
+    if job.state == DONE:
+        response['results'] = job.result['results']
+    return response
+
+def cancel_backtest(job_id: str) -> Dict[str, Any]:
+    try:
+        return {'status': 'success', 'cancelled': get_service().cancel(job_id)}
+    except KeyError as e:
+        return {'status': 'error', 'error': str(e)}
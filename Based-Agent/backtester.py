@@ -1,6 +1,425 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest_engine import (
+    ChunkedSimulation,
+    CrossoverSignal,
+    IndicatorCache,
+    crossover_signals,
+    merge_equity_curves,
+    simulate_loop,
+    simulate_vectorized,
+)
+from mexc_trading import MEXCTrader
+from monte_carlo import monte_carlo
+from ohlcv_cache import (
+    INTERVAL_MS,
+    KLINE_COLUMNS,
+    PRICE_COLUMNS,
+    OHLCVCache,
+    read_slice,
+)
+from param_sweep import ParameterSweep
+
+KLINE_LIMIT = 1000
+CHUNK_BARS = 10 * KLINE_LIMIT
+
+def _equity_interval(config: Dict[str, Any]) -> Optional[int]:
+    """config['equityInterval'] in milliseconds"""
+    interval = config.get('equityInterval')
+    if isinstance(interval, str):
+        return INTERVAL_MS[interval]
+    return interval
+
+def _share_ohlcv(df: pd.DataFrame) -> shared_memory.SharedMemory:
+    """Copy OHLCV columns into one shared memory block: int64 timestamps
+    followed by a 5 x n float64 matrix of prices and volume"""
+    n = len(df)
+    shm = shared_memory.SharedMemory(create=True, size=max(48 * n, 1))
+    np.ndarray((n,), dtype=np.int64, buffer=shm.buf)[:] = df['timestamp'].to_numpy()
+    values = np.ndarray((5, n), dtype=np.float64, buffer=shm.buf, offset=8 * n)
+    values[:] = df[PRICE_COLUMNS].to_numpy().T
+    return shm
+
+def _simulate_frame(df: pd.DataFrame,
+                    initial_capital: float,
+                    risk_per_trade: float,
+                    settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker body shared by the shared-memory and cache sources"""
+    tester = Backtester('', '', **settings)
+    df = tester.analyze_signals(df)
+    result = tester.simulate_trades(df=df, initial_capital=initial_capital,
+                                    risk_per_trade=risk_per_trade)
+    # Ship the curve as two arrays; a list of dicts is slow to pickle
+    curve = result['equity_curve']
+    result['equity_curve'] = (np.array([p['timestamp'] for p in curve], dtype=np.int64),
+                              np.array([p['equity'] for p in curve], dtype=np.float64))
+    return result
+
+def _simulate_shared(name: str,
+                     bars: int,
+                     initial_capital: float,
+                     risk_per_trade: float,
+                     settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker: run one pair from a shared block without copying the prices in"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        values = np.ndarray((5, bars), dtype=np.float64, buffer=shm.buf,
+                            offset=8 * bars)
+        columns = {'timestamp': np.ndarray((bars,), dtype=np.int64, buffer=shm.buf)}
+        columns.update(zip(PRICE_COLUMNS, values, strict=True))
+        result = _simulate_frame(pd.DataFrame(columns, copy=False), initial_capital,
+                                 risk_per_trade, settings)
+        # Views into the block must go before it can be closed
+        del columns, values
+        return result
+    finally:
+        shm.close()
+
+def _simulate_cached(path: str,
+                     start_time: int,
+                     end_time: int,
+                     initial_capital: float,
+                     risk_per_trade: float,
+                     settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker: run one pair straight from the memory-mapped OHLCV cache"""
+    return _simulate_frame(read_slice(path, start_time, end_time), initial_capital,
+                           risk_per_trade, settings)
+
+class Backtester:
+    """Replays historical MEXC klines through the EMA crossover / RSI signal
+    rules with fixed-percentage bracket exits and risk-based sizing"""
+
+    def __init__(self,
+                 api_key: str,
+                 api_secret: str,
+                 interval: str = '1m',
+                 stop_loss_percent: float = 2.0,
+                 take_profit_percent: float = 6.0,
+                 cache: Optional[OHLCVCache] = None,
+                 leverage: Optional[float] = None):
+        """
+        Args:
+            cache: Serve klines from (and save them to) this on-disk cache
+            leverage: Cap position notional at this multiple of capital
+        """
+        self.trader = MEXCTrader(api_key or '', api_secret or '')
+        self.interval = interval
+        self.stop_loss_percent = stop_loss_percent
+        self.take_profit_percent = take_profit_percent
+        self.cache = cache
+        self.leverage = leverage
+
+    def get_historical_data(self,
+                            pair: str,
+                            start_time: int,
+                            end_time: int) -> pd.DataFrame:
+        """Klines for a pair ('BTC/USDT' or 'BTCUSDT') between two
+        millisecond timestamps. With a cache, only uncached ranges are
+        downloaded and the frame is backed by memory maps"""
+        symbol = pair.replace('/', '')
+        if self.cache is None:
+            return self._download(symbol, start_time, end_time)
+        return self.cache.get(symbol, self.interval, start_time, end_time,
+                              lambda start, end: self._download(symbol, start, end))
+
+    def iter_klines(self,
+                    pair: str,
+                    start_time: int,
+                    end_time: int,
+                    chunk_bars: int = CHUNK_BARS,
+                    prefetch: bool = True) -> Iterator[pd.DataFrame]:
+        """get_historical_data in pages of up to chunk_bars bars, in order.
+
+        When the cache already covers the range, pages are slices of its
+        memory maps. Otherwise each page is downloaded (without caching)
+        while the previous one is being consumed, unless prefetch is off.
+        Empty pages are skipped.
+        """
+        symbol = pair.replace('/', '')
+        cached = self.cache is not None and not self.cache.missing(
+            symbol, self.interval, start_time, end_time)
+        if cached:
+            df = self.cache.load(symbol, self.interval, start_time, end_time)
+            for i in range(0, len(df), chunk_bars):
+                yield df.iloc[i:i + chunk_bars]
+            return
+
+        span = chunk_bars * INTERVAL_MS[self.interval]
+        starts = range(start_time, end_time + 1, span)
+
+        def fetch(page_start: int) -> pd.DataFrame:
+            page_end = min(page_start + span - 1, end_time)
+            return self._download(symbol, page_start, page_end)
+
+        if not prefetch:
+            for page_start in starts:
+                df = fetch(page_start)
+                if not df.empty:
+                    yield df
+            return
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pages = (pool.submit(fetch, page_start) for page_start in starts)
+            current = next(pages, None)
+            while current is not None:
+                # Start on the next page before handing this one out
+                upcoming = next(pages, None)
+                df = current.result()
+                if not df.empty:
+                    yield df
+                current = upcoming
+
+    def simulate_streamed(self,
+                          pair: str,
+                          start_time: int,
+                          end_time: int,
+                          initial_capital: float,
+                          risk_per_trade: float = 0.02,
+                          chunk_bars: int = CHUNK_BARS,
+                          equity_interval: Optional[int] = None
+                          ) -> Optional[Dict[str, Any]]:
+        """analyze_signals and simulate_trades over iter_klines pages, with
+        signal and position state carried from page to page. Trades and
+        equity are identical to the in-memory run.
+
+        Only one page of bars is held at a time. With equity_interval (ms)
+        the curve keeps the last point of each interval, which is all
+        merge_equity_curves uses when resampling to it; without it the
+        curve keeps every bar and grows with the range.
+
+        Returns:
+            simulate_trades result, or None when there are no bars
+        """
+        signals = CrossoverSignal()
+        simulation = ChunkedSimulation(initial_capital, risk_per_trade,
+                                       self.stop_loss_percent, self.take_profit_percent,
+                                       self.leverage)
+        curve = []
+        pending = None
+        for df in self.iter_klines(pair, start_time, end_time, chunk_bars):
+            timestamps = df['timestamp'].to_numpy()
+            close = df['close'].to_numpy(dtype=float)
+            equity = simulation.feed(timestamps, df['high'].to_numpy(dtype=float),
+                                     df['low'].to_numpy(dtype=float), close,
+                                     signals.update_many(close))
+
+            buckets = timestamps
+            if equity_interval:
+                buckets = timestamps - timestamps % equity_interval
+            # An interval can straddle pages; only its last point is kept
+            if pending is not None and pending[0] != buckets[0]:
+                curve.append(pending[1])
+            keep = np.flatnonzero(np.append(buckets[1:] != buckets[:-1], True))
+            points = [{'timestamp': t, 'equity': e}
+                      for t, e in zip(timestamps[keep].tolist(), equity[keep].tolist(),
+                                      strict=True)]
+            curve.extend(points[:-1])
+            pending = (buckets[-1], points[-1])
+
+        if pending is None:
+            return None
+        curve.append(pending[1])
+        result = simulation.finish()
+        result['equity_curve'] = curve
+        return result
+
+    def _download(self, symbol: str, start_time: int, end_time: int) -> pd.DataFrame:
+        """Page through klines from the exchange"""
+        rows = []
+        cursor = start_time
+        while cursor <= end_time:
+            batch = self.trader.get_klines(symbol, self.interval, cursor, end_time,
+                                           limit=KLINE_LIMIT)
+            if not batch:
+                break
+            rows.extend(row[:6] for row in batch)
+            last = int(batch[-1][0])
+            if len(batch) < KLINE_LIMIT or last < cursor:
+                break
+            cursor = last + 1
+
+        df = pd.DataFrame(rows, columns=KLINE_COLUMNS)
+        if df.empty:
+            return df
+        df = df.astype({'timestamp': 'int64', 'open': float, 'high': float,
+                        'low': float, 'close': float, 'volume': float})
+        df = df.drop_duplicates('timestamp').sort_values('timestamp')
+        return df.reset_index(drop=True)
+
+    def analyze_signals(self,
+                        df: pd.DataFrame,
+                        fast_period: int = 9,
+                        slow_period: int = 21,
+                        rsi_period: int = 14,
+                        rsi_upper: float = 70,
+                        rsi_lower: float = 30,
+                        indicators: Optional[IndicatorCache] = None,
+                        symbol: str = '') -> pd.DataFrame:
+        """Add indicators and a signal column: 1 to go long, -1 to go short.
+
+        Signals fire when the fast/slow EMAs cross, unless RSI says the move
+        is already stretched (at or above rsi_upper for longs, at or below
+        rsi_lower for shorts). With indicators, columns are memoised there
+        under symbol.
+        """
+        columns = crossover_signals(df['close'].to_numpy(dtype=float), fast_period,
+                                    slow_period, rsi_period, rsi_upper, rsi_lower,
+                                    indicators, symbol)
+        for name, values in columns.items():
+            df[name] = values
+        return df
+
+    def simulate_trades(self,
+                        df: pd.DataFrame,
+                        initial_capital: float,
+                        risk_per_trade: float = 0.02,
+                        vectorized: bool = True) -> Dict[str, Any]:
+        """Simulate one position at a time from the signal column.
+
+        Entries fill at the signal bar's close. Each later bar checks the
+        stop loss (first) and take profit against its low/high, and a new
+        signal may enter on the bar that closed the previous trade. Size
+        risks risk_per_trade of current capital on the stop distance, capped
+        at leverage times capital in notional when leverage is set.
+
+        Returns:
+            Dict with trades, equity_curve, final_capital and total_return (%)
+        """
+        args = (df['timestamp'].to_numpy(), df['high'].to_numpy(dtype=float),
+                df['low'].to_numpy(dtype=float), df['close'].to_numpy(dtype=float),
+                df['signal'].to_numpy(), initial_capital, risk_per_trade,
+                self.stop_loss_percent, self.take_profit_percent, self.leverage)
+        if vectorized:
+            return simulate_vectorized(*args)
+        return simulate_loop(*args)
+
+    def iter_backtest(self,
+                      config: Dict[str, Any],
+                      workers: Optional[int] = None
+                      ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (pair, simulation) for every pair with data, as each finishes.
+
+        With workers, pairs are simulated in that many processes (0 means one
+        per CPU) while the next pair's data is still being fetched. Prices
+        reach the workers through shared memory instead of being pickled.
+        With a cache, workers read the memory-mapped cache files instead.
+        Pairs arrive in completion order; run_backtest restores config order.
+
+        With config['chunkBars'], each pair is instead streamed in pages of
+        that many bars (see simulate_streamed), one pair after another in
+        this process, so memory does not grow with the date range.
+        """
+        total_capital = float(config.get('initialBalance', 1000))
         start_time = int(datetime.strptime(config['startDate'], '%Y-%m-%d').timestamp() * 1000)
         end_time = int(datetime.strptime(config['endDate'], '%Y-%m-%d').timestamp() * 1000)
-        
+        pairs = config['pairs']
+        capital = total_capital / len(pairs)
+
+        if config.get('chunkBars'):
+            for pair in pairs:
+                result = self.simulate_streamed(pair, start_time, end_time, capital,
+                                                0.02, int(config['chunkBars']),
+                                                _equity_interval(config))
+                if result is not None:
+                    yield pair, result
+            return
+
+        if workers is None or len(pairs) < 2:
+            for pair in pairs:
+                # Get historical data
+                df = self.get_historical_data(pair, start_time, end_time)
+                if df.empty:
+                    continue
+
+                # Add indicators and analyze signals
+                df = self.analyze_signals(df)
+
+                # Run simulation
+                yield pair, self.simulate_trades(df=df, initial_capital=capital,
+                                                 risk_per_trade=0.02)
+            return
+
+        settings = {'stop_loss_percent': self.stop_loss_percent,
+                    'take_profit_percent': self.take_profit_percent,
+                    'leverage': self.leverage}
+        segments: Dict[str, shared_memory.SharedMemory] = {}
+        futures = {}
+        pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        try:
+            def finished(future):
+                pair = futures.pop(future)
+                shm = segments.pop(pair, None)
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+                result = future.result()
+                timestamps, equity = result['equity_curve']
+                result['equity_curve'] = [
+                    {'timestamp': t, 'equity': e}
+                    for t, e in zip(timestamps.tolist(), equity.tolist(), strict=True)]
+                return pair, result
+
+            for pair in pairs:
+                df = self.get_historical_data(pair, start_time, end_time)
+                if df.empty:
+                    continue
+                if self.cache is not None:
+                    # Workers map the cache files themselves
+                    path = self.cache.path(pair.replace('/', ''), self.interval)
+                    future = pool.submit(_simulate_cached, path, start_time, end_time,
+                                         capital, 0.02, settings)
+                else:
+                    shm = _share_ohlcv(df)
+                    segments[pair] = shm
+                    future = pool.submit(_simulate_shared, shm.name, len(df), capital,
+                                         0.02, settings)
+                futures[future] = pair
+                # Stream out whatever finished while we were fetching
+                for done in [f for f in futures if f.done()]:
+                    yield finished(done)
+
+            for done in as_completed(list(futures)):
+                yield finished(done)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            for shm in segments.values():
+                shm.close()
+                shm.unlink()
+
+    def run_backtest(self,
+                     config: Dict[str, Any],
+                     workers: Optional[int] = None) -> Dict[str, Any]:
+        """Backtest every pair in config over its date range, splitting
+        initialBalance evenly between them.
+
+        workers (or config['workers']) runs pairs in parallel processes; the
+        summary is merged in config order either way, so it is identical.
+        The equity curve is the whole portfolio's, resampled to
+        config['equityInterval'] (an interval such as '1h', or milliseconds)
+        when given. config['chunkBars'] streams the klines in pages
+        instead of loading each pair whole; results are the same.
+
+        config['monteCarlo'] (true, or a dict of simulations, ruinFraction,
+        compound and seed) adds a monte_carlo robustness report on the
+        trades. By default their pnl is resampled on initialBalance, so the
+        original sequence ends at the run's own final equity.
+        """
+        if workers is None:
+            workers = config.get('workers')
+        return self.summarize(config, dict(self.iter_backtest(config, workers)))
+
+    def summarize(self,
+                  config: Dict[str, Any],
+                  results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge per-pair simulations (pair -> simulate_trades result) into
+        the run_backtest summary"""
         summary = {
             'total_trades': 0,
             'winning_trades': 0,
@@ -8,23 +427,12 @@
             'equity_curve': [],
             'trades': []
         }
-        
+
         for pair in config['pairs']:
-            # Get historical data
-            df = self.get_historical_data(pair, start_time, end_time)
-            if df.empty:
+            simulation = results.get(pair)
+            if simulation is None:
                 continue
-                
-            # Add indicators and analyze signals
-            df = self.analyze_signals(df)
-            
-            # Run simulation
-            simulation = self.simulate_trades(
-                df=df,
-                initial_capital=total_capital / len(config['pairs']),
-                risk_per_trade=0.02
-            )
-            
+
             # Update summary
             summary['total_trades'] += len(simulation['trades'])
             summary['winning_trades'] += len([t for t in simulation['trades'] if t['pnl'] > 0])
@@ -34,20 +442,66 @@
             for trade in simulation['trades']:
                 trade['pair'] = pair
                 summary['trades'].append(trade)
-            
-            # Merge equity curves
-            if not summary['equity_curve']:
-                summary['equity_curve'] = simulation['equity_curve']
-            else:
-                # Combine equity curves by timestamp
-                pass
-        
+
+        # Merge equity curves by timestamp; pairs without data hold their capital
+        interval = _equity_interval(config)
+        capital = float(config.get('initialBalance', 1000)) / len(config['pairs'])
+        curves = [results[pair]['equity_curve'] if pair in results else []
+                  for pair in config['pairs']]
+        merged = merge_equity_curves(curves, [capital] * len(curves), interval)
+        summary['equity_curve'] = list(merged)
+        summary['max_drawdown'] = max((p['drawdown'] for p in summary['equity_curve']),
+                                      default=0.0)
+
         # Calculate final metrics
         summary['win_rate'] = (summary['winning_trades'] / summary['total_trades'] * 100) if summary['total_trades'] > 0 else 0
         summary['average_pnl'] = summary['total_pnl'] / summary['total_trades'] if summary['total_trades'] > 0 else 0
+
+        # Resample the trades to see how much of the result is luck
+        options = config.get('monteCarlo')
+        if options:
+            options = options if isinstance(options, dict) else {}
+            initial_capital = float(config.get('initialBalance', 1000))
+            summary['monte_carlo'] = monte_carlo(
+                summary['trades'],
+                initial_capital=initial_capital,
+                simulations=int(options.get('simulations', 10_000)),
+                ruin_fraction=float(options.get('ruinFraction', 0.5)),
+                compound=bool(options.get('compound', False)),
+                seed=options.get('seed', 0))
         
         return summary
 
+    def sweep(self,
+              config: Dict[str, Any],
+              grid: Dict[str, List[Any]],
+              metric: str = 'total_return',
+              workers: Optional[int] = None,
+              prune_fraction: Optional[float] = 0.25) -> pd.DataFrame:
+        """Backtest every combination in grid (see ParameterSweep), e.g.
+        {'stop_loss_percent': [1, 2, 3], 'fast_period': [5, 9, 13]}.
+
+        Returns:
+            Results table ranked by metric, best first
+        """
+        return ParameterSweep(self, grid, metric=metric, workers=workers,
+                              prune_fraction=prune_fraction).run(config)
+
+def format_summary(results: Dict[str, Any]) -> Dict[str, Any]:
+    """run_backtest summary in the shape the API returns"""
+    summary = {
+        'totalTrades': results['total_trades'],
+        'winRate': round(results['win_rate'], 2),
+        'totalPnL': round(results['total_pnl'], 2),
+        'averagePnL': round(results['average_pnl'], 2),
+        'trades': results['trades'],
+        'equityCurve': results['equity_curve'],
+        'maxDrawdown': round(results['max_drawdown'], 2)
+    }
+    if 'monte_carlo' in results:
+        summary['monteCarlo'] = results['monte_carlo']
+    return summary
+
 def backtest_strategy(config: Dict[str, Any]) -> Dict[str, Any]:
     """Main backtesting function to be called from API"""
     try:
@@ -60,14 +514,7 @@ def backtest_strategy(config: Dict[str, Any]) -> Dict[str, Any]:
         
         return {
             'status': 'success',
-            'results': {
-                'totalTrades': results['total_trades'],
-                'winRate': round(results['win_rate'], 2),
-                'totalPnL': round(results['total_pnl'], 2),
-                'averagePnL': round(results['average_pnl'], 2),
-                'trades': results['trades'],
-                'equityCurve': results['equity_curve']
-            }
+            'results': format_summary(results)
         }
     except Exception as e:
         return {
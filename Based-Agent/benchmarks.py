@@ -0,0 +1,992 @@
+"""Micro-benchmarks for the trading stack.
+
+Run with `python benchmarks.py <name>`; `python benchmarks.py --help` lists them.
+Everything runs against local stand-ins, no exchange credentials are needed.
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import websockets
+
+import indicators
+import monte_carlo
+from async_mexc_trading import AsyncTradingBot
+from backtest_engine import CrossoverSignal, crossover_signals
+from backtest_service import BacktestService
+from backtester import Backtester
+from golden_data import (
+    GoldenBacktester,
+    PagedGoldenBacktester,
+    golden_ohlcv,
+    golden_ticks,
+)
+from mexc_simulator import MEXCSimulator, SimulatorConfig
+from mexc_trading import MEXCTrader, TradingBot
+from ohlcv_cache import OHLCVCache
+from param_sweep import ParameterSweep
+from price_book import MarketDataStream, PriceBook
+from rate_limiter import RequestScheduler
+from risk_manager import BATCH_RTOL, BATCH_SIZE_RTOL, RiskManager
+from stop_engine import StopEngine
+from tick_backtest import (
+    LatencyModel,
+    SignalBracketStrategy,
+    TickBacktest,
+    read_depth,
+    read_trades,
+)
+from var_engine import CovarianceVaR
+
+
+class _MarkPriceHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive stand-in for the exchange REST API"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        body = json.dumps({'symbol': 'BTCUSDT', 'markPrice': '50000.0'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+    do_DELETE = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(handler=_MarkPriceHandler) -> ThreadingHTTPServer:
+    """Start a local HTTP server on a free port in a background thread"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _summarize(latencies: List[float], elapsed: float) -> Dict:
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'req_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3)
+    }
+
+
+def bench_http_pool(requests_count: int = 2000) -> Dict:
+    """Compare connection-per-request against the pooled keep-alive transport"""
+    server = start_stub_server()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    results = {}
+    try:
+        for mode, pooled in (('per_request', False), ('pooled', True)):
+            # Measure the transport alone, not the client-side rate limit
+            unlimited = RequestScheduler(capacity=1e9, refill_rate=1e9)
+            with MEXCTrader('key', 'secret', pooled=pooled, base_url=base_url,
+                            scheduler=unlimited) as trader:
+                trader.get_mark_price('BTCUSDT')  # warm up
+                latencies = []
+                start = time.perf_counter()
+                for _ in range(requests_count):
+                    t0 = time.perf_counter()
+                    trader.get_mark_price('BTCUSDT')
+                    latencies.append(time.perf_counter() - t0)
+                results[mode] = _summarize(latencies, time.perf_counter() - start)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+async def _serve_tickers(ws, ticks: int):
+    """Local stand-in for the contract ticker websocket"""
+    subscription = json.loads(await ws.recv())
+    symbol = subscription['param']['symbol']
+    for i in range(ticks):
+        price = 50000.0 + i % 100
+        await ws.send(json.dumps({
+            'channel': 'push.ticker',
+            'data': {'symbol': symbol, 'fairPrice': price, 'lastPrice': price,
+                     'bid1': price - 0.5, 'ask1': price + 0.5},
+            'ts': int(time.time() * 1000)
+        }))
+    await ws.wait_closed()
+
+
+def bench_price_book(ticks: int = 20000, reads: int = 200000) -> Dict:
+    """Feed a PriceBook from a local websocket and compare book reads with REST"""
+    async def stream():
+        book = PriceBook()
+        received = asyncio.Event()
+        count = [0]
+
+        def on_tick(_tick):
+            count[0] += 1
+            if count[0] == ticks:
+                received.set()
+
+        book.subscribe(on_tick, 'BTCUSDT')
+        serve = websockets.serve(lambda ws: _serve_tickers(ws, ticks), '127.0.0.1', 0)
+        async with serve as server:
+            port = server.sockets[0].getsockname()[1]
+            feed = MarketDataStream(book, ['BTCUSDT'], url=f'ws://127.0.0.1:{port}')
+            task = asyncio.ensure_future(feed.run())
+            start = time.perf_counter()
+            await asyncio.wait_for(received.wait(), timeout=60)
+            elapsed = time.perf_counter() - start
+            feed.stop()
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        return book, elapsed
+
+    book, elapsed = asyncio.run(stream())
+    start = time.perf_counter()
+    for _ in range(reads):
+        book.get_mark_price('BTCUSDT')
+    read_ns = (time.perf_counter() - start) / reads * 1e9
+
+    rest = bench_http_pool(requests_count=500)['pooled']
+    return {
+        'ticks_per_sec': round(ticks / elapsed, 1),
+        'book_read_ns': round(read_ns, 1),
+        'rest_lookup_p50_ms': rest['p50_ms']
+    }
+
+
+def _signal_burst(signals: int):
+    """Alternating long/short signals across the simulator's symbols"""
+    symbols = ('BTCUSDT', 'ETHUSDT')
+    return [(symbols[i % 2], 'LONG' if i % 3 else 'SHORT') for i in range(signals)]
+
+
+def _load_result(latencies: List[float], elapsed: float, orders: int) -> Dict:
+    latencies = sorted(latencies)
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    return {
+        'signals': len(latencies),
+        'orders_per_sec': round(orders / elapsed, 1),
+        'p50_signal_to_ack_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'p99_signal_to_ack_ms': round(p99 * 1000, 2)
+    }
+
+
+def _run_sync_bot(url: str, burst, workers: int, concurrent_brackets: bool) -> Dict:
+    unlimited = RequestScheduler(capacity=1e9, refill_rate=1e9)
+    with TradingBot('key', 'secret', base_url=url, pool_size=workers,
+                    concurrent_brackets=concurrent_brackets) as bot:
+        bot.trader.scheduler = unlimited
+        start = time.perf_counter()
+
+        def trade(signal):
+            symbol, side = signal
+            bot.place_leveraged_trade(symbol, side, 0.01, leverage=10)
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            latencies = list(pool.map(trade, burst))
+        return _load_result(latencies, time.perf_counter() - start, 3 * len(burst))
+
+
+def _run_async_bot(url: str, burst, workers: int) -> Dict:
+    async def run():
+        unlimited = RequestScheduler(capacity=1e9, refill_rate=1e9)
+        async with AsyncTradingBot('key', 'secret', base_url=url, pool_size=workers,
+                                   concurrent_brackets=True) as bot:
+            bot.trader.scheduler = unlimited
+            limit = asyncio.Semaphore(workers)
+            start = time.perf_counter()
+
+            async def trade(signal):
+                symbol, side = signal
+                async with limit:
+                    await bot.place_leveraged_trade(symbol, side, 0.01, leverage=10)
+                return time.perf_counter() - start
+
+            latencies = await asyncio.gather(*(trade(signal) for signal in burst))
+            return _load_result(latencies, time.perf_counter() - start, 3 * len(burst))
+    return asyncio.run(run())
+
+
+def _run_signal_monitor(url: str, burst) -> Dict:
+    """Feed Discord-style signal messages through SignalMonitor.process_signal"""
+    try:
+        import discord
+
+        from discord_monitor import SignalMonitor
+    except ImportError:
+        return {'skipped': 'discord.py is not installed'}
+
+    class Channel:
+        async def send(self, content):
+            pass
+
+    class Message:
+        def __init__(self, content):
+            self.content = content
+            self.channel = Channel()
+
+    async def run():
+        with TradingBot('key', 'secret', base_url=url) as bot:
+            bot.trader.scheduler = RequestScheduler(capacity=1e9, refill_rate=1e9)
+            monitor = SignalMonitor('!', bot, intents=discord.Intents.default())
+            start = time.perf_counter()
+
+            async def handle(signal):
+                symbol, side = signal
+                text = f'{side} {symbol[:-4]} Entry: 1 Leverage: 10x'
+                await monitor.process_signal(Message(text))
+                return time.perf_counter() - start
+
+            latencies = await asyncio.gather(*(handle(signal) for signal in burst))
+            return _load_result(latencies, time.perf_counter() - start, 3 * len(burst))
+    return asyncio.run(run())
+
+
+def bench_simulator(signals: int = 200, workers: int = 16,
+                    latency: float = 0.005, jitter: float = 0.002) -> Dict:
+    """Whole-bot load test against the local exchange simulator: a burst of
+    signals arrives at once, latency is measured from the burst to each
+    trade's last acknowledged leg"""
+    burst = _signal_burst(signals)
+    results = {}
+    with MEXCSimulator(SimulatorConfig(latency=latency, jitter=jitter, seed=1)) as sim:
+        results['trading_bot_sequential'] = _run_sync_bot(sim.url, burst, workers,
+                                                          False)
+        results['trading_bot_concurrent'] = _run_sync_bot(sim.url, burst, workers,
+                                                          True)
+        results['async_trading_bot'] = _run_async_bot(sim.url, burst, workers)
+        monitor_burst = burst[:max(signals // 4, 1)]
+        results['signal_monitor'] = _run_signal_monitor(sim.url, monitor_burst)
+        results['simulator'] = sim.stats()
+    return results
+
+
+def bench_risk_manager(positions: int = 10000, checks: int = 100000) -> Dict:
+    """Pre-trade checks against a large book: running aggregates versus
+    summing the open positions on every check"""
+    manager = RiskManager({'maxTotalRisk': 1e12, 'maxSymbolExposure': 1e12})
+    symbols = [f'SYM{i % 500}USDT' for i in range(positions)]
+
+    start = time.perf_counter()
+    for i, symbol in enumerate(symbols):
+        manager.open_position(symbol, 'LONG' if i % 2 else 'SHORT', Decimal('0.5'),
+                              Decimal(100 + i % 50), leverage=1 + i % 20,
+                              risk_amount=Decimal('0.001'), key=f'{symbol}:{i}')
+    open_us = (time.perf_counter() - start) / positions * 1e6
+
+    size, price = Decimal('1'), Decimal('100')
+    start = time.perf_counter()
+    for i in range(checks):
+        manager.can_open_position(symbols[i % positions], 'LONG', size, 10, price)
+    check_ns = (time.perf_counter() - start) / checks * 1e9
+
+    # The previous implementation: an O(n) sum on every check
+    baseline_checks = max(checks // 100, 1)
+    start = time.perf_counter()
+    for _ in range(baseline_checks):
+        sum(pos['risk_amount'] for pos in manager.open_positions.values())
+    linear_ns = (time.perf_counter() - start) / baseline_checks * 1e9
+
+    keys = list(manager.open_positions)
+    start = time.perf_counter()
+    for key in keys:
+        manager.resize_position(key, Decimal('0.25'), risk_amount=Decimal('0.0005'))
+    resize_us = (time.perf_counter() - start) / len(keys) * 1e6
+
+    expected_risk = sum(pos['risk_amount'] for pos in manager.open_positions.values())
+    consistent = manager.total_risk == expected_risk
+
+    start = time.perf_counter()
+    for key in keys:
+        manager.close_position(key)
+    close_us = (time.perf_counter() - start) / len(keys) * 1e6
+
+    return {
+        'positions': positions,
+        'open_us': round(open_us, 2),
+        'resize_us': round(resize_us, 2),
+        'close_us': round(close_us, 2),
+        'check_ns': round(check_ns, 1),
+        'linear_sum_check_ns': round(linear_ns, 1),
+        'aggregates_consistent': (consistent and not manager.symbol_exposure
+                                  and manager.total_risk == 0)
+    }
+
+
+def bench_position_sizing(burst: int = 64, large: int = 10000,
+                          rounds: int = 200) -> Dict:
+    """Size a burst of signals one by one in Decimal versus one NumPy batch,
+    and measure how far the batch results drift from the Decimal ones"""
+    manager = RiskManager({'maxPositionSize': 1e9})
+    rng = np.random.default_rng(7)
+    balances = rng.uniform(100, 1e6, large).round(2)
+    entries = rng.uniform(0.01, 100000, large)
+    stops = entries * (1 - rng.uniform(0.0001, 0.2, large))
+    stops[::4] = np.nan  # default stop
+
+    def scalar(count):
+        sized = []
+        for i in range(count):
+            stop = None if np.isnan(stops[i]) else Decimal(str(stops[i]))
+            sized.append(manager.calculate_position_size(
+                Decimal(str(balances[i])), Decimal(str(entries[i])), stop))
+        return sized
+
+    results = {}
+    for name, count, repeat in (('burst', burst, rounds), ('large', large, 1)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            expected = scalar(count)
+        scalar_us = (time.perf_counter() - start) / repeat * 1e6
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            batch = manager.calculate_position_sizes(balances[:count], entries[:count],
+                                                     stops[:count], leverages=10)
+        batch_us = (time.perf_counter() - start) / repeat * 1e6
+        results[name] = {'signals': count, 'decimal_us': round(scalar_us, 1),
+                         'numpy_us': round(batch_us, 1),
+                         'speedup': round(scalar_us / batch_us, 1)}
+
+    errors = {}
+    for field in ('size', 'risk_amount', 'stop_loss', 'take_profit'):
+        errors[field] = max(
+            abs(float((Decimal(float(batch[field][i])) - row[field]) / row[field]))
+            for i, row in enumerate(expected))
+    results['max_relative_error'] = errors
+    results['within_tolerance'] = (errors['size'] <= BATCH_SIZE_RTOL and
+                                   all(errors[field] <= BATCH_RTOL
+                                       for field in errors if field != 'size'))
+    results['gates'] = _position_gates_agreement(rng)
+    return results
+
+
+def _position_gates_agreement(rng, signals: int = 2000) -> Dict:
+    """Batch 'allowed' versus can_open_position on a book where the
+    per-symbol exposure and portfolio VaR limits both bind"""
+    manager = RiskManager({'maxPositionSize': 1e9, 'maxTotalRisk': 1e12,
+                           'maxSymbolExposure': 50000, 'maxPortfolioVaR': 1500})
+    names = [f'SYM{i}USDT' for i in range(8)]
+    prices = dict.fromkeys(names, 100.0)
+    for _ in range(30):
+        prices = {name: price * float(np.exp(rng.normal(0, 0.01)))
+                  for name, price in prices.items()}
+        manager.var_engine.update_prices(prices)
+    for i, name in enumerate(names[:6]):
+        manager.open_position(name, 'LONG' if i % 2 else 'SHORT',
+                              Decimal(str(40 * (i + 1))), Decimal('100'))
+
+    symbols = np.array(names)[rng.integers(0, len(names), signals)]
+    sides = np.where(rng.random(signals) < 0.5, 'LONG', 'SHORT')
+    entries = rng.uniform(50, 150, signals)
+    balances = rng.uniform(1e3, 6e4, signals)
+    batch = manager.calculate_position_sizes(balances, entries, leverages=5,
+                                             symbols=symbols, sides=sides)
+    decisions = [manager.can_open_position(str(symbols[i]), str(sides[i]),
+                                           Decimal(str(batch['size'][i])),
+                                           5, Decimal(str(entries[i])))
+                 for i in range(signals)]
+    scalar = np.array([decision['allowed'] for decision in decisions])
+    reasons = {}
+    for decision in decisions:
+        if not decision['allowed']:
+            reason = decision['reason']
+            kind = ('exposure' if 'exposure' in reason else
+                    'var' if 'VaR' in reason else 'other')
+            reasons[kind] = reasons.get(kind, 0) + 1
+    mismatches = int((batch['allowed'] != scalar).sum())
+    assert mismatches == 0, (f'{mismatches} batch gate decisions differ '
+                             'from can_open_position')
+    assert reasons.get('exposure') and reasons.get('var'), (
+        'the exposure and VaR limits should both bind')
+    return {'signals': signals, 'allowed': int(scalar.sum()), 'rejected': reasons,
+            'mismatches': mismatches}
+
+
+def _stop_fixture(positions: int, symbols: int, ticks: int, seed: int = 11):
+    """Random positions and a random-walk tick tape over the same symbols"""
+    rng = np.random.default_rng(seed)
+    names = [f'SYM{i}USDT' for i in range(symbols)]
+    rows = []
+    for i in range(positions):
+        long = bool(i % 2)
+        entry = float(rng.uniform(95, 105))
+        away = float(rng.uniform(0.01, 0.05))
+        target = float(rng.uniform(0.03, 0.10))
+        stop = entry * (1 - away if long else 1 + away)
+        take_profit = entry * (1 + target if long else 1 - target)
+        rows.append((f'p{i}', names[i % symbols], 'LONG' if long else 'SHORT', entry,
+                     stop, take_profit, 1.0 if i % 4 < 2 else None))
+    steps = rng.normal(0, 0.001, (ticks, symbols))
+    paths = 100 * np.exp(np.cumsum(steps, axis=0))
+    tape = [(names[t % symbols], float(paths[t, t % symbols])) for t in range(ticks)]
+    return rows, tape
+
+
+def _scan_stops(rows, tape, breakeven_percent: float = 2.0) -> Dict:
+    """Reference implementation: re-check every position on every tick"""
+    engine = StopEngine(breakeven_percent=breakeven_percent)
+    for key, symbol, side, entry, stop, take_profit, trailing in rows:
+        engine.track(key, symbol, side, entry, stop, take_profit,
+                     trailing_percent=trailing)
+    by_symbol: Dict[str, List] = {}
+    for key, position in engine.positions.items():
+        by_symbol.setdefault(position['symbol'], []).append((key, position))
+
+    events = []
+    for symbol, price in tape:
+        live = []
+        for key, position in by_symbol.get(symbol, []):
+            long = position['long']
+            stop = position['stop_loss']
+            take_profit = position['take_profit']
+            if (price <= stop) if long else (price >= stop):
+                events.append((key, 'stop_loss', stop))
+                continue
+            if take_profit and ((price >= take_profit) if long
+                                else (price <= take_profit)):
+                events.append((key, 'take_profit', stop))
+                continue
+            live.append((key, position))
+            better = max if long else min
+            new_stop, kind = stop, None
+            breakeven_at = position['breakeven_at']
+            if breakeven_at is not None and ((price >= breakeven_at) if long
+                                             else (price <= breakeven_at)):
+                position['breakeven_at'] = None
+                if better(new_stop, position['entry_price']) != new_stop:
+                    new_stop, kind = position['entry_price'], 'breakeven'
+            if position['trail']:
+                threshold = engine._trailing_threshold(position)
+                if (price >= threshold) if long else (price <= threshold):
+                    trail = position['trail']
+                    trailed = price * (1 - trail if long else 1 + trail)
+                    if better(new_stop, trailed) != new_stop:
+                        new_stop, kind = trailed, 'trailing'
+            if kind:
+                position['stop_loss'] = new_stop
+                if kind == 'trailing':
+                    position['extreme'] = price
+                events.append((key, kind, new_stop))
+        by_symbol[symbol] = live
+    stops = {key: p['stop_loss'] for live in by_symbol.values() for key, p in live}
+    return {'events': events, 'stops': stops}
+
+
+def bench_stop_engine(positions: int = 10000, symbols: int = 10, ticks: int = 100000,
+                      scan_ticks: int = 2000) -> Dict:
+    """Replay a tick tape through the heap-indexed StopEngine and through a
+    full scan of every position per tick"""
+    rows, tape = _stop_fixture(positions, symbols, ticks)
+
+    def build():
+        engine = StopEngine()
+        for key, symbol, side, entry, stop, take_profit, trailing in rows:
+            engine.track(key, symbol, side, entry, stop, take_profit,
+                         trailing_percent=trailing)
+        return engine
+
+    engine = build()
+    start = time.perf_counter()
+    events = engine.on_ticks(tape)
+    indexed_us = (time.perf_counter() - start) / ticks * 1e6
+
+    start = time.perf_counter()
+    expected = _scan_stops(rows, tape[:scan_ticks])
+    scan_us = (time.perf_counter() - start) / scan_ticks * 1e6
+
+    # Same tape prefix through a fresh engine must agree with the scan
+    check = build()
+    got = check.on_ticks(tape[:scan_ticks])
+    got_events = sorted((e.key, e.kind, e.stop_loss) for e in got)
+    got_stops = {key: p['stop_loss'] for key, p in check.positions.items()}
+    consistent = (got_events == sorted(expected['events']) and
+                  got_stops == expected['stops'])
+
+    kinds: Dict[str, int] = {}
+    for event in events:
+        kinds[event.kind] = kinds.get(event.kind, 0) + 1
+    return {
+        'positions': positions,
+        'ticks': ticks,
+        'indexed_us_per_tick': round(indexed_us, 2),
+        'scan_us_per_tick': round(scan_us, 2),
+        'speedup': round(scan_us / indexed_us, 1),
+        'events': kinds,
+        'consistent_with_scan': consistent
+    }
+
+
+def bench_var(symbols: int = 200, bars: int = 500, queries: int = 100000) -> Dict:
+    """EWMA covariance updates per bar and O(1) "VaR if I add this" queries,
+    checked against a full w'Σw recomputation"""
+    rng = np.random.default_rng(5)
+    names = [f'SYM{i}USDT' for i in range(symbols)]
+    factor = rng.normal(0, 0.01, bars)
+    returns = (factor[:, None] * rng.uniform(0.5, 1.5, symbols) +
+               rng.normal(0, 0.005, (bars, symbols)))
+
+    engine = CovarianceVaR()
+    start = time.perf_counter()
+    for row in returns:
+        engine.update_returns(dict(zip(names, row, strict=True)))
+    update_us = (time.perf_counter() - start) / bars * 1e6
+
+    for name in names:
+        engine.add_exposure(name, float(rng.uniform(-1000, 1000)))
+
+    candidates = [(names[i % symbols], float(rng.uniform(-500, 500)))
+                  for i in range(queries)]
+    start = time.perf_counter()
+    for name, delta in candidates:
+        engine.var_with(name, delta)
+    query_ns = (time.perf_counter() - start) / queries * 1e9
+
+    n = len(engine.symbols)
+    cov = engine._cov[:n, :n]
+    exposure = engine._exposure[:n].copy()
+
+    def full(name, delta):
+        w = exposure.copy()
+        w[engine._index[name]] += delta
+        return engine._z * float(np.sqrt(w @ cov @ w))
+
+    full_queries = max(queries // 100, 1)
+    start = time.perf_counter()
+    worst = 0.0
+    for name, delta in candidates[:full_queries]:
+        expected = full(name, delta)
+        worst = max(worst, abs(engine.var_with(name, delta) - expected) / expected)
+    full_ns = (time.perf_counter() - start) / full_queries * 1e9
+
+    return {
+        'symbols': symbols,
+        'bar_update_us': round(update_us, 1),
+        'var_with_ns': round(query_ns, 1),
+        'full_recompute_ns': round(full_ns, 1),
+        'max_relative_error': worst
+    }
+
+
+def bench_backtest(bars: int = 525_600) -> Dict:
+    """Bars/sec of the bar loop and the vectorised core over a year of
+    1-minute golden data, and whether they agree trade for trade"""
+    tester = Backtester('', '')
+    df = tester.analyze_signals(golden_ohlcv(bars))
+
+    results = {}
+    for name, vectorized in (('loop', False), ('vectorized', True)):
+        start = time.perf_counter()
+        results[name] = tester.simulate_trades(df, 1000.0, 0.02, vectorized=vectorized)
+        elapsed = time.perf_counter() - start
+        results[f'{name}_bars_per_sec'] = round(bars / elapsed)
+
+    loop, vectorized = results.pop('loop'), results.pop('vectorized')
+    speedup = results['vectorized_bars_per_sec'] / results['loop_bars_per_sec']
+    return dict(results,
+                bars=bars,
+                trades=len(loop['trades']),
+                speedup=round(speedup, 1),
+                identical=loop == vectorized)
+
+
+def _bitwise_equal(batch, streamed) -> bool:
+    a = np.asarray(batch, dtype=float)
+    b = np.asarray(streamed, dtype=float)
+    same = (a.view(np.int64) == b.view(np.int64)) | (np.isnan(a) & np.isnan(b))
+    return bool(a.shape == b.shape and np.all(same))
+
+
+def bench_indicators(bars: int = 200_000) -> Dict:
+    """Per-bar cost of each streaming indicator, batch throughput, and
+    whether the two forms agree bit for bit"""
+    df = golden_ohlcv(bars)
+    high, low, close, volume = (df[c].to_numpy()
+                                for c in ('high', 'low', 'close', 'volume'))
+    cases = {
+        'ema': (lambda: indicators.EMA(span=21),
+                lambda: indicators.ema(close, span=21),
+                (close,)),
+        'sma': (lambda: indicators.SMA(20),
+                lambda: indicators.sma(close, 20),
+                (close,)),
+        'rsi': (lambda: indicators.RSI(14),
+                lambda: indicators.rsi(close, 14),
+                (close,)),
+        'atr': (lambda: indicators.ATR(14),
+                lambda: indicators.atr(high, low, close, 14),
+                (high, low, close)),
+        'bollinger': (lambda: indicators.Bollinger(20),
+                      lambda: indicators.bollinger(close, 20),
+                      (close,)),
+        'vwap': (lambda: indicators.VWAP(),
+                 lambda: indicators.vwap(high, low, close, volume),
+                 (high, low, close, volume)),
+        'macd': (lambda: indicators.MACD(),
+                 lambda: indicators.macd(close),
+                 (close,)),
+    }
+    results = {}
+    for name, (make, batch, inputs) in cases.items():
+        rows = list(zip(*(column.tolist() for column in inputs), strict=True))
+        indicator = make()
+        start = time.perf_counter()
+        streamed = [indicator.update(*row) for row in rows]
+        stream_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = batch()
+        batch_s = time.perf_counter() - start
+
+        if isinstance(expected, tuple):
+            identical = all(_bitwise_equal(column, [value[i] for value in streamed])
+                            for i, column in enumerate(expected))
+        else:
+            identical = _bitwise_equal(expected, streamed)
+        results[name] = {'stream_us_per_bar': round(stream_s / bars * 1e6, 3),
+                         'batch_bars_per_sec': round(bars / batch_s),
+                         'identical': identical}
+
+    signal = CrossoverSignal()
+    streamed = [signal.update(price) for price in close.tolist()]
+    results['crossover_signal_identical'] = bool(np.array_equal(
+        crossover_signals(close)['signal'], streamed))
+    return results
+
+
+def bench_streaming_backtest(bars: int = 525_600, chunk_bars: int = 10_000) -> Dict:
+    """Peak traced memory of a whole-range backtest against the paged one
+    at two range lengths, and whether they agree"""
+    tester = PagedGoldenBacktester(bars)
+    start = datetime.fromtimestamp(tester.frame['timestamp'].iloc[0] / 1000)
+    config = {'startDate': start.strftime('%Y-%m-%d'), 'initialBalance': 1000,
+              'pairs': ['BTC/USDT'], 'equityInterval': '1h'}
+
+    results, peaks, seconds = {}, {}, {}
+    for days in (bars // 1440 // 8, bars // 1440):
+        config['endDate'] = (start + timedelta(days=days)).strftime('%Y-%m-%d')
+        for name, extra in (('whole', {}), ('streamed', {'chunkBars': chunk_bars})):
+            began = time.perf_counter()
+            tracemalloc.start()
+            results[name] = tester.run_backtest(dict(config, **extra))
+            peak = tracemalloc.get_traced_memory()[1]
+            peaks.setdefault(name, {})[days] = round(peak / 2**20, 2)
+            tracemalloc.stop()
+            seconds[name] = round(time.perf_counter() - began, 2)
+
+    return {
+        'bars': bars,
+        'chunk_bars': chunk_bars,
+        'peak_mb_by_days': peaks,
+        'traced_s': seconds,
+        'trades': len(results['whole']['trades']),
+        'identical': results['whole'] == results['streamed']
+    }
+
+
+def bench_parallel_backtest(pairs: int = 8, bars: int = 200_000) -> Dict:
+    """Sequential run_backtest against the process pool on the same pairs"""
+    config = {'startDate': '2024-01-01', 'endDate': '2024-06-01',
+              'initialBalance': 1000, 'pairs': [f'PAIR{i}/USDT' for i in range(pairs)]}
+    tester = GoldenBacktester(bars)
+
+    start = time.perf_counter()
+    sequential = tester.run_backtest(config)
+    sequential_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = tester.run_backtest(config, workers=0)
+    parallel_s = time.perf_counter() - start
+
+    return {
+        'pairs': pairs,
+        'bars_per_pair': bars,
+        'cpus': os.cpu_count(),
+        'sequential_s': round(sequential_s, 3),
+        'parallel_s': round(parallel_s, 3),
+        'speedup': round(sequential_s / parallel_s, 2),
+        'identical': sequential == parallel
+    }
+
+
+def bench_sweep(pairs: int = 2, bars: int = 100_000) -> Dict:
+    """A 108-point grid with memoised indicators and pruning, against one
+    backtest per combination recomputing everything"""
+    config = {'startDate': '2024-01-01', 'endDate': '2024-03-01',
+              'initialBalance': 1000, 'pairs': [f'PAIR{i}/USDT' for i in range(pairs)]}
+    grid = {'stop_loss_percent': [1, 2, 3], 'take_profit_percent': [3, 6, 9],
+            'leverage': [None, 5], 'fast_period': [5, 9, 13], 'slow_period': [21, 34]}
+    tester = GoldenBacktester(bars)
+
+    sweep = ParameterSweep(tester, grid)
+    start = time.perf_counter()
+    table = sweep.run(config)
+    sweep_s = time.perf_counter() - start
+
+    # Naive: refetch and recompute per combination; timed on a sample
+    sample = sweep.combinations()[::9]
+    start = time.perf_counter()
+    for combo in sample:
+        naive = GoldenBacktester(bars, stop_loss_percent=combo['stop_loss_percent'],
+                                 take_profit_percent=combo['take_profit_percent'],
+                                 leverage=combo['leverage'])
+        for pair in config['pairs']:
+            df = naive.analyze_signals(naive.get_historical_data(pair, 0, 0),
+                                       combo['fast_period'], combo['slow_period'])
+            naive.simulate_trades(df, 1000.0 / pairs)
+    naive_s = (time.perf_counter() - start) / len(sample) * len(table)
+
+    # The best row must match a plain run_backtest with its parameters
+    best = table.iloc[0]
+    leverage = None if pd.isna(best['leverage']) else best['leverage']
+    check = GoldenBacktester(bars, stop_loss_percent=best['stop_loss_percent'],
+                             take_profit_percent=best['take_profit_percent'],
+                             leverage=leverage)
+    final = 0.0
+    for pair in config['pairs']:
+        df = check.analyze_signals(check.get_historical_data(pair, 0, 0),
+                                   int(best['fast_period']), int(best['slow_period']))
+        final += check.simulate_trades(df, 1000.0 / pairs)['final_capital']
+
+    best_row = table.iloc[:1][list(grid) + ['total_return', 'max_drawdown']]
+    return dict(sweep.stats,
+                sweep_s=round(sweep_s, 3),
+                naive_estimate_s=round(naive_s, 3),
+                speedup=round(naive_s / sweep_s, 1),
+                best=json.loads(best_row.to_json(orient='records'))[0],
+                best_matches_backtest=bool(final == best['final_equity']))
+
+
+def bench_tick_backtest(trades: int = 1_000_000) -> Dict:
+    """Replay a recorded tape and depth through the crossover strategy with
+    latency, and compare with the bar backtest on the same data"""
+    with tempfile.TemporaryDirectory() as directory:
+        trades_path, depth_path = golden_ticks(directory, trades)
+
+        def replay(limit=None):
+            strategy = SignalBracketStrategy(bar_ms=60_000, leverage=10)
+            tape = itertools.islice(read_trades(trades_path), limit)
+            backtest = TickBacktest('BTCUSDT', tape, strategy,
+                                    depth=read_depth(depth_path),
+                                    latency=LatencyModel(order_ms=50, jitter_ms=20,
+                                                         seed=1),
+                                    initial_balance=1000.0, taker_fee=0.0002)
+            return strategy, backtest.run()
+
+        start = time.perf_counter()
+        strategy, result = replay()
+        elapsed = time.perf_counter() - start
+
+        # Peak traced memory should not grow with the length of the tape
+        peaks = {}
+        for limit in (trades // 10, trades):
+            tracemalloc.start()
+            replay(limit)
+            peaks[limit] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            tracemalloc.stop()
+
+        # The same tape as 1-minute bars through the Backtester
+        ticks = pd.read_csv(trades_path)
+        bars = ticks.groupby(ticks['timestamp'] - ticks['timestamp'] % 60_000).agg(
+            open=('price', 'first'), high=('price', 'max'), low=('price', 'min'),
+            close=('price', 'last'), volume=('quantity', 'sum')).reset_index()
+        tester = Backtester('', '', leverage=10)
+        bar_result = tester.simulate_trades(tester.analyze_signals(bars), 1000.0)
+
+    exits = [b['exit'] for b in strategy.brackets if 'exit' in b]
+    return {
+        'events': result['events'],
+        'events_per_sec': round(result['events'] / elapsed),
+        'events_per_min': round(result['events'] / elapsed * 60),
+        'replay_s': round(elapsed, 2),
+        'peak_mb_by_trades': peaks,
+        'brackets': len(strategy.brackets),
+        'bar_trades': len(bar_result['trades']),
+        'tick_return_pct': round(result['total_return'], 3),
+        'bar_return_pct': round(bar_result['total_return'], 3),
+        'fees': round(result['fees'], 4),
+        'stop_exits': sum(1 for f in exits if f.order_type == 'STOP_MARKET')
+    }
+
+
+def bench_backtest_service(pairs: int = 4, bars: int = 200_000) -> Dict:
+    """Time to first progress event and to result for a new job, and the
+    latency of resubmitting the same config"""
+    config = {'startDate': '2024-01-01', 'endDate': '2024-06-01',
+              'initialBalance': 1000, 'pairs': [f'PAIR{i}/USDT' for i in range(pairs)]}
+    with tempfile.TemporaryDirectory() as directory:
+        service = BacktestService(lambda: GoldenBacktester(bars), max_workers=2,
+                                  cache_dir=directory)
+        try:
+            start = time.perf_counter()
+            job_id = service.submit(config)
+            first_partial = None
+            for event in service.watch(job_id):
+                if event['type'] == 'partial' and first_partial is None:
+                    first_partial = time.perf_counter() - start
+            result = service.result(job_id)
+            cold_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cached_id = service.submit(dict(config, running=False))
+            cached = service.result(cached_id)
+            cached_ms = (time.perf_counter() - start) * 1000
+        finally:
+            service.close()
+
+    return {
+        'pairs': pairs,
+        'first_progress_s': round(first_partial, 3),
+        'cold_s': round(cold_s, 3),
+        'cached_ms': round(cached_ms, 3),
+        'cache_hit': service.status(cached_id)['cached'],
+        'identical': cached == result
+    }
+
+
+def bench_monte_carlo(trades: int = 1000, simulations: int = 10_000) -> Dict:
+    """Bootstrap and shuffle simulations of a trade history, with a sample
+    of bootstrap paths replayed trade by trade as a check"""
+    rng = np.random.default_rng(11)
+    profit = rng.normal(0.2, 2.0, trades)
+    history = [{'date': i, 'pnl': float(p * 10), 'profit': float(p)}
+               for i, p in enumerate(profit)]
+
+    timings, reports = {}, {}
+    for method in monte_carlo.METHODS:
+        start = time.perf_counter()
+        report = monte_carlo.monte_carlo(history, simulations=simulations,
+                                         methods=(method,))
+        reports[method] = report[method]
+        timings[f'{method}_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    increments = monte_carlo.trade_increments(history)
+    paths = monte_carlo.simulate(increments, 100, seed=3)
+    indices = np.random.default_rng(3).integers(0, trades, size=(100, trades))
+    worst = 0.0
+    for row, sample in enumerate(indices):
+        equity = peak = 1000.0
+        drawdown = 0.0
+        for i in sample.tolist():
+            equity *= 1 + history[i]['profit'] / 100
+            peak = max(peak, equity)
+            drawdown = max(drawdown, (peak - equity) / peak * 100)
+        worst = max(worst, abs(paths['final_equity'][row] - equity) / equity,
+                    abs(paths['max_drawdown'][row] - drawdown) / max(drawdown, 1e-12))
+
+    return {
+        'trades': trades,
+        'simulations': simulations,
+        **timings,
+        'bootstrap_final_p5_p50_p95': [round(reports['bootstrap']['final_equity'][q], 2)
+                                       for q in ('p5', 'p50', 'p95')],
+        'shuffle_drawdown_p5_p50_p95': [round(reports['shuffle']['max_drawdown'][q], 2)
+                                        for q in ('p5', 'p50', 'p95')],
+        'max_relative_error': worst
+    }
+
+
+def bench_ohlcv_cache(bars: int = 525_600) -> Dict:
+    """Cold fill, warm memory-mapped load and incremental gap fill of a
+    year of 1-minute klines"""
+    source = golden_ohlcv(bars, start=0)
+    fetched = []
+
+    def fetch(start, end):
+        timestamps = source['timestamp'].to_numpy()
+        lo = np.searchsorted(timestamps, start)
+        hi = np.searchsorted(timestamps, end, side='right')
+        rows = source.iloc[lo:hi]
+        fetched.append(len(rows))
+        return rows
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = OHLCVCache(directory)
+        last = int(source['timestamp'].iloc[-1])
+        half = last // 2
+
+        start = time.perf_counter()
+        cache.get('BTCUSDT', '1m', 0, half, fetch)
+        cold_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df = cache.get('BTCUSDT', '1m', 0, last, fetch)
+        extend_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(100):
+            df = cache.get('BTCUSDT', '1m', 0, last, fetch)
+            df['close'].to_numpy().sum()
+        warm_ms = (time.perf_counter() - start) / 100 * 1000
+
+        return {
+            'bars': len(df),
+            'cold_fill_s': round(cold_s, 3),
+            'extend_s': round(extend_s, 3),
+            'warm_load_ms': round(warm_ms, 3),
+            'rows_fetched': fetched,
+            'cache_bytes': cache.size(),
+            'identical': bool((df.to_numpy() == source.to_numpy()).all())
+        }
+
+
+BENCHMARKS = {
+    'backtest': bench_backtest,
+    'backtest_service': bench_backtest_service,
+    'http_pool': bench_http_pool,
+    'indicators': bench_indicators,
+    'monte_carlo': bench_monte_carlo,
+    'ohlcv_cache': bench_ohlcv_cache,
+    'parallel_backtest': bench_parallel_backtest,
+    'position_sizing': bench_position_sizing,
+    'price_book': bench_price_book,
+    'risk_manager': bench_risk_manager,
+    'simulator': bench_simulator,
+    'stop_engine': bench_stop_engine,
+    'streaming_backtest': bench_streaming_backtest,
+    'sweep': bench_sweep,
+    'tick_backtest': bench_tick_backtest,
+    'var': bench_var,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    names = ', '.join(sorted(BENCHMARKS))
+    parser.add_argument('names', nargs='*',
+                        help=f'Benchmarks to run (default: all): {names}')
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f'Unknown benchmark(s): {", ".join(unknown)}')
+    for name in args.names or sorted(BENCHMARKS):
+        print(f'{name}: {json.dumps(BENCHMARKS[name](), indent=2)}')
+
+
+if __name__ == '__main__':
+    main()
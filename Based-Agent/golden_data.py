@@ -0,0 +1,94 @@
+"""Deterministic golden datasets shared by the tests and benchmarks.py:
+a 1-minute OHLCV random walk, Backtesters that read it instead of the
+exchange, and a trade tape with depth snapshots for tick_backtest.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import tick_backtest
+from backtester import Backtester
+from tick_backtest import DepthSnapshot, TradeTick
+
+
+def golden_ohlcv(bars: int, seed: int = 42,
+                 start: int = 1_600_000_000_000) -> pd.DataFrame:
+    """Deterministic 1-minute OHLCV random walk used as the golden dataset"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, bars)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.0015, bars)) * close
+    return pd.DataFrame({
+        'timestamp': start + 60_000 * np.arange(bars),
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(1, 10, bars)
+    })
+
+
+class GoldenBacktester(Backtester):
+    """Backtester that reads golden data instead of the exchange, seeded per pair"""
+
+    def __init__(self, bars: int = 100_000, **kwargs):
+        super().__init__('', '', **kwargs)
+        self.bars = bars
+
+    def get_historical_data(self,
+                            pair: str,
+                            _start_time: int,
+                            _end_time: int) -> pd.DataFrame:
+        return golden_ohlcv(self.bars, seed=sum(map(ord, pair)))
+
+
+class PagedGoldenBacktester(Backtester):
+    """Backtester whose exchange is a golden dataset held outside the run:
+    downloads copy out the requested range, as a real fetch allocates it"""
+
+    def __init__(self, bars: int = 100_000, **kwargs):
+        super().__init__('', '', **kwargs)
+        self.frame = golden_ohlcv(bars)
+
+    def _download(self, _symbol: str, start_time: int, end_time: int) -> pd.DataFrame:
+        timestamps = self.frame['timestamp'].to_numpy()
+        lo, hi = np.searchsorted(timestamps, [start_time, end_time + 1])
+        return self.frame.iloc[lo:hi].reset_index(drop=True).copy()
+
+
+def golden_ticks(directory: str,
+                 trades: int,
+                 seed: int = 7,
+                 start: int = 1_600_000_000_000,
+                 depth_every_ms: int = 250,
+                 levels: int = 20) -> tuple:
+    """Write a random-walk trade tape and depth snapshots around it to
+    directory. Returns the two file paths"""
+    rng = np.random.default_rng(seed)
+    timestamps = start + np.cumsum(rng.exponential(20.0, trades)).astype(np.int64)
+    prices = np.round(50000.0 * np.exp(np.cumsum(rng.normal(0, 0.0002, trades))), 1)
+    quantities = np.round(rng.exponential(0.05, trades), 4) + 0.0001
+    sides = np.where(rng.random(trades) < 0.5, 'BUY', 'SELL')
+    trades_path = os.path.join(directory, 'trades.csv')
+    columns = (timestamps.tolist(), prices.tolist(), quantities.tolist(),
+               sides.tolist())
+    ticks = map(TradeTick._make, zip(*columns, strict=True))
+    tick_backtest.write_trades(trades_path, ticks)
+
+    depth_times = np.arange(timestamps[0], timestamps[-1], depth_every_ms)
+    latest = np.searchsorted(timestamps, depth_times, side='right') - 1
+    mids = prices[np.maximum(latest, 0)]
+    offsets = np.arange(levels) * 0.5 + 0.5
+    sizes = np.round(rng.exponential(0.5, (len(depth_times), 2, levels)), 3) + 0.001
+    depth_path = os.path.join(directory, 'depth.jsonl')
+
+    def snapshot(t: int, mid: float, size: np.ndarray) -> DepthSnapshot:
+        bids = (mid - offsets).round(1).tolist()
+        asks = (mid + offsets).round(1).tolist()
+        return DepthSnapshot(int(t), list(zip(bids, size[0].tolist(), strict=True)),
+                             list(zip(asks, size[1].tolist(), strict=True)))
+
+    tick_backtest.write_depth(depth_path, (snapshot(*row) for row in zip(
+        depth_times.tolist(), mids.tolist(), sizes, strict=True)))
+    return trades_path, depth_path
@@ -0,0 +1,320 @@
+"""Technical indicators in two forms that agree bit for bit.
+
+The streaming classes take one bar at a time in O(1) with a few floats of
+state (SMA and Bollinger also keep their window), for live trading. The
+module functions compute a whole column at once for backtests. EMA and RSI
+can also take a chunk of bars at once (update_many), for backtests that
+page through history. Both forms produce exactly the same floats because
+each pair performs the same IEEE operations in the same order:
+
+- EMA, RSI, ATR and MACD are recursive. The batch forms use pandas' ewm
+  (adjust=False) and the streaming classes replay its recurrence,
+  including how it derives alpha and how it steps over NaN (with its
+  special case for alpha = 0.5).
+- SMA, Bollinger and VWAP are differences and ratios of running sums.
+  Both forms build the sums by sequential addition, which is what
+  np.cumsum does. SMA and Bollinger add values relative to the first one,
+  so the sums stay small and lose no precision on long series.
+
+Inputs to SMA, Bollinger and VWAP must be finite.
+"""
+import math
+from collections import deque
+from typing import Deque, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class BollingerBands(NamedTuple):
+    middle: float
+    upper: float
+    lower: float
+
+class MACDValue(NamedTuple):
+    macd: float
+    signal: float
+    histogram: float
+
+def _center_of_mass(span: Optional[float], alpha: Optional[float]) -> float:
+    if (span is None) == (alpha is None):
+        raise ValueError("Pass exactly one of span or alpha")
+    return float((span - 1) / 2 if span is not None else (1 - alpha) / alpha)
+
+def _divide(a: float, b: float) -> float:
+    """a / b with IEEE semantics, as NumPy divides"""
+    if b == 0:
+        if a == 0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+def _ewm(x: np.ndarray, com: float) -> np.ndarray:
+    return pd.Series(x).ewm(com=com, adjust=False).mean().to_numpy()
+
+def ema(values,
+        span: Optional[float] = None,
+        alpha: Optional[float] = None) -> np.ndarray:
+    """Exponential moving average (first value seeds it)"""
+    return _ewm(np.asarray(values, dtype=float), _center_of_mass(span, alpha))
+
+class EMA:
+    """Streaming ema()"""
+    __slots__ = ('alpha', '_com', '_decay', '_old_weight', '_started', 'value')
+
+    def __init__(self, span: Optional[float] = None, alpha: Optional[float] = None):
+        self._com = _center_of_mass(span, alpha)
+        self.alpha = 1.0 / (1.0 + self._com)
+        self._decay = 1.0 - self.alpha
+        self._old_weight = 1.0
+        self._started = False
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        if not self._started:
+            self._started = True
+            self.value = x
+            return x
+        weighted = self.value
+        if weighted == weighted:
+            old_weight = self._old_weight * self._decay
+            if x == x:
+                if weighted != x:
+                    # pandas reweights the new value after gaps when com == 1
+                    new_weight = 1.0 - old_weight if self._com == 1 else self.alpha
+                    weighted = old_weight * weighted + new_weight * x
+                    weighted /= old_weight + new_weight
+                self._old_weight = 1.0
+            else:
+                # Missing values keep decaying the old weight
+                self._old_weight = old_weight
+        elif x == x:
+            weighted = x
+        self.value = weighted
+        return weighted
+
+    def update_many(self, values) -> np.ndarray:
+        """update() over a chunk, returning every value. Once the state is
+        a finite value (old weight 1), pandas continues from it exactly as
+        from a first observation, so the rest of the chunk is handed to
+        ewm seeded with it; anything up to the chunk's last NaN is stepped
+        one at a time"""
+        x = np.asarray(values, dtype=float)
+        out = np.empty(len(x))
+        gaps = np.flatnonzero(np.isnan(x))
+        last_gap = int(gaps[-1]) if len(gaps) else -1
+        i = 0
+        while i < len(x) and (i <= last_gap or
+                              (self._started and
+                               not (self.value == self.value and
+                                    self._old_weight == 1.0))):
+            out[i] = self.update(x[i])
+            i += 1
+        if i < len(x):
+            if self._started:
+                out[i:] = _ewm(np.concatenate(([self.value], x[i:])), self._com)[1:]
+            else:
+                out[i:] = _ewm(x[i:], self._com)
+                self._started = True
+            self.value = float(out[-1])
+        return out
+
+def _window_sums(x: np.ndarray, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sums of (x - x[0]) and its square over each full window"""
+    centred = x - x[0]
+    sums = np.concatenate(([0.0], np.cumsum(centred)))
+    squares = np.concatenate(([0.0], np.cumsum(centred * centred)))
+    return sums[period:] - sums[:-period], squares[period:] - squares[:-period]
+
+def sma(values, period: int) -> np.ndarray:
+    """Simple moving average, NaN until the window fills"""
+    x = np.asarray(values, dtype=float)
+    out = np.full(len(x), math.nan)
+    if len(x) >= period:
+        sums, _ = _window_sums(x, period)
+        out[period - 1:] = x[0] + sums / period
+    return out
+
+class SMA:
+    """Streaming sma()"""
+    __slots__ = ('period', '_origin', '_total', '_sums', 'value')
+
+    def __init__(self, period: int):
+        self.period = period
+        self._origin = None
+        self._total = 0.0
+        self._sums: Deque[float] = deque([0.0], maxlen=period + 1)
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        if self._origin is None:
+            self._origin = x
+        self._total += x - self._origin
+        self._sums.append(self._total)
+        if len(self._sums) > self.period:
+            self.value = self._origin + (self._total - self._sums[0]) / self.period
+        return self.value
+
+def bollinger(values, period: int = 20, width: float = 2.0) -> BollingerBands:
+    """SMA with bands width population standard deviations either side"""
+    x = np.asarray(values, dtype=float)
+    middle, upper, lower = (np.full(len(x), math.nan) for _ in range(3))
+    if len(x) >= period:
+        sums, squares = _window_sums(x, period)
+        mean = sums / period
+        deviation = np.sqrt(np.maximum(squares / period - mean * mean, 0.0))
+        middle[period - 1:] = x[0] + mean
+        upper[period - 1:] = middle[period - 1:] + width * deviation
+        lower[period - 1:] = middle[period - 1:] - width * deviation
+    return BollingerBands(middle, upper, lower)
+
+class Bollinger:
+    """Streaming bollinger()"""
+    __slots__ = ('period', 'width', '_origin', '_total', '_squares', '_sums', 'value')
+
+    def __init__(self, period: int = 20, width: float = 2.0):
+        self.period = period
+        self.width = width
+        self._origin = None
+        self._total = 0.0
+        self._squares = 0.0
+        self._sums: Deque[Tuple[float, float]] = deque([(0.0, 0.0)], maxlen=period + 1)
+        self.value = BollingerBands(math.nan, math.nan, math.nan)
+
+    def update(self, x: float) -> BollingerBands:
+        x = float(x)
+        if self._origin is None:
+            self._origin = x
+        centred = x - self._origin
+        self._total += centred
+        self._squares += centred * centred
+        self._sums.append((self._total, self._squares))
+        if len(self._sums) > self.period:
+            first_total, first_squares = self._sums[0]
+            mean = (self._total - first_total) / self.period
+            variance = (self._squares - first_squares) / self.period - mean * mean
+            band = self.width * math.sqrt(max(variance, 0.0))
+            middle = self._origin + mean
+            self.value = BollingerBands(middle, middle + band, middle - band)
+        return self.value
+
+def rsi(close, period: int = 14) -> np.ndarray:
+    """Wilder's relative strength index (0-100); NaN on the first bar"""
+    delta = pd.Series(np.asarray(close, dtype=float)).diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / period, adjust=False).mean()
+    return (100 - 100 / (1 + gain / loss)).to_numpy()
+
+class RSI:
+    """Streaming rsi()"""
+    __slots__ = ('_previous', '_gain', '_loss', 'value')
+
+    def __init__(self, period: int = 14):
+        self._previous = None
+        self._gain = EMA(alpha=1 / period)
+        self._loss = EMA(alpha=1 / period)
+        self.value = math.nan
+
+    def update(self, close: float) -> float:
+        close = float(close)
+        delta = math.nan if self._previous is None else close - self._previous
+        self._previous = close
+        # max/min pass NaN through here, as clip does
+        gain = self._gain.update(max(delta, 0.0))
+        loss = self._loss.update(-min(delta, 0.0))
+        self.value = 100 - _divide(100, 1 + _divide(gain, loss))
+        return self.value
+
+    def update_many(self, close) -> np.ndarray:
+        """update() over a chunk, returning every value"""
+        close = np.asarray(close, dtype=float)
+        if not len(close):
+            return np.empty(0)
+        previous = math.nan if self._previous is None else self._previous
+        delta = np.diff(close, prepend=previous)
+        self._previous = float(close[-1])
+        gain = self._gain.update_many(np.maximum(delta, 0.0))
+        loss = self._loss.update_many(-np.minimum(delta, 0.0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = 100 - 100 / (1 + gain / loss)
+        self.value = float(values[-1])
+        return values
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """Average true range with Wilder smoothing; the first bar's range is
+    high - low"""
+    high, low, close = (np.asarray(a, dtype=float) for a in (high, low, close))
+    previous = np.concatenate(([math.nan], close[:-1]))
+    true_range = np.fmax(high - low, np.abs(high - previous))
+    true_range = np.fmax(true_range, np.abs(low - previous))
+    return ema(true_range, alpha=1 / period)
+
+class ATR:
+    """Streaming atr()"""
+    __slots__ = ('_previous', '_average', 'value')
+
+    def __init__(self, period: int = 14):
+        self._previous = None
+        self._average = EMA(alpha=1 / period)
+        self.value = math.nan
+
+    def update(self, high: float, low: float, close: float) -> float:
+        high, low = float(high), float(low)
+        true_range = high - low
+        if self._previous is not None:
+            true_range = max(true_range, abs(high - self._previous),
+                             abs(low - self._previous))
+        self._previous = float(close)
+        self.value = self._average.update(true_range)
+        return self.value
+
+def vwap(high, low, close, volume) -> np.ndarray:
+    """Volume-weighted typical price ((high + low + close) / 3) since the
+    first bar"""
+    high, low, close, volume = (np.asarray(a, dtype=float)
+                                for a in (high, low, close, volume))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.cumsum((high + low + close) / 3 * volume) / np.cumsum(volume)
+
+class VWAP:
+    """Streaming vwap(); reset() starts a new session"""
+    __slots__ = ('_value_traded', '_volume', 'value')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._value_traded = 0.0
+        self._volume = 0.0
+        self.value = math.nan
+
+    def update(self, high: float, low: float, close: float, volume: float) -> float:
+        volume = float(volume)
+        self._value_traded += (float(high) + float(low) + float(close)) / 3 * volume
+        self._volume += volume
+        self.value = _divide(self._value_traded, self._volume)
+        return self.value
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> MACDValue:
+    """MACD line (fast EMA - slow EMA), its signal EMA and the histogram"""
+    line = ema(close, span=fast) - ema(close, span=slow)
+    trigger = ema(line, span=signal)
+    return MACDValue(line, trigger, line - trigger)
+
+class MACD:
+    """Streaming macd()"""
+    __slots__ = ('_fast', '_slow', '_signal', 'value')
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._fast = EMA(span=fast)
+        self._slow = EMA(span=slow)
+        self._signal = EMA(span=signal)
+        self.value = MACDValue(math.nan, math.nan, math.nan)
+
+    def update(self, close: float) -> MACDValue:
+        line = self._fast.update(close) - self._slow.update(close)
+        trigger = self._signal.update(line)
+        self.value = MACDValue(line, trigger, line - trigger)
+        return self.value
@@ -0,0 +1,526 @@
+"""Local MEXC exchange simulator for load and latency testing.
+
+Serves the REST endpoints MEXCTrader uses from an in-memory matching engine,
+with configurable latency, jitter, error, lost-response and rate-limit
+injection, plus an optional push.ticker websocket feed for MarketDataStream:
+
+    with MEXCSimulator(SimulatorConfig(latency=0.005)) as sim:
+        bot = TradingBot('key', 'secret', base_url=sim.url)
+        bot.place_leveraged_trade('BTCUSDT', 'LONG', 0.01)
+"""
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import websockets
+
+# Orders that rest until the mark price crosses their stopPrice
+STOP_TYPES = ('STOP_MARKET', 'TAKE_PROFIT_MARKET')
+
+
+@dataclass
+class SimulatorConfig:
+    """Behaviour of the simulated exchange"""
+    latency: float = 0.0                 # Base server-side delay per request, seconds
+    jitter: float = 0.0                  # Uniform +/- jitter added to latency, seconds
+    error_rate: float = 0.0              # Probability a request fails with HTTP 500
+    drop_rate: float = 0.0               # Probability a processed response is lost
+    rate_limit: Optional[int] = None     # Requests per second before answering 429
+    initial_balance: float = 100000.0    # USDT balance
+    prices: Dict[str, float] = field(
+        default_factory=lambda: {'BTCUSDT': 50000.0, 'ETHUSDT': 3000.0})
+    tick_interval: Optional[float] = None  # Seconds between price moves (None: static)
+    volatility: float = 0.0005           # Std dev of each price move, as a fraction
+    seed: Optional[int] = None           # Seeds the simulator's own RNG
+
+class MatchingEngine:
+    """In-memory futures matching engine.
+
+    MARKET orders fill immediately at the mark price. STOP_MARKET and
+    TAKE_PROFIT_MARKET orders rest until the mark price crosses their stop
+    price, then fill at market, reduce-only: they never grow or flip a
+    position and expire if there is nothing left to close.
+    """
+
+    def __init__(self, config: SimulatorConfig):
+        self.config = config
+        self.marks: Dict[str, float] = dict(config.prices)
+        self.balance = config.initial_balance
+        self.orders: Dict[int, Dict[str, Any]] = {}
+        self.client_ids: Dict[str, int] = {}
+        self.positions: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self.leverage: Dict[str, int] = {}
+        self.margin_type: Dict[str, str] = {}
+        self.position_mode: Dict[str, str] = {}
+        self.order_count = 0
+        self.fill_count = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def mark_price(self, symbol: str) -> float:
+        if symbol not in self.marks:
+            raise KeyError(f'Unknown symbol {symbol}')
+        return self.marks[symbol]
+
+    def set_mark_price(self, symbol: str, price: float) -> List[Dict[str, Any]]:
+        """Move the mark price and trigger any crossed stop orders"""
+        with self._lock:
+            self.marks[symbol] = price
+            triggered = []
+            for order in list(self.orders.values()):
+                if order['symbol'] != symbol or order['status'] != 'NEW':
+                    continue
+                if not self._crossed(order, price):
+                    continue
+                self._fill(order, price)
+                triggered.append(order)
+            return triggered
+
+    @staticmethod
+    def _crossed(order: Dict[str, Any], price: float) -> bool:
+        stop = order['stopPrice']
+        if order['type'] == 'STOP_MARKET':
+            return price <= stop if order['side'] == 'SELL' else price >= stop
+        if order['type'] == 'TAKE_PROFIT_MARKET':
+            return price >= stop if order['side'] == 'SELL' else price <= stop
+        if order['type'] == 'LIMIT':
+            limit = order['price']
+            return price <= limit if order['side'] == 'BUY' else price >= limit
+        return False
+
+    def _position(self, symbol: str, position_side: str) -> Dict[str, float]:
+        return self.positions.setdefault((symbol, position_side),
+                                         {'amount': 0.0, 'entry_price': 0.0})
+
+    def _fill_quantity(self, order: Dict[str, Any]) -> float:
+        """Quantity order would fill now. Closing orders never grow or flip
+        a position: they fill at most its size, and nothing without one"""
+        amount = self._position(order['symbol'], order['positionSide'])['amount']
+        buying = order['side'] == 'BUY'
+        side = order['positionSide']
+        closing = (side == 'LONG' and not buying) or (side == 'SHORT' and buying)
+        if not (order['reduceOnly'] or closing):
+            return order['origQty']
+        reducing = amount != 0 and (amount > 0) != buying
+        return min(order['origQty'], abs(amount)) if reducing else 0.0
+
+    def _fill(self, order: Dict[str, Any], price: float) -> None:
+        position = self._position(order['symbol'], order['positionSide'])
+        quantity = self._fill_quantity(order)
+        if not quantity:
+            order['status'] = 'EXPIRED'
+            return
+        # Positive amounts are long exposure, negative short
+        signed = quantity if order['side'] == 'BUY' else -quantity
+        amount = position['amount']
+        reducing = amount != 0 and (amount > 0) != (signed > 0)
+
+        if not reducing:
+            # Opening or adding: average the entry price
+            new_amount = amount + signed
+            cost = position['entry_price'] * abs(amount) + price * abs(signed)
+            position['entry_price'] = cost / abs(new_amount)
+            position['amount'] = new_amount
+        else:
+            # Reducing: realise PnL on the closed part
+            closed = min(abs(signed), abs(amount))
+            direction = 1 if amount > 0 else -1
+            self.balance += (price - position['entry_price']) * closed * direction
+            position['amount'] = amount + signed
+            if position['amount'] == 0:
+                position['entry_price'] = 0.0
+            elif (position['amount'] > 0) != (amount > 0):
+                position['entry_price'] = price
+
+        order['status'] = 'FILLED'
+        order['executedQty'] = abs(signed)
+        order['avgPrice'] = price
+        order['updateTime'] = int(time.time() * 1000)
+        self.fill_count += 1
+
+    def place_order(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            symbol = params['symbol']
+            price = self.mark_price(symbol)
+            client_id = params.get('newClientOrderId')
+            if client_id and client_id in self.client_ids:
+                raise ValueError(f'Duplicate client order id {client_id}')
+
+            order_type = params['type']
+            if order_type not in ('MARKET', 'LIMIT', *STOP_TYPES):
+                raise ValueError(f'Unsupported order type {order_type}')
+            if order_type in STOP_TYPES and 'stopPrice' not in params:
+                raise ValueError('stopPrice is required')
+
+            # Symbols switched to a position mode only accept its positionSide
+            position_side = params.get('positionSide', 'BOTH')
+            mode = self.position_mode.get(symbol)
+            if mode is not None and (mode == 'ONE_WAY') != (position_side == 'BOTH'):
+                raise ValueError(
+                    f'positionSide {position_side} does not match {mode} mode')
+
+            order_id = next(self._ids)
+            order = {
+                'orderId': order_id,
+                'clientOrderId': client_id or f'sim-{order_id}',
+                'symbol': symbol,
+                'side': params['side'],
+                'type': order_type,
+                'positionSide': position_side,
+                'origQty': float(params['quantity']),
+                'executedQty': 0.0,
+                'price': float(params.get('price', 0) or 0),
+                'stopPrice': float(params.get('stopPrice', 0) or 0),
+                'avgPrice': 0.0,
+                'reduceOnly': order_type in STOP_TYPES,
+                'status': 'NEW',
+                'updateTime': int(time.time() * 1000)
+            }
+            self.orders[order_id] = order
+            self.client_ids[order['clientOrderId']] = order_id
+            self.order_count += 1
+
+            if order_type == 'MARKET' or self._crossed(order, price):
+                self._fill(order, price)
+            return dict(order)
+
+    def cancel_order(self, symbol: str, order_id: int) -> Dict[str, Any]:
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None or order['symbol'] != symbol:
+                raise KeyError(f'Unknown order {order_id}')
+            if order['status'] != 'NEW':
+                raise ValueError(f'Order {order_id} is {order["status"]}')
+            order['status'] = 'CANCELED'
+            return dict(order)
+
+    def get_order(self, symbol: str, order_id: Optional[int] = None,
+                  client_order_id: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            if order_id is None and client_order_id is not None:
+                order_id = self.client_ids.get(client_order_id)
+            order = self.orders.get(order_id)
+            if order is None or order['symbol'] != symbol:
+                raise KeyError('Order does not exist')
+            return dict(order)
+
+    def open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(o) for o in self.orders.values()
+                    if o['status'] == 'NEW'
+                    and (symbol is None or o['symbol'] == symbol)]
+
+    def position_risk(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = []
+            for (sym, side), position in self.positions.items():
+                if symbol is not None and sym != symbol:
+                    continue
+                mark = self.marks[sym]
+                pnl = (mark - position['entry_price']) * position['amount']
+                rows.append({
+                    'symbol': sym,
+                    'positionSide': side,
+                    'positionAmt': position['amount'],
+                    'entryPrice': position['entry_price'],
+                    'markPrice': mark,
+                    'unRealizedProfit': pnl,
+                    'leverage': self.leverage.get(sym, 20),
+                    'marginType': self.margin_type.get(sym, 'CROSSED')
+                })
+            return rows
+
+    def account(self) -> Dict[str, Any]:
+        with self._lock:
+            balance = {'asset': 'USDT', 'free': self.balance, 'locked': 0.0}
+            return {'balances': [balance]}
+
+class _SimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    simulator: 'MEXCSimulator' = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _params(self) -> Dict[str, Any]:
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = self.rfile.read(length)
+            if body:
+                params.update(json.loads(body))
+        return params
+
+    def _send(self, status: int, payload: Any, headers: Dict[str, str] = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self) -> None:
+        sim = self.simulator
+        params = self._params()
+        sim.count('requests')
+
+        jitter = sim.config.jitter
+        delay = sim.config.latency + sim.random.uniform(-jitter, jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if sim.rate_limited():
+            sim.count('rejected')
+            return self._send(429, {'code': 429, 'msg': 'Too many requests'},
+                              {'Retry-After': '1'})
+        if sim.config.error_rate and sim.random.random() < sim.config.error_rate:
+            sim.count('errors')
+            return self._send(500, {'code': 500, 'msg': 'Injected error'})
+
+        route = (self.command, urlsplit(self.path).path)
+        handler = sim.routes.get(route)
+        if handler is None:
+            message = f'No route {route[0]} {route[1]}'
+            return self._send(404, {'code': 404, 'msg': message})
+        try:
+            result = handler(params)
+            if sim.config.drop_rate and sim.random.random() < sim.config.drop_rate:
+                # Processed, but the client never hears back
+                sim.count('dropped')
+                self.close_connection = True
+                return
+            return self._send(200, result)
+        except KeyError as e:
+            return self._send(400, {'code': -2013, 'msg': str(e)})
+        except (ValueError, TypeError) as e:
+            return self._send(400, {'code': -1102, 'msg': str(e)})
+
+    do_GET = _handle
+    do_POST = _handle
+    do_DELETE = _handle
+
+class MEXCSimulator:
+    """Runs the matching engine behind a local HTTP server (and optional
+    push.ticker websocket) in background threads"""
+
+    def __init__(self,
+                 config: Optional[SimulatorConfig] = None,
+                 websocket: bool = False):
+        self.config = config or SimulatorConfig()
+        self.engine = MatchingEngine(self.config)
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.dropped = 0
+        self.websocket = websocket
+        self.url: Optional[str] = None
+        self.ws_url: Optional[str] = None
+
+        self._window = deque()
+        self._window_lock = threading.Lock()
+        # Handler threads bump the counters concurrently
+        self._counter_lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._ws_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ws_clients: Dict[Any, set] = {}
+        # Private so a seed never touches the process-wide RNG
+        self.random = random.Random(self.config.seed)
+
+        engine = self.engine
+        self.routes = {
+            ('GET', '/api/v3/account'): lambda _p: engine.account(),
+            ('POST', '/api/v3/order'): engine.place_order,
+            ('DELETE', '/api/v3/order'): lambda p: engine.cancel_order(
+                p['symbol'], int(p['orderId'])),
+            ('GET', '/api/v3/order'): lambda p: engine.get_order(
+                p['symbol'],
+                int(p['orderId']) if 'orderId' in p else None,
+                p.get('origClientOrderId')),
+            ('GET', '/api/v3/openOrders'): lambda p: engine.open_orders(
+                p.get('symbol')),
+            ('GET', '/api/v3/positionRisk'): lambda p: engine.position_risk(
+                p.get('symbol')),
+            ('GET', '/api/v3/leverageBracket'): lambda p: [{
+                'symbol': p['symbol'],
+                'brackets': [{'bracket': 1, 'initialLeverage': 125,
+                              'notionalCap': 50000}]
+            }],
+            ('POST', '/api/v3/marginType'): self._change_margin_type,
+            ('POST', '/api/v3/positionMode'): self._set_position_mode,
+            ('POST', '/api/v3/leverage'): self._set_leverage,
+            ('POST', '/api/v3/margin/leverage'): self._set_leverage,
+            ('GET', '/api/v3/exchangeInfo'): lambda _p: self.exchange_info(),
+            ('GET', '/api/v3/premiumIndex'): lambda p: {
+                'symbol': p['symbol'],
+                'markPrice': str(engine.mark_price(p['symbol'])),
+                'lastFundingRate': '0.0001',
+                'time': int(time.time() * 1000)
+            },
+        }
+
+    def exchange_info(self) -> Dict[str, Any]:
+        """Binance-style trading rules for every simulated symbol"""
+        symbols = []
+        for symbol, price in self.config.prices.items():
+            tick, step = ('0.10', '0.0001') if price >= 1000 else ('0.01', '0.001')
+            symbols.append({
+                'symbol': symbol,
+                'status': 'TRADING',
+                'maxLeverage': 125,
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'tickSize': tick},
+                    {'filterType': 'LOT_SIZE', 'stepSize': step, 'minQty': step},
+                    {'filterType': 'MIN_NOTIONAL', 'minNotional': '5'}
+                ]
+            })
+        return {'timezone': 'UTC', 'serverTime': int(time.time() * 1000),
+                'symbols': symbols}
+
+    def _set_leverage(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.engine.mark_price(params['symbol'])
+        self.engine.leverage[params['symbol']] = int(params['leverage'])
+        return {'symbol': params['symbol'], 'leverage': int(params['leverage'])}
+
+    def _change_margin_type(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.engine.mark_price(params['symbol'])
+        self.engine.margin_type[params['symbol']] = params['marginType'].upper()
+        return {'code': 200, 'msg': 'success'}
+
+    def _set_position_mode(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.engine.mark_price(params['symbol'])
+        self.engine.position_mode[params['symbol']] = params['positionMode'].upper()
+        return {'code': 200, 'msg': 'success'}
+
+    def rate_limited(self) -> bool:
+        """Sliding one-second window over accepted requests"""
+        if not self.config.rate_limit:
+            return False
+        now = time.monotonic()
+        with self._window_lock:
+            while self._window and now - self._window[0] > 1.0:
+                self._window.popleft()
+            if len(self._window) >= self.config.rate_limit:
+                return True
+            self._window.append(now)
+            return False
+
+    def set_mark_price(self, symbol: str, price: float) -> None:
+        """Move a price, triggering stops and pushing a websocket tick"""
+        self.engine.set_mark_price(symbol, price)
+        if self._ws_loop is not None:
+            self._ws_loop.call_soon_threadsafe(self._broadcast, symbol, price)
+
+    def _random_walk(self) -> None:
+        while not self._stop.wait(self.config.tick_interval):
+            for symbol, price in list(self.engine.marks.items()):
+                step = self.random.gauss(0, self.config.volatility)
+                self.set_mark_price(symbol, price * (1 + step))
+
+    def _broadcast(self, symbol: str, price: float) -> None:
+        contract = f'{symbol[:-4]}_USDT' if symbol.endswith('USDT') else symbol
+        message = json.dumps({
+            'channel': 'push.ticker',
+            'data': {'symbol': contract, 'fairPrice': price, 'lastPrice': price,
+                     'bid1': price, 'ask1': price},
+            'ts': int(time.time() * 1000)
+        })
+        for ws, symbols in list(self._ws_clients.items()):
+            if contract in symbols:
+                asyncio.ensure_future(ws.send(message))
+
+    async def _serve_ws(self, ws) -> None:
+        self._ws_clients[ws] = set()
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get('method') == 'sub.ticker':
+                    self._ws_clients[ws].add(message['param']['symbol'])
+                elif message.get('method') == 'ping':
+                    pong = {'channel': 'pong', 'data': int(time.time() * 1000)}
+                    await ws.send(json.dumps(pong))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._ws_clients.pop(ws, None)
+
+    def _run_ws(self, ready: threading.Event) -> None:
+        self._ws_loop = asyncio.new_event_loop()
+
+        async def serve():
+            async with websockets.serve(self._serve_ws, '127.0.0.1', 0) as server:
+                self.ws_url = f'ws://127.0.0.1:{server.sockets[0].getsockname()[1]}'
+                ready.set()
+                while not self._stop.is_set():
+                    await asyncio.sleep(0.05)
+
+        try:
+            self._ws_loop.run_until_complete(serve())
+        finally:
+            self._ws_loop.close()
+            self._ws_loop = None
+
+    def start(self) -> 'MEXCSimulator':
+        handler = type('Handler', (_SimulatorHandler,), {'simulator': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}'
+        self._threads.append(threading.Thread(target=self._server.serve_forever,
+                                              daemon=True))
+
+        if self.websocket:
+            ready = threading.Event()
+            self._threads.append(threading.Thread(target=self._run_ws, args=(ready,),
+                                                  daemon=True))
+        if self.config.tick_interval:
+            self._threads.append(threading.Thread(target=self._random_walk,
+                                                  daemon=True))
+        for thread in self._threads:
+            thread.start()
+        if self.websocket:
+            ready.wait(5)
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def count(self, name: str) -> None:
+        """Increment a request counter (requests, rejected, errors, dropped)"""
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self) -> Dict[str, int]:
+        with self._counter_lock:
+            return {
+                'requests': self.requests,
+                'rejected': self.rejected,
+                'errors': self.errors,
+                'dropped': self.dropped,
+                'orders': self.engine.order_count,
+                'fills': self.engine.fill_count
+            }
@@ -1,16 +1,93 @@
-import hmac
 import hashlib
-import requests
-import time
-from typing import Dict, Any, Optional
-import os
+import hmac
 import json
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from account_config import AccountConfigCache
+from price_book import PriceBook
+from rate_limiter import RequestScheduler
+from risk_manager import RiskManager
+from stop_engine import STOP_LOSS, TAKE_PROFIT, StopEvent
+from symbol_filters import ExchangeInfoCache
+from trade_journal import TradeJournal
+
+# Order types that can only reduce a position
+CLOSING_ORDER_TYPES = ('STOP_MARKET', 'TAKE_PROFIT_MARKET')
+
+class OrderStateUnknownError(Exception):
+    """Raised when retries are exhausted without learning whether an order
+    reached the exchange. Reconcile by looking it up with client_order_id"""
+
+    def __init__(self, symbol: str, client_order_id: str, cause: Exception):
+        self.symbol = symbol
+        self.client_order_id = client_order_id
+        super().__init__(f'State of order {client_order_id} on {symbol} '
+                         f'is unknown: {cause}')
 
-class MEXCTrader:
-    def __init__(self, api_key: str, api_secret: str, testnet: bool = False):
+
+class BaseMEXCTrader:
+    """Credentials, request signing, order parameter building and the
+    idempotency bookkeeping shared by the blocking and asyncio MEXC clients"""
+
+    # Acknowledged orders remembered for de-duplication
+    MAX_REMEMBERED_ORDERS = 10000
+
+    def __init__(self,
+                 api_key: str,
+                 api_secret: str,
+                 testnet: bool = False,
+                 base_url: Optional[str] = None,
+                 max_retries: int = 3,
+                 retry_backoff: float = 0.2):
         self.api_key = api_key
         self.api_secret = api_secret
         self.base_url = 'https://api.mexc.com' if not testnet else 'https://api.mexc.com/api/v3/test'
+        if base_url:
+            self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.account_config = AccountConfigCache()
+        self.exchange_info = ExchangeInfoCache()
+        self._placed_orders: OrderedDict = OrderedDict()
+        self._placed_lock = threading.Lock()
+
+    @staticmethod
+    def new_client_order_id() -> str:
+        """Generate a unique client order id"""
+        return f'ba{uuid.uuid4().hex[:30]}'
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter for the given retry attempt"""
+        return self.retry_backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.0)
+
+    def _remember_order(self, client_order_id: str, ack: Dict) -> None:
+        with self._placed_lock:
+            self._placed_orders[client_order_id] = ack
+            if len(self._placed_orders) > self.MAX_REMEMBERED_ORDERS:
+                self._placed_orders.popitem(last=False)
+
+    def _known_order(self, client_order_id: str) -> Optional[Dict]:
+        """The acknowledgement of an order already placed with this id"""
+        return self._placed_orders.get(client_order_id)
+
+    @staticmethod
+    def _is_missing_order(status: int, body: str) -> bool:
+        """Check whether an error response means 'order does not exist'"""
+        if status == 404:
+            return True
+        try:
+            return json.loads(body).get('code') == -2013
+        except (ValueError, AttributeError):
+            return False
 
     def _generate_signature(self, params: Dict) -> str:
         query_string = '&'.join([f'{k}={v}' for k, v in sorted(params.items())])
@@ -18,7 +95,11 @@ class MEXCTrader:
                        query_string.encode('utf-8'),
                        hashlib.sha256).hexdigest()
 
-    def _send_request(self, method: str, endpoint: str, params: Dict = None, signed: bool = True) -> Dict:
+    def _prepare_request(self,
+                         endpoint: str,
+                         params: Dict = None,
+                         signed: bool = True) -> Tuple[str, Dict, Dict]:
+        """Build the URL, headers and (signed) parameters for a request"""
         url = f'{self.base_url}{endpoint}'
         headers = {'Content-Type': 'application/json'}
 
@@ -34,11 +115,122 @@ class MEXCTrader:
                 'X-MEXC-SIGNATURE': signature
             })
 
-        response = requests.request(method,
-                                  url,
-                                  headers=headers,
-                                  params=params if method == 'GET' else None,
-                                  json=params if method == 'POST' else None)
+        return url, headers, params
+
+    @staticmethod
+    def _order_params(symbol: str,
+                      side: str,
+                      order_type: str,
+                      quantity: float,
+                      price: float = None,
+                      stop_price: float = None,
+                      position_side: str = None,
+                      client_order_id: str = None) -> Dict:
+        """Build the request parameters for a new order"""
+        params = {
+            'symbol': symbol,
+            'side': side,
+            'type': order_type,
+            'quantity': quantity
+        }
+
+        if price:
+            params['price'] = price
+        if stop_price:
+            params['stopPrice'] = stop_price
+        if position_side:
+            params['positionSide'] = position_side
+        if client_order_id:
+            params['newClientOrderId'] = client_order_id
+
+        return params
+
+
+class MEXCTrader(BaseMEXCTrader):
+    def __init__(self,
+                 api_key: str,
+                 api_secret: str,
+                 testnet: bool = False,
+                 pool_size: int = 10,
+                 timeout: Union[float, Tuple[float, float]] = 10.0,
+                 pooled: bool = True,
+                 base_url: Optional[str] = None,
+                 scheduler: Optional[RequestScheduler] = None,
+                 max_retries: int = 3,
+                 retry_backoff: float = 0.2):
+        """
+        Args:
+            api_key: MEXC API key
+            api_secret: MEXC API secret
+            testnet: Use the MEXC test endpoint
+            pool_size: Maximum number of keep-alive connections kept per host
+            timeout: Request timeout in seconds, or a (connect, read) tuple
+            pooled: Reuse connections through a shared session. When False every
+                request opens a fresh connection (the old behaviour)
+            base_url: Override the exchange URL, e.g. for a local stand-in
+            scheduler: Rate limiter shared by all requests (default: MEXC limits)
+            max_retries: Retries for orders failing with a network error,
+                429 or 5xx (see _submit_order)
+            retry_backoff: Base delay in seconds for jittered exponential backoff
+        """
+        super().__init__(api_key, api_secret, testnet, base_url,
+                         max_retries, retry_backoff)
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.timeout = timeout
+        self.session = self._create_session(pool_size) if pooled else None
+
+    def _create_session(self, pool_size: int) -> requests.Session:
+        """Create a keep-alive session with a per-host connection pool"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        self.exchange_info.stop_refresh()
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _send_request(self,
+                      method: str,
+                      endpoint: str,
+                      params: Dict = None,
+                      signed: bool = True) -> Dict:
+        if method == 'GET':
+            # Identical concurrent reads share one round trip
+            key = (endpoint, tuple(sorted((params or {}).items())))
+            return self.scheduler.coalesce(
+                key, lambda: self._dispatch(method, endpoint, params, signed))
+        return self._dispatch(method, endpoint, params, signed)
+
+    def _dispatch(self,
+                  method: str,
+                  endpoint: str,
+                  params: Dict = None,
+                  signed: bool = True) -> Dict:
+        # Sign only once the scheduler lets us through so the timestamp is fresh
+        self.scheduler.acquire(method, endpoint)
+        url, headers, params = self._prepare_request(endpoint, params, signed)
+
+        # Without a session every call goes through a throwaway connection
+        send = self.session.request if self.session is not None else requests.request
+        response = send(method,
+                        url,
+                        headers=headers,
+                        params=params if method != 'POST' else None,
+                        json=params if method == 'POST' else None,
+                        timeout=self.timeout)
+        if response.status_code == 429:
+            self.scheduler.penalize(float(response.headers.get('Retry-After', 1)))
         response.raise_for_status()
         return response.json()
 
@@ -54,7 +246,9 @@ class MEXCTrader:
                     price: float = None,
                     leverage: int = None,
                     stop_price: float = None,
-                    position_side: str = None) -> Dict:
+                    position_side: str = None,
+                    client_order_id: str = None,
+                    reduce_only: bool = False) -> Dict:
         """Place a new order
 
         Args:
@@ -65,34 +259,121 @@ class MEXCTrader:
             price: Order price (required for LIMIT orders)
             leverage: Leverage multiple (for futures trading)
             stop_price: Stop price for stop orders
-            position_side: 'LONG' or 'SHORT' for futures
+            position_side: 'LONG' or 'SHORT' for futures. Set from side and
+                reduce_only in hedge mode and replaced by 'BOTH' in one-way
+                mode once the symbol's position mode is cached
+            client_order_id: Idempotency key, generated when omitted. An id
+                that was already acknowledged returns the original
+                acknowledgement instead of sending the order again
+            reduce_only: The order closes a position rather than opening
+                one. Implied for stop loss and take profit orders
 
         Returns:
             Dict with order details
         """
-        params = {
-            'symbol': symbol,
-            'side': side,
-            'type': order_type,
-            'quantity': quantity
-        }
+        client_order_id = client_order_id or self.new_client_order_id()
+        known = self._known_order(client_order_id)
+        if known is not None:
+            return known
 
-        if price:
-            params['price'] = price
-        if stop_price:
-            params['stopPrice'] = stop_price
-        if position_side:
-            params['positionSide'] = position_side
+        # Stop and take profit orders only ever close a position
+        reduce_only = reduce_only or order_type in CLOSING_ORDER_TYPES
+        position_side = self.account_config.position_side(symbol, side, position_side,
+                                                          reduce_only)
+        params = self._order_params(symbol, side, order_type, quantity,
+                                    price, stop_price, position_side, client_order_id)
+        # Quantise to tick/lot size locally instead of paying for a rejection
+        params = self.exchange_info.normalize_order(params)
 
-        if leverage:
+        if leverage and self.account_config.needs_leverage(symbol, leverage):
             # Set leverage first for futures trading
             leverage_params = {
                 'symbol': symbol,
                 'leverage': leverage
             }
-            self._send_request('POST', '/api/v3/margin/leverage', leverage_params)
+            try:
+                self._send_request('POST', '/api/v3/margin/leverage', leverage_params)
+            except Exception:
+                self.account_config.invalidate(symbol)
+                raise
+            self.account_config.set_leverage(symbol, leverage)
+
+        try:
+            return self._submit_order(params)
+        except Exception:
+            # The rejection may come from configuration changed behind our back
+            self.account_config.invalidate(symbol)
+            raise
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Network errors, timeouts, 429 and 5xx are worth retrying"""
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            status = error.response.status_code
+            return status == 429 or status >= 500
+        return False
 
-        return self._send_request('POST', '/api/v3/order', params)
+    def _find_order(self, symbol: str, client_order_id: str) -> Optional[Dict]:
+        """Look up an order by client order id, None if the exchange never saw it"""
+        try:
+            return self.get_order(symbol, client_order_id=client_order_id)
+        except requests.HTTPError as e:
+            response = e.response
+            if response is not None and self._is_missing_order(response.status_code,
+                                                               response.text):
+                return None
+            raise
+
+    def _submit_order(self, params: Dict) -> Dict:
+        """Send an order, retrying transient failures with jittered backoff.
+
+        A failed request may still have reached the exchange, so before every
+        re-send the order is looked up by its client order id and only sent
+        again once the exchange confirms it does not exist. Raises
+        OrderStateUnknownError if retries run out before that is settled.
+        """
+        symbol, client_order_id = params['symbol'], params['newClientOrderId']
+        attempt = 0
+        while True:
+            try:
+                ack = self._send_request('POST', '/api/v3/order', dict(params))
+                self._remember_order(client_order_id, ack)
+                return ack
+            except Exception as e:
+                if not self._is_retryable(e):
+                    raise
+                error = e
+
+            while True:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise OrderStateUnknownError(symbol, client_order_id,
+                                                 error) from error
+                time.sleep(self._backoff_delay(attempt))
+                try:
+                    existing = self._find_order(symbol, client_order_id)
+                    break
+                except Exception as e:
+                    if not self._is_retryable(e):
+                        raise OrderStateUnknownError(symbol, client_order_id, e) from e
+
+            if existing is not None:
+                self._remember_order(client_order_id, existing)
+                return existing
+
+    def get_order(self,
+                  symbol: str,
+                  order_id: int = None,
+                  client_order_id: str = None) -> Dict:
+        """Query an order by exchange order id or client order id"""
+        params = {'symbol': symbol}
+        if order_id is not None:
+            params['orderId'] = order_id
+        if client_order_id is not None:
+            params['origClientOrderId'] = client_order_id
+        return self._send_request('GET', '/api/v3/order', params)
 
     def get_open_orders(self, symbol: str = None) -> Dict:
         """Get all open orders or orders for a specific symbol"""
@@ -122,31 +403,218 @@ class MEXCTrader:
         return self._send_request('GET', '/api/v3/leverageBracket', params)
 
     def change_margin_type(self, symbol: str, margin_type: str) -> Dict:
-        """Change margin type between 'ISOLATED' and 'CROSSED'"""
+        """Change margin type between 'ISOLATED' and 'CROSSED'
+
+        Skipped when the symbol is already known to use margin_type.
+        """
+        if not self.account_config.needs_margin_type(symbol, margin_type):
+            return {'symbol': symbol, 'marginType': margin_type, 'cached': True}
+
         params = {
             'symbol': symbol,
             'marginType': margin_type
         }
-        return self._send_request('POST', '/api/v3/marginType', params)
+        try:
+            result = self._send_request('POST', '/api/v3/marginType', params)
+        except Exception:
+            self.account_config.invalidate(symbol)
+            raise
+        self.account_config.set_margin_type(symbol, margin_type)
+        return result
 
     def set_leverage(self, symbol: str, leverage: int) -> Dict:
-        """Set leverage for a symbol"""
+        """Set leverage for a symbol
+
+        Skipped when the symbol is already known to use this leverage.
+        """
+        self.exchange_info.check_leverage(symbol, leverage)
+        if not self.account_config.needs_leverage(symbol, leverage):
+            return {'symbol': symbol, 'leverage': leverage, 'cached': True}
+
         params = {
             'symbol': symbol,
             'leverage': leverage
         }
-        return self._send_request('POST', '/api/v3/leverage', params)
+        try:
+            result = self._send_request('POST', '/api/v3/leverage', params)
+        except Exception:
+            self.account_config.invalidate(symbol)
+            raise
+        self.account_config.set_leverage(symbol, leverage)
+        return result
+
+    def set_position_mode(self, symbol: str, position_mode: str) -> Dict:
+        """Switch a symbol between 'HEDGE' and 'ONE_WAY' position mode
+
+        Skipped when the symbol is already known to use position_mode.
+        """
+        position_mode = position_mode.upper()
+        if not self.account_config.needs_position_mode(symbol, position_mode):
+            return {'symbol': symbol, 'positionMode': position_mode, 'cached': True}
+
+        params = {
+            'symbol': symbol,
+            'positionMode': position_mode
+        }
+        try:
+            result = self._send_request('POST', '/api/v3/positionMode', params)
+        except Exception:
+            self.account_config.invalidate(symbol)
+            raise
+        self.account_config.set_position_mode(symbol, position_mode)
+        return result
+
+    def warm_up_account_config(self, symbols: List[str] = None) -> int:
+        """Load leverage, margin type and position mode for all (or the given)
+        symbols with one position risk request. Returns symbols loaded"""
+        positions = self.get_position_info()
+        return self.account_config.load_positions(positions, symbols)
 
     def get_mark_price(self, symbol: str) -> Dict:
         """Get current mark price and funding rate for a symbol"""
         params = {'symbol': symbol}
         return self._send_request('GET', '/api/v3/premiumIndex', params)
 
+    def get_exchange_info(self) -> Dict:
+        """Get trading rules and symbol information"""
+        return self._send_request('GET', '/api/v3/exchangeInfo', signed=False)
+
+    def get_klines(self,
+                   symbol: str,
+                   interval: str = '1m',
+                   start_time: Optional[int] = None,
+                   end_time: Optional[int] = None,
+                   limit: int = 1000) -> List[List]:
+        """Get candlesticks as [open time, open, high, low, close, volume, ...] rows"""
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = start_time
+        if end_time is not None:
+            params['endTime'] = end_time
+        return self._send_request('GET', '/api/v3/klines', params, signed=False)
+
+    def load_exchange_info(self, refresh: bool = True) -> int:
+        """Load symbol filters used to quantise orders, optionally keeping
+        them refreshed in the background. Returns symbols loaded"""
+        count = self.exchange_info.load(self.get_exchange_info())
+        if refresh:
+            self.exchange_info.start_refresh(self.get_exchange_info)
+        return count
+
+class BracketOrderError(Exception):
+    """Raised when a protective leg of a bracket fails after the entry filled.
+
+    By the time it is raised the bracket has been unwound: surviving legs are
+    cancelled and the entry is closed at market. ``rollback`` records the
+    outcome of each unwind step so callers can spot anything left behind.
+    """
+
+    def __init__(self,
+                 symbol: str,
+                 failed: Dict[str, Exception],
+                 rollback: Dict[str, Any]):
+        self.symbol = symbol
+        self.failed = failed
+        self.rollback = rollback
+        legs = ', '.join(f'{leg}: {error}' for leg, error in failed.items())
+        super().__init__(f'Bracket for {symbol} rolled back after failed leg(s) {legs}')
+
+
+def calculate_bracket_prices(mark_price: float,
+                             side: str,
+                             stop_loss_percent: float,
+                             take_profit_percent: float) -> Tuple[str, float, float]:
+    """Return the entry order side and the stop loss / take profit prices
+    for a 'LONG' or 'SHORT' bracket around mark_price"""
+    if side == 'LONG':
+        entry_side = 'BUY'
+        stop_loss = mark_price * (1 - stop_loss_percent/100)
+        take_profit = mark_price * (1 + take_profit_percent/100)
+    else:
+        entry_side = 'SELL'
+        stop_loss = mark_price * (1 + stop_loss_percent/100)
+        take_profit = mark_price * (1 - take_profit_percent/100)
+    return entry_side, stop_loss, take_profit
+
+def realised_pnl_percent(trade: Dict, exit_price: float) -> float:
+    """Return on a trade's margin in percent between its average entry price
+    and exit_price"""
+    entry = float(trade['entry_order'].get('avgPrice') or trade['entry_price'])
+    move = (exit_price - entry) / entry * 100
+    if trade['side'] == 'SHORT':
+        move = -move
+    return move * trade['leverage']
+
 # Create a trading bot class that uses MEXCTrader
 class TradingBot:
-    def __init__(self, api_key: str, api_secret: str, testnet: bool = False):
-        self.trader = MEXCTrader(api_key, api_secret, testnet)
+    def __init__(self,
+                 api_key: str,
+                 api_secret: str,
+                 testnet: bool = False,
+                 pool_size: int = 10,
+                 timeout: Union[float, Tuple[float, float]] = 10.0,
+                 base_url: Optional[str] = None,
+                 concurrent_brackets: bool = False,
+                 price_book: Optional[PriceBook] = None,
+                 journal: Optional[TradeJournal] = None):
+        """
+        Args:
+            concurrent_brackets: Overlap the independent steps of
+                place_leveraged_trade (see _place_concurrent_bracket)
+            price_book: Streaming price book to read mark prices from. REST
+                is only used when it has no fresh price
+            journal: Persist trade lifecycle events; open trades are restored
+                from it on startup (see reconcile)
+        """
+        self.trader = MEXCTrader(api_key, api_secret, testnet,
+                                 pool_size=pool_size,
+                                 timeout=timeout,
+                                 base_url=base_url)
         self.active_trades = {}
+        self.concurrent_brackets = concurrent_brackets
+        self.price_book = price_book
+        if price_book is not None:
+            # MARKET orders are checked against min notional at the book's price
+            self.trader.exchange_info.price_source = price_book.get_mark_price
+        self.journal = journal
+        if journal is not None:
+            self.active_trades = dict(journal.open_trades)
+        self._executor = None
+        if concurrent_brackets:
+            self._executor = ThreadPoolExecutor(max_workers=max(pool_size, 2))
+        # Single worker so the stop changes of a trade reach the exchange in order
+        self._stop_executor = None
+        self._unfollow_stops = None
+
+    def _get_mark_price(self, symbol: str) -> float:
+        """Read the mark price from the price book, falling back to REST"""
+        if self.price_book is not None:
+            price = self.price_book.get_mark_price(symbol)
+            if price is not None:
+                return price
+        price = float(self.trader.get_mark_price(symbol)['markPrice'])
+        if self.price_book is not None:
+            self.price_book.update(symbol, mark=price)
+        return price
+
+    def close(self) -> None:
+        """Release the trader's pooled connections"""
+        if self._unfollow_stops is not None:
+            self._unfollow_stops()
+            self._unfollow_stops = None
+        for executor in (self._executor, self._stop_executor):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        self._executor = self._stop_executor = None
+        if self.journal is not None:
+            self.journal.flush()
+        self.trader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def place_leveraged_trade(self,
                             symbol: str,
@@ -168,21 +636,22 @@ class TradingBot:
         Returns:
             Dict with trade details
         """
+        if self.concurrent_brackets:
+            return self._place_concurrent_bracket(
+                symbol, side, quantity, leverage,
+                stop_loss_percent, take_profit_percent)
+
         # Get current mark price
-        mark_price = float(self.trader.get_mark_price(symbol)['markPrice'])
+        mark_price = self._get_mark_price(symbol)
         
         # Set leverage
         self.trader.set_leverage(symbol, leverage)
         
         # Calculate stop loss and take profit prices
-        if side == 'LONG':
-            entry_side = 'BUY'
-            stop_loss = mark_price * (1 - stop_loss_percent/100)
-            take_profit = mark_price * (1 + take_profit_percent/100)
-        else:
-            entry_side = 'SELL'
-            stop_loss = mark_price * (1 + stop_loss_percent/100)
-            take_profit = mark_price * (1 - take_profit_percent/100)
+        entry_side, stop_loss, take_profit = calculate_bracket_prices(
+            mark_price, side, stop_loss_percent, take_profit_percent)
+        stop_loss = self.trader.exchange_info.round_price(symbol, stop_loss)
+        take_profit = self.trader.exchange_info.round_price(symbol, take_profit)
         
         # Place main order
         entry_order = self.trader.place_order(
@@ -226,7 +695,107 @@ class TradingBot:
         }
         
         self.active_trades[symbol] = trade_details
+        if self.journal is not None:
+            self.journal.record_open(symbol, trade_details)
         return trade_details
+
+    def _place_concurrent_bracket(self,
+                                  symbol: str,
+                                  side: str,
+                                  quantity: float,
+                                  leverage: int,
+                                  stop_loss_percent: float,
+                                  take_profit_percent: float) -> Dict:
+        """Place a bracket in three overlapped rounds instead of five serial
+        round trips: mark price and leverage together, then the entry, then
+        the stop loss and take profit legs together.
+
+        If either protective leg fails the bracket is unwound and
+        BracketOrderError is raised, so a position is never left unprotected.
+        """
+        price_future = self._executor.submit(self._get_mark_price, symbol)
+        leverage_future = self._executor.submit(self.trader.set_leverage,
+                                                symbol, leverage)
+        mark_price = price_future.result()
+        leverage_future.result()
+
+        entry_side, stop_loss, take_profit = calculate_bracket_prices(
+            mark_price, side, stop_loss_percent, take_profit_percent)
+        stop_loss = self.trader.exchange_info.round_price(symbol, stop_loss)
+        take_profit = self.trader.exchange_info.round_price(symbol, take_profit)
+
+        entry_order = self.trader.place_order(
+            symbol=symbol,
+            side=entry_side,
+            order_type='MARKET',
+            quantity=quantity,
+            position_side=side
+        )
+
+        exit_side = 'SELL' if side == 'LONG' else 'BUY'
+        futures = {
+            'stop_loss_order': self._executor.submit(
+                self.trader.place_order, symbol=symbol, side=exit_side,
+                order_type='STOP_MARKET', quantity=quantity,
+                stop_price=stop_loss, position_side=side),
+            'take_profit_order': self._executor.submit(
+                self.trader.place_order, symbol=symbol, side=exit_side,
+                order_type='TAKE_PROFIT_MARKET', quantity=quantity,
+                stop_price=take_profit, position_side=side)
+        }
+        placed, failed = {}, {}
+        for leg, future in futures.items():
+            try:
+                placed[leg] = future.result()
+            except Exception as e:
+                failed[leg] = e
+
+        if failed:
+            filled = entry_order.get('executedQty', quantity)
+            rollback = self._unwind_bracket(symbol, side, exit_side, filled, placed)
+            raise BracketOrderError(symbol, failed, rollback)
+
+        trade_details = {
+            'symbol': symbol,
+            'side': side,
+            'leverage': leverage,
+            'entry_order': entry_order,
+            'stop_loss_order': placed['stop_loss_order'],
+            'take_profit_order': placed['take_profit_order'],
+            'entry_price': mark_price,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit
+        }
+
+        self.active_trades[symbol] = trade_details
+        if self.journal is not None:
+            self.journal.record_open(symbol, trade_details)
+        return trade_details
+
+    def _unwind_bracket(self,
+                        symbol: str,
+                        side: str,
+                        exit_side: str,
+                        quantity: float,
+                        placed: Dict[str, Dict]) -> Dict[str, Any]:
+        """Cancel surviving protective legs and flatten the entry"""
+        rollback = {}
+        for leg, order in placed.items():
+            try:
+                rollback[leg] = self.trader.cancel_order(symbol, order['orderId'])
+            except Exception as e:
+                rollback[leg] = e
+        try:
+            rollback['close_order'] = self.trader.place_order(
+                symbol=symbol,
+                side=exit_side,
+                order_type='MARKET',
+                quantity=quantity,
+                position_side=side
+            )
+        except Exception as e:
+            rollback['close_order'] = e
+        return rollback
     
     def close_position(self, symbol: str) -> Dict:
         """Close an open position"""
@@ -249,4 +818,116 @@ class TradingBot:
         )
         
         del self.active_trades[symbol]
-        return close_order
\ No newline at end of file
+        if self.journal is not None:
+            self.journal.record_close(symbol, {'close_order': close_order})
+        return close_order
+
+    def move_stop(self, symbol: str, stop_price: float) -> Dict:
+        """Replace a trade's stop loss order with one at stop_price
+
+        The new order is placed before the old one is cancelled, so the
+        position is never left unprotected.
+        """
+        if symbol not in self.active_trades:
+            raise ValueError(f'No active trade found for {symbol}')
+
+        trade = self.active_trades[symbol]
+        stop_price = self.trader.exchange_info.round_price(symbol, stop_price)
+        stop_loss_order = self.trader.place_order(
+            symbol=symbol,
+            side='SELL' if trade['side'] == 'LONG' else 'BUY',
+            order_type='STOP_MARKET',
+            quantity=trade['entry_order']['executedQty'],
+            stop_price=stop_price,
+            position_side=trade['side']
+        )
+        self.trader.cancel_order(symbol, trade['stop_loss_order']['orderId'])
+
+        changes = {'stop_loss_order': stop_loss_order, 'stop_loss': stop_price}
+        trade.update(changes)
+        if self.journal is not None:
+            self.journal.record_update(symbol, changes)
+        return stop_loss_order
+
+    def settle_exit(self, symbol: str, kind: str = STOP_LOSS) -> Dict:
+        """Finish a trade whose stop loss or take profit price was crossed
+
+        If the exchange already filled that leg, the other leg is cancelled.
+        Otherwise (a gap, or a mark price running ahead of the last price)
+        the position is closed at market.
+
+        Returns:
+            The order that closed the position
+        """
+        if symbol not in self.active_trades:
+            raise ValueError(f'No active trade found for {symbol}')
+
+        trade = self.active_trades[symbol]
+        legs = ['stop_loss_order', 'take_profit_order']
+        if kind == TAKE_PROFIT:
+            legs.reverse()
+        hit, other = legs
+        order = self.trader.get_order(symbol, order_id=trade[hit]['orderId'])
+        if order.get('status') != 'FILLED':
+            return self.close_position(symbol)
+
+        try:
+            self.trader.cancel_order(symbol, trade[other]['orderId'])
+        except Exception as e:
+            # Reduce-only, so a leg left behind can never open a position
+            print(f"Could not cancel {other} for {symbol}: {str(e)}")
+        del self.active_trades[symbol]
+        if self.journal is not None:
+            self.journal.record_close(symbol, {'close_order': order})
+        return order
+
+    def follow_stops(self, risk_manager: RiskManager) -> Callable[[], None]:
+        """Carry risk_manager's stop engine over to the exchange
+
+        Breakeven and trailing moves replace the trade's STOP_MARKET order
+        (move_stop). A crossed stop loss or take profit is settled on the
+        exchange (settle_exit) and only then closed in risk_manager through
+        update_position, with the realised PnL as a percentage return on
+        margin. Trades are matched to engine positions by key; orders are
+        sent from a worker thread so price updates are never held up.
+
+        Returns:
+            A function that stops following
+        """
+        if self._stop_executor is None:
+            self._stop_executor = ThreadPoolExecutor(max_workers=1)
+
+        def on_events(events: List[StopEvent]):
+            self._stop_executor.submit(self._on_stop_events, risk_manager, events)
+
+        unsubscribe = risk_manager.stop_engine.subscribe(on_events)
+        self._unfollow_stops = unsubscribe
+        return unsubscribe
+
+    def _on_stop_events(self,
+                        risk_manager: RiskManager,
+                        events: List[StopEvent]) -> None:
+        for event in events:
+            trade = self.active_trades.get(event.key)
+            if trade is None:
+                continue
+            try:
+                if event.kind in (STOP_LOSS, TAKE_PROFIT):
+                    close_order = self.settle_exit(event.key, event.kind)
+                    exit_price = float(close_order.get('avgPrice') or 0) or event.price
+                    pnl = realised_pnl_percent(trade, exit_price)
+                    risk_manager.update_position(event.key, pnl, is_closed=True)
+                else:
+                    self.move_stop(event.key, event.stop_loss)
+            except Exception as e:
+                print(f"Stop {event.kind} for {event.key} failed: {str(e)}")
+
+    def reconcile(self) -> Dict:
+        """Check journaled trades against the exchange with one bulk
+        open-orders request, dropping trades whose brackets are gone"""
+        if self.journal is None:
+            raise ValueError('No trade journal configured')
+        result = self.journal.reconcile(self.trader.get_open_orders())
+        for symbol in result['closed']:
+            self.active_trades.pop(symbol, None)
+        return result
\ No newline at end of file
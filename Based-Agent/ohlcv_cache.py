@@ -0,0 +1,306 @@
+import contextlib
+import fcntl
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+KLINE_COLUMNS = ['timestamp'] + PRICE_COLUMNS
+
+# Bar length per kline interval, in milliseconds
+INTERVAL_MS = {
+    '1m': 60_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '60m': 3_600_000, '1h': 3_600_000, '4h': 14_400_000,
+    '1d': 86_400_000, '1W': 604_800_000,
+}
+
+# Segments an entry may hold before they are merged into one
+MAX_SEGMENTS = 8
+
+def _read_meta(path: str) -> Dict:
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = None
+    if not meta or 'segments' not in meta:
+        return {'ranges': [], 'segments': [], 'version': 0}
+    return meta
+
+@contextlib.contextmanager
+def _locked(path: str):
+    """Hold an exclusive lock on a cache entry, across processes"""
+    with open(os.path.join(path, '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _map_segment(path: str, segment: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    name = segment['name']
+    return (np.load(os.path.join(path, f'{name}.timestamps.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, f'{name}.values.npy'), mmap_mode='r'))
+
+def _merge(parts: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    """One sorted series from (timestamps, values) parts, newest first;
+    a bar in several parts keeps its newest copy"""
+    timestamps = np.concatenate([ts for ts, _ in parts])
+    values = np.concatenate([v for _, v in parts], axis=1)
+    timestamps, first = np.unique(timestamps, return_index=True)
+    return timestamps, np.ascontiguousarray(values[:, first])
+
+def read_slice(path: str, start: int, end: int) -> pd.DataFrame:
+    """Bars with open time in [start, end] from a cache entry. When one
+    segment holds them all, the DataFrame is over read-only memory maps
+    (no copy)"""
+    for attempt in range(3):
+        segments = [segment for segment in _read_meta(path)['segments']
+                    if segment['start'] <= end and segment['end'] >= start]
+        try:
+            parts = []
+            for segment in reversed(segments):
+                timestamps, values = _map_segment(path, segment)
+                lo = int(np.searchsorted(timestamps, start, side='left'))
+                hi = int(np.searchsorted(timestamps, end, side='right'))
+                if hi > lo:
+                    parts.append((timestamps[lo:hi], values[:, lo:hi]))
+            break
+        except FileNotFoundError:
+            # A writer replaced the segments between reading meta and mapping
+            if attempt == 2:
+                raise
+    if not parts:
+        timestamps = np.empty(0, dtype=np.int64)
+        values = np.empty((len(PRICE_COLUMNS), 0))
+    else:
+        timestamps, values = parts[0] if len(parts) == 1 else _merge(parts)
+    columns = {'timestamp': timestamps}
+    columns.update(zip(PRICE_COLUMNS, values, strict=True))
+    return pd.DataFrame(columns, copy=False)
+
+class OHLCVCache:
+    """On-disk kline cache, one entry per (symbol, interval).
+
+    Each entry is a directory of segments, each a pair of .npy files: int64
+    open times and a 5 x n float64 matrix of open/high/low/close/volume,
+    loaded as memory maps so a backtest reads straight from the page cache.
+    A gap fill writes only the fetched bars, as a new segment, which is
+    merged with the previous one while the two are of a similar size (and
+    while there are more than MAX_SEGMENTS). meta.json
+    lists the segments and records which time ranges have been fetched
+    (including ranges with no trading), so get() only downloads the gaps.
+    Bars that had not closed at fetch time are never marked as covered.
+
+    Segment files are never modified. A write creates new ones under a
+    fresh version and switches to them by replacing meta.json, so readers
+    in other processes always see a consistent entry; the previous
+    version's files are kept for readers still mapping them. Writers take
+    a lock on the entry, so concurrent fills do not drop each other's
+    ranges. Each use stamps the entry directory's mtime, and when the
+    cache grows past max_bytes, the least recently used entries are
+    deleted.
+    """
+
+    def __init__(self,
+                 directory: str = 'ohlcv_cache',
+                 max_bytes: int = 1 << 30,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            directory: Cache root
+            max_bytes: Size limit across all entries
+            clock: Returns the current time in epoch seconds
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.clock = clock
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.directory, f'{symbol}_{interval}')
+
+    @staticmethod
+    def _read_meta(path: str) -> Dict:
+        return _read_meta(path)
+
+    @staticmethod
+    def _write_meta(path: str, meta: Dict) -> None:
+        tmp = os.path.join(path, f'meta.json.{uuid.uuid4().hex}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+
+    def missing(self,
+                symbol: str,
+                interval: str,
+                start: int,
+                end: int) -> List[Tuple[int, int]]:
+        """Sub-ranges of [start, end] (ms, inclusive) not fetched yet"""
+        gaps = []
+        cursor = start
+        ranges = self._read_meta(self.path(symbol, interval))['ranges']
+        for covered_start, covered_end in ranges:
+            if covered_end < cursor:
+                continue
+            if covered_start > end:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start - 1))
+            cursor = max(cursor, covered_end + 1)
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def get(self,
+            symbol: str,
+            interval: str,
+            start: int,
+            end: int,
+            fetch: Callable[[int, int], pd.DataFrame]) -> pd.DataFrame:
+        """Bars for [start, end], calling fetch(gap_start, gap_end) only for
+        ranges not cached yet. fetch returns a frame with KLINE_COLUMNS"""
+        gaps = self.missing(symbol, interval, start, end)
+        if gaps:
+            frames = [fetch(gap_start, gap_end) for gap_start, gap_end in gaps]
+            self._store(symbol, interval, gaps, frames)
+            self.evict(keep=self.path(symbol, interval))
+        return self.load(symbol, interval, start, end)
+
+    def load(self, symbol: str, interval: str, start: int, end: int) -> pd.DataFrame:
+        """Cached bars for [start, end] without fetching anything"""
+        path = self.path(symbol, interval)
+        meta = self._read_meta(path)
+        if not meta['segments']:
+            return pd.DataFrame(columns=KLINE_COLUMNS)
+        self._touch(path)
+        return read_slice(path, start, end)
+
+    def _touch(self, path: str) -> None:
+        """Record a use of the entry, for eviction"""
+        now = self.clock()
+        with contextlib.suppress(OSError):
+            os.utime(path, (now, now))
+
+    def _store(self,
+               symbol: str,
+               interval: str,
+               gaps: List[Tuple[int, int]],
+               frames: List[pd.DataFrame]) -> None:
+        """Add fetched frames to the entry as a new segment and mark the
+        gaps covered"""
+        path = self.path(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        with _locked(path):
+            self._store_locked(path, interval, gaps, frames)
+        self._touch(path)
+
+    def _store_locked(self,
+                      path: str,
+                      interval: str,
+                      gaps: List[Tuple[int, int]],
+                      frames: List[pd.DataFrame]) -> None:
+        meta = self._read_meta(path)
+        previous = {segment['name'] for segment in meta['segments']}
+        version = meta['version'] + 1
+        # Unique names, so a writer never overwrites files a reader maps
+        tag = f'v{version}-{uuid.uuid4().hex[:8]}'
+
+        parts = [(f['timestamp'].to_numpy(dtype=np.int64),
+                  f[PRICE_COLUMNS].to_numpy(dtype=np.float64).T)
+                 for f in frames if len(f)]
+        segments = list(meta['segments'])
+        if parts:
+            segments.append(self._write_segment(path, tag, *_merge(parts)))
+        # Merge the newest segment into the one before while they are of a
+        # similar size, so each bar is rewritten O(log n) times and a
+        # freshly filled range usually ends up in a single segment
+        merges = 0
+        while len(segments) > 1 and (segments[-2]['rows'] <= 2 * segments[-1]['rows'] or
+                                     len(segments) > MAX_SEGMENTS):
+            merges += 1
+            compacted = _merge([_map_segment(path, segment)
+                                for segment in segments[:-3:-1]])
+            name = f'{tag}m{merges}'
+            segments[-2:] = [self._write_segment(path, name, *compacted)]
+
+        # Only bars that had closed by now are final
+        step = INTERVAL_MS.get(interval, 60_000)
+        closed = int(self.clock() * 1000) - step
+        ranges = meta['ranges'] + [[gap_start, min(gap_end, closed)]
+                                   for gap_start, gap_end in gaps
+                                   if gap_start <= min(gap_end, closed)]
+        merged: List[List[int]] = []
+        for range_start, range_end in sorted(ranges):
+            if merged and range_start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], range_end)
+            else:
+                merged.append([range_start, range_end])
+        meta.update(ranges=merged, segments=segments, version=version)
+        # The switch: readers see either the old segments or the new ones
+        self._write_meta(path, meta)
+
+        # Keep the files of this version and the one before it
+        live = previous | {segment['name'] for segment in segments}
+        for name in os.listdir(path):
+            if name.endswith('.npy') and name.split('.', 1)[0] not in live:
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(path, name))
+
+    @staticmethod
+    def _write_segment(path: str,
+                       name: str,
+                       timestamps: np.ndarray,
+                       values: np.ndarray) -> Dict:
+        for suffix, array in (('timestamps', timestamps), ('values', values)):
+            with open(os.path.join(path, f'{name}.{suffix}.npy'), 'wb') as f:
+                np.save(f, array)
+        return {'name': name, 'start': int(timestamps[0]), 'end': int(timestamps[-1]),
+                'rows': len(timestamps)}
+
+    def size(self) -> int:
+        """Bytes used by all entries"""
+        return sum(self._entry_size(entry) for entry in self._entries())
+
+    def _entries(self) -> List[str]:
+        return [os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if os.path.isdir(os.path.join(self.directory, name))]
+
+    @staticmethod
+    def _entry_size(path: str) -> int:
+        return sum(os.path.getsize(os.path.join(path, name))
+                   for name in os.listdir(path))
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Delete least recently used entries until under max_bytes. Returns
+        the removed entry paths"""
+        entries = [(os.stat(path).st_mtime, path, self._entry_size(path))
+                   for path in self._entries()]
+        total = sum(size for _, _, size in entries)
+        removed = []
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed.append(path)
+        return removed
+
+    def clear(self,
+              symbol: Optional[str] = None,
+              interval: Optional[str] = None) -> None:
+        """Drop one entry, or everything"""
+        if symbol is not None:
+            shutil.rmtree(self.path(symbol, interval or '1m'), ignore_errors=True)
+            return
+        for path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
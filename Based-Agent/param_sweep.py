@@ -0,0 +1,253 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest_engine import IndicatorCache, crossover_signals, simulate_vectorized
+
+# Parameters a sweep may vary, with their defaults when not in the grid
+SIGNAL_PARAMETERS = {'fast_period': 9, 'slow_period': 21, 'rsi_period': 14,
+                     'rsi_upper': 70, 'rsi_lower': 30}
+TRADE_PARAMETERS = ('stop_loss_percent', 'take_profit_percent', 'leverage',
+                    'risk_per_trade')
+SWEEP_PARAMETERS = tuple(SIGNAL_PARAMETERS) + TRADE_PARAMETERS
+
+# Metrics a sweep can rank by
+METRICS = ('total_return', 'final_equity', 'trades', 'win_rate', 'max_drawdown')
+
+# Metrics where smaller is better
+ASCENDING_METRICS = {'max_drawdown'}
+
+STATUS_COMPLETE = 'complete'
+STATUS_PRUNED = 'pruned'
+
+# Arrays per pair: (timestamps, high, low, close)
+PairData = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+def _max_drawdown(equity: np.ndarray) -> float:
+    """Largest fall from a running peak, in percent"""
+    if not len(equity):
+        return 0.0
+    peak = np.maximum.accumulate(equity)
+    return float(((peak - equity) / peak).max() * 100)
+
+def evaluate(data: Dict[str, PairData],
+             combos: List[Dict[str, Any]],
+             capital: float,
+             fraction: float,
+             indicators: IndicatorCache) -> List[Dict[str, Any]]:
+    """Metrics for each combination over the first fraction of every pair's
+    bars. Pairs split the capital evenly, as in Backtester.run_backtest"""
+    rows = []
+    for combo in combos:
+        final = capital * len(data)
+        trades = wins = 0
+        drawdown = 0.0
+        for symbol, (timestamps, high, low, close) in data.items():
+            bars = len(close) if fraction >= 1 else max(int(len(close) * fraction), 1)
+            params = (combo[name] for name in SIGNAL_PARAMETERS)
+            signal = crossover_signals(close, *params, indicators=indicators,
+                                       symbol=symbol)['signal']
+            result = simulate_vectorized(timestamps[:bars], high[:bars], low[:bars],
+                                         close[:bars], signal[:bars], capital,
+                                         combo['risk_per_trade'],
+                                         combo['stop_loss_percent'],
+                                         combo['take_profit_percent'],
+                                         combo['leverage'], records=False)
+            final += result['final_capital'] - capital
+            trades += len(result['trades'])
+            wins += sum(1 for t in result['trades'] if t['pnl'] > 0)
+            drawdown = max(drawdown, _max_drawdown(result['equity_curve']))
+        total = capital * len(data)
+        rows.append({
+            'total_return': (final - total) / total * 100 if total else 0.0,
+            'final_equity': final,
+            'trades': trades,
+            'win_rate': wins / trades * 100 if trades else 0.0,
+            'max_drawdown': drawdown
+        })
+    return rows
+
+# Per-process state for pool workers
+_worker: Dict[str, Any] = {}
+
+def _init_worker(data: Dict[str, PairData], capital: float, max_entries: int) -> None:
+    """Receive the price data once per process, with a private indicator cache"""
+    _worker['data'] = data
+    _worker['capital'] = capital
+    _worker['indicators'] = IndicatorCache(max_entries)
+
+def _evaluate_chunk(combos: List[Dict[str, Any]],
+                    fraction: float) -> Tuple[List[Dict[str, Any]], int, int]:
+    indicators = _worker['indicators']
+    hits, misses = indicators.hits, indicators.misses
+    rows = evaluate(_worker['data'], combos, _worker['capital'], fraction, indicators)
+    return rows, indicators.hits - hits, indicators.misses - misses
+
+class ParameterSweep:
+    """Grid search over strategy parameters on top of a Backtester.
+
+    Each pair's klines are fetched once. Indicator and signal columns are
+    memoised by (symbol, indicator, params), so e.g. every stop/target/
+    leverage combination sharing a pair of EMA windows reuses the same
+    columns. Combinations are ordered by signal parameters and split into
+    chunks for a process pool; each worker receives the data once and keeps
+    its own cache.
+
+    With pruning, every combination is first run on the leading
+    prune_fraction of the bars. Signals only look back, so that is exactly
+    the start of the full run. Combinations that lost money there and rank
+    in the bottom prune_quantile are not run in full; they stay in the
+    results, ranked last, with their partial metrics.
+    """
+
+    def __init__(self,
+                 tester,
+                 grid: Dict[str, Sequence[Any]],
+                 metric: str = 'total_return',
+                 workers: Optional[int] = None,
+                 prune_fraction: Optional[float] = 0.25,
+                 prune_quantile: float = 0.5,
+                 max_indicators: int = 256):
+        """
+        Args:
+            tester: Backtester supplying data and default parameters
+            grid: Parameter name -> values to try (names in SWEEP_PARAMETERS)
+            metric: Column to rank by (total_return, final_equity, win_rate,
+                trades or max_drawdown)
+            workers: Worker processes (0 means one per CPU), None to run here
+            prune_fraction: Share of bars for the pruning pass, None to disable
+            prune_quantile: Only combinations below this quantile of the
+                pruning pass return can be pruned
+            max_indicators: Indicator columns each cache holds
+        """
+        unknown = sorted(set(grid) - set(SWEEP_PARAMETERS))
+        if unknown:
+            raise ValueError(f"Unknown sweep parameter(s): {', '.join(unknown)}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        self.tester = tester
+        self.grid = {name: list(values) for name, values in grid.items()}
+        self.metric = metric
+        self.workers = workers
+        self.prune_fraction = prune_fraction
+        self.prune_quantile = prune_quantile
+        self.max_indicators = max_indicators
+        self.indicators = IndicatorCache(max_indicators)
+        self.stats: Dict[str, Any] = {}
+
+    def combinations(self) -> List[Dict[str, Any]]:
+        """Every grid point with defaults filled in, grouped by signal parameters"""
+        defaults = dict(SIGNAL_PARAMETERS,
+                        stop_loss_percent=self.tester.stop_loss_percent,
+                        take_profit_percent=self.tester.take_profit_percent,
+                        leverage=self.tester.leverage,
+                        risk_per_trade=0.02)
+        names = list(self.grid)
+        combos = [dict(defaults, **dict(zip(names, values, strict=True)))
+                  for values in itertools.product(*(self.grid[name] for name in names))]
+        return sorted(combos,
+                      key=lambda c: tuple(c[name] for name in SIGNAL_PARAMETERS))
+
+    def load(self, config: Dict[str, Any]) -> Dict[str, PairData]:
+        """Fetch every pair once, as arrays"""
+        start = datetime.strptime(config['startDate'], '%Y-%m-%d')
+        end = datetime.strptime(config['endDate'], '%Y-%m-%d')
+        start_time = int(start.timestamp() * 1000)
+        end_time = int(end.timestamp() * 1000)
+        data = {}
+        for pair in config['pairs']:
+            df = self.tester.get_historical_data(pair, start_time, end_time)
+            if df.empty:
+                continue
+            data[pair] = (df['timestamp'].to_numpy(),
+                          df['high'].to_numpy(dtype=float),
+                          df['low'].to_numpy(dtype=float),
+                          df['close'].to_numpy(dtype=float))
+        return data
+
+    def run(self, config: Dict[str, Any]) -> pd.DataFrame:
+        """Sweep the grid over config's pairs and date range.
+
+        Returns:
+            DataFrame with one row per combination: its parameters, metrics
+            and status, best first by metric and ranked from 1
+        """
+        combos = self.combinations()
+        capital = float(config.get('initialBalance', 1000)) / len(config['pairs'])
+        data = self.load(config)
+        self.indicators.clear()
+        self.stats = {'combinations': len(combos), 'pruned': 0,
+                      'indicator_hits': 0, 'indicator_misses': 0}
+
+        pool, workers = None, 1
+        if self.workers is not None and len(combos) > 1:
+            workers = self.workers or os.cpu_count()
+            pool = ProcessPoolExecutor(max_workers=workers,
+                                       initializer=_init_worker,
+                                       initargs=(data, capital, self.max_indicators))
+        try:
+            status = [STATUS_COMPLETE] * len(combos)
+            survivors = list(range(len(combos)))
+            if self.prune_fraction and self.prune_fraction < 1 and len(combos) > 1:
+                partial = self._evaluate(pool, workers, data, combos, capital,
+                                         self.prune_fraction)
+                returns = np.array([row['total_return'] for row in partial])
+                cutoff = np.quantile(returns, self.prune_quantile)
+                survivors = [i for i in survivors
+                             if not (returns[i] < 0 and returns[i] < cutoff)]
+                for i in set(range(len(combos))) - set(survivors):
+                    status[i] = STATUS_PRUNED
+                rows = partial
+                self.stats['pruned'] = len(combos) - len(survivors)
+            else:
+                rows = [None] * len(combos)
+
+            full = self._evaluate(pool, workers, data, [combos[i] for i in survivors],
+                                  capital, 1.0)
+            for i, row in zip(survivors, full, strict=True):
+                rows[i] = row
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+        table = pd.DataFrame([dict(combo, **row, status=s) for combo, row, s
+                              in zip(combos, rows, status, strict=True)])
+        # 'complete' sorts before 'pruned'
+        table = table.sort_values(['status', self.metric],
+                                  ascending=[True, self.metric in ASCENDING_METRICS],
+                                  kind='stable', ignore_index=True)
+        table.index = pd.RangeIndex(1, len(table) + 1, name='rank')
+        return table
+
+    def _evaluate(self,
+                  pool: Optional[ProcessPoolExecutor],
+                  workers: int,
+                  data: Dict[str, PairData],
+                  combos: List[Dict[str, Any]],
+                  capital: float,
+                  fraction: float) -> List[Dict[str, Any]]:
+        """Evaluate combos here or across the pool, keeping their order"""
+        if pool is None:
+            hits, misses = self.indicators.hits, self.indicators.misses
+            rows = evaluate(data, combos, capital, fraction, self.indicators)
+            self.stats['indicator_hits'] += self.indicators.hits - hits
+            self.stats['indicator_misses'] += self.indicators.misses - misses
+            return rows
+
+        # Contiguous chunks keep combinations that share signals together
+        size = max(1, math.ceil(len(combos) / (4 * workers)))
+        futures = [pool.submit(_evaluate_chunk, combos[i:i + size], fraction)
+                   for i in range(0, len(combos), size)]
+        rows = []
+        for future in futures:
+            chunk, hits, misses = future.result()
+            rows.extend(chunk)
+            self.stats['indicator_hits'] += hits
+            self.stats['indicator_misses'] += misses
+        return rows
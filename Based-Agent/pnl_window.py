@@ -0,0 +1,339 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional
+
+# Default rolling windows, in seconds
+DEFAULT_WINDOWS = {'1h': 3600, '24h': 86400, '7d': 604800}
+
+class PnLSummary(NamedTuple):
+    """Cumulative PnL over a span of buckets: first and last level, extremes,
+    and the largest peak-to-trough fall inside the span"""
+    open: Any
+    high: Any
+    low: Any
+    close: Any
+    drawdown: Any
+
+def _combine(a: PnLSummary, b: PnLSummary) -> PnLSummary:
+    """Summary of span a followed by span b. Associative, which is what lets
+    the window slide in amortised O(1)"""
+    return PnLSummary(a.open, max(a.high, b.high), min(a.low, b.low), b.close,
+                      max(a.drawdown, b.drawdown, a.high - b.low))
+
+class _SlidingWindow:
+    """FIFO of bucket summaries with an O(1) aggregate, kept as two stacks
+    that each carry running combinations"""
+
+    def __init__(self, size: int):
+        self.size = size
+        # (summary, aggregate of it and everything newer in front)
+        self._front: List[tuple] = []
+        # (summary, aggregate of back up to and including it)
+        self._back: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._front) + len(self._back)
+
+    def push(self, summary: PnLSummary) -> None:
+        aggregate = _combine(self._back[-1][1], summary) if self._back else summary
+        self._back.append((summary, aggregate))
+        if len(self) > self.size:
+            self._pop()
+
+    def _pop(self) -> None:
+        if not self._front:
+            for summary, _ in reversed(self._back):
+                aggregate = summary
+                if self._front:
+                    aggregate = _combine(summary, self._front[-1][1])
+                self._front.append((summary, aggregate))
+            self._back.clear()
+        self._front.pop()
+
+    def clear(self) -> None:
+        self._front.clear()
+        self._back.clear()
+
+    def aggregate(self) -> Optional[PnLSummary]:
+        if self._front and self._back:
+            return _combine(self._front[-1][1], self._back[-1][1])
+        if self._front:
+            return self._front[-1][1]
+        if self._back:
+            return self._back[-1][1]
+        return None
+
+class PnLWindow:
+    """Time-bucketed realised PnL with rolling-window drawdown and automatic
+    day rollover.
+
+    PnL is folded into fixed buckets (one minute by default). Each configured
+    window keeps its last buckets in a sliding aggregate, so recording a fill
+    and asking for the 1h/24h/7d PnL, drawdown from peak or worst
+    peak-to-trough are all O(1) (amortised). Bucket and day boundaries come
+    from `clock`, so nothing has to be reset by hand; the trading day starts
+    at day_start_hour, shifted by utc_offset hours.
+
+    With state_path set, each closed bucket that saw PnL is appended to a
+    JSON-lines log there, so recording stays O(1); the log is rewritten
+    with just the live buckets once it has grown well past them, and
+    replayed on start-up.
+    """
+
+    def __init__(self,
+                 bucket_seconds: int = 60,
+                 windows: Optional[Dict[str, int]] = None,
+                 day_start_hour: float = 0,
+                 utc_offset: float = 0,
+                 clock: Callable[[], float] = time.time,
+                 zero: Any = 0.0,
+                 state_path: Optional[str] = None):
+        """
+        Args:
+            bucket_seconds: Bucket width
+            windows: Window name -> length in seconds (default DEFAULT_WINDOWS)
+            day_start_hour: Local hour at which the trading day rolls over
+            utc_offset: Hours added to UTC to get local time
+            clock: Returns the current time in epoch seconds
+            zero: Starting PnL; its type is used throughout (e.g. Decimal('0'))
+            state_path: File to persist buckets to, or None
+        """
+        self.bucket_seconds = bucket_seconds
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.day_offset = (utc_offset - day_start_hour) * 3600
+        self.clock = clock
+        self.zero = zero
+        self.state_path = state_path
+
+        self._sliding = {
+            name: _SlidingWindow(max(int(seconds // bucket_seconds) - 1, 0))
+            for name, seconds in self.windows.items()}
+        self._span = max((w.size for w in self._sliding.values()), default=0)
+        self._lock = threading.Lock()
+
+        self.total = zero
+        self._bucket_index = self._index(clock())
+        self._current = PnLSummary(zero, zero, zero, zero, zero)
+        self._active = False
+        # (bucket index, summary) of buckets with PnL, for persistence
+        self._history: Deque[tuple] = deque()
+        self._day = self._day_index(clock())
+        self._day_open = zero
+        # Lines in the log at state_path, 0 until it is written or loaded
+        self._log_lines = 0
+
+        if state_path and os.path.exists(state_path):
+            self._load(state_path)
+
+    def _index(self, now: float) -> int:
+        return int(now // self.bucket_seconds)
+
+    def _day_index(self, now: float) -> int:
+        return int((now + self.day_offset) // 86400)
+
+    def _advance(self, now: float) -> None:
+        """Close buckets (and the day) that the clock has moved past. Caller
+        holds the lock"""
+        day = self._day_index(now)
+        if day > self._day:
+            self._day = day
+            self._day_open = self.total
+
+        index = self._index(now)
+        if index <= self._bucket_index:
+            return
+        closed = self._active
+        self._close_bucket()
+        self._push_flat(self.total, index - self._bucket_index - 1)
+        self._bucket_index = index
+        total = self.total
+        self._current = PnLSummary(total, total, total, total, self.zero)
+        if closed and self.state_path:
+            self._append(self._history[-1])
+
+    def _push_flat(self, level: Any, count: int) -> None:
+        """Push count idle buckets at a constant level"""
+        flat = PnLSummary(level, level, level, level, self.zero)
+        for window in self._sliding.values():
+            if count >= window.size:
+                # Idle for the whole window; an empty window aggregates the same
+                window.clear()
+            else:
+                for _ in range(count):
+                    window.push(flat)
+
+    def _push_bucket(self, index: int, summary: PnLSummary) -> None:
+        for window in self._sliding.values():
+            window.push(summary)
+        self._history.append((index, summary))
+        while self._history and self._history[0][0] < index - self._span:
+            self._history.popleft()
+
+    def _close_bucket(self) -> None:
+        if self._active:
+            self._push_bucket(self._bucket_index, self._current)
+            self._active = False
+        else:
+            self._push_flat(self.total, 1)
+
+    def record(self, pnl: Any, timestamp: Optional[float] = None) -> None:
+        """Add realised PnL. timestamps older than the current bucket are
+        booked into the current one"""
+        with self._lock:
+            self._advance(self.clock() if timestamp is None else timestamp)
+            self.total += pnl
+            c = self._current
+            high = max(c.high, self.total)
+            self._current = PnLSummary(c.open, high, min(c.low, self.total), self.total,
+                                       max(c.drawdown, high - self.total))
+            self._active = True
+
+    def summary(self, window: str) -> PnLSummary:
+        """Aggregate over a window, including the bucket in progress"""
+        with self._lock:
+            self._advance(self.clock())
+            aggregate = self._sliding[window].aggregate()
+            if aggregate is None:
+                return self._current
+            return _combine(aggregate, self._current)
+
+    def pnl(self, window: str) -> Any:
+        """Net PnL over the window"""
+        s = self.summary(window)
+        return s.close - s.open
+
+    def drawdown(self, window: str) -> Any:
+        """Current fall from the window's peak"""
+        s = self.summary(window)
+        return s.high - s.close
+
+    def max_drawdown(self, window: str) -> Any:
+        """Worst peak-to-trough fall within the window"""
+        return self.summary(window).drawdown
+
+    def daily_pnl(self) -> Any:
+        """PnL since the current trading day started"""
+        with self._lock:
+            self._advance(self.clock())
+            return self.total - self._day_open
+
+    def reset_day(self) -> None:
+        """Start the day's PnL from here, ahead of the automatic rollover"""
+        with self._lock:
+            self._day_open = self.total
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """PnL, drawdown and max drawdown for every window"""
+        result = {}
+        for name in self.windows:
+            s = self.summary(name)
+            result[name] = {'pnl': s.close - s.open, 'drawdown': s.high - s.close,
+                            'max_drawdown': s.drawdown}
+        return result
+
+    def _state(self) -> str:
+        return json.dumps({'total': self.total, 'day': self._day,
+                           'day_open': self._day_open}, default=str)
+
+    @staticmethod
+    def _row(index: int, summary: PnLSummary) -> str:
+        return json.dumps([index] + list(summary), default=str)
+
+    def _append(self, bucket: tuple) -> None:
+        """Append a closed bucket and the running totals to the log. A new
+        log is written whole, with its header, and the log is rewritten once
+        appends outnumber the live buckets. Caller holds the lock"""
+        if not self._log_lines or self._log_lines >= 2 * len(self._history) + 64:
+            self._rewrite()
+            return
+        try:
+            with open(self.state_path, 'a') as f:
+                f.write(f'{self._row(*bucket)}\n{self._state()}\n')
+            self._log_lines += 2
+        except OSError as e:
+            print(f"Failed to persist PnL window: {str(e)}")
+
+    def _rewrite(self, extra: Optional[tuple] = None) -> None:
+        """Atomically replace the log with the buckets still in the widest
+        window (plus extra). Caller holds the lock"""
+        buckets = list(self._history) + ([extra] if extra else [])
+        lines = [json.dumps({'bucket_seconds': self.bucket_seconds})]
+        lines += [self._row(index, summary) for index, summary in buckets]
+        lines.append(self._state())
+        tmp = f'{self.state_path}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(tmp, self.state_path)
+            self._log_lines = len(lines)
+        except OSError as e:
+            print(f"Failed to persist PnL window: {str(e)}")
+
+    def save(self) -> None:
+        """Persist now, including the bucket in progress. Its final summary
+        is appended again when it closes, and replaces this one on load"""
+        if not self.state_path:
+            return
+        with self._lock:
+            self._rewrite((self._bucket_index, self._current) if self._active else None)
+
+    def _load(self, path: str) -> None:
+        """Replay persisted buckets, filling the idle ones in between"""
+        state: Dict[str, Any] = {}
+        rows = {}
+        lines = 0
+        try:
+            with open(path) as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A write torn by a crash
+                        continue
+                    if isinstance(entry, dict):
+                        state.update(entry)
+                    else:
+                        # Later rows of the same bucket supersede earlier ones
+                        rows[entry[0]] = entry
+        except OSError as e:
+            print(f"Ignoring unreadable PnL state {path}: {str(e)}")
+            return
+        # A log without its header is taken to use the configured buckets
+        if 'total' not in state:
+            return
+        if state.get('bucket_seconds', self.bucket_seconds) != self.bucket_seconds:
+            return
+        self._log_lines = lines
+
+        number = type(self.zero)
+        now_index = self._bucket_index
+        total = self.total = number(state['total'])
+        self._current = PnLSummary(total, total, total, total, self.zero)
+
+        previous = None
+        level = self.total
+        for index in sorted(rows):
+            summary = PnLSummary(*(number(v) for v in rows[index][1:]))
+            if index >= now_index:
+                if index == now_index:
+                    # Restarted within the bucket that was in progress
+                    self._current = summary
+                    self._active = True
+                break
+            if index < now_index - self._span:
+                continue
+            if previous is not None:
+                self._push_flat(level, index - previous - 1)
+            self._push_bucket(index, summary)
+            level, previous = summary.close, index
+        if previous is not None:
+            self._push_flat(level, now_index - previous - 1)
+
+        if state.get('day') == self._day:
+            self._day_open = number(state['day_open'])
+        else:
+            self._day_open = self.total
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import websockets
+
+
+class PriceTick(NamedTuple):
+    """Latest known prices for a symbol. Immutable, so readers never see a
+    half-written update"""
+    symbol: str
+    mark: Optional[float]
+    last: Optional[float]
+    bid: Optional[float]
+    ask: Optional[float]
+    timestamp: float
+
+class PriceBook:
+    """In-process book of the latest mark/last/bid/ask per symbol.
+
+    A streaming feed (MarketDataStream) or REST fallbacks write into it; trading
+    code reads from it instead of blocking on an HTTP round trip. Each update
+    swaps in a new PriceTick, so reads need no lock. Writers serialise on a
+    lock only to merge partial updates.
+    """
+
+    def __init__(self, max_age: float = 5.0):
+        """
+        Args:
+            max_age: Seconds after which a price is considered stale
+        """
+        self.max_age = max_age
+        self._ticks: Dict[str, PriceTick] = {}
+        self._subscribers: Dict[Optional[str], List[Callable[[PriceTick], None]]] = {}
+        self._write_lock = threading.Lock()
+
+    def update(self,
+               symbol: str,
+               mark: Optional[float] = None,
+               last: Optional[float] = None,
+               bid: Optional[float] = None,
+               ask: Optional[float] = None,
+               timestamp: Optional[float] = None) -> PriceTick:
+        """Record new prices for a symbol. Fields left as None keep their
+        previous value"""
+        with self._write_lock:
+            previous = self._ticks.get(symbol)
+            if previous is not None:
+                mark = previous.mark if mark is None else mark
+                last = previous.last if last is None else last
+                bid = previous.bid if bid is None else bid
+                ask = previous.ask if ask is None else ask
+            tick = PriceTick(symbol, mark, last, bid, ask,
+                             time.time() if timestamp is None else timestamp)
+            self._ticks[symbol] = tick
+
+        callbacks = self._subscribers.get(symbol, []) + self._subscribers.get(None, [])
+        for callback in callbacks:
+            try:
+                callback(tick)
+            except Exception as e:
+                print(f"Price subscriber error for {symbol}: {str(e)}")
+        return tick
+
+    def get(self, symbol: str) -> Optional[PriceTick]:
+        """Get the latest tick for a symbol, however old"""
+        return self._ticks.get(symbol)
+
+    def age(self, symbol: str) -> float:
+        """Seconds since the symbol was last updated (inf if never)"""
+        tick = self._ticks.get(symbol)
+        return time.time() - tick.timestamp if tick else float('inf')
+
+    def is_stale(self, symbol: str, max_age: Optional[float] = None) -> bool:
+        """Check whether a symbol's prices are older than max_age"""
+        return self.age(symbol) > (self.max_age if max_age is None else max_age)
+
+    def get_mark_price(self,
+                       symbol: str,
+                       max_age: Optional[float] = None) -> Optional[float]:
+        """Get the mark price if it is fresh, otherwise None so the caller
+        can fall back to REST"""
+        tick = self._ticks.get(symbol)
+        if tick is None or tick.mark is None:
+            return None
+        limit = self.max_age if max_age is None else max_age
+        if time.time() - tick.timestamp > limit:
+            return None
+        return tick.mark
+
+    def subscribe(self,
+                  callback: Callable[[PriceTick], None],
+                  symbol: Optional[str] = None) -> Callable[[], None]:
+        """Call callback with every new tick for symbol (or for all symbols
+        when symbol is None). Returns a function that unsubscribes"""
+        with self._write_lock:
+            # Copy-on-write so update() can iterate without holding the lock
+            callbacks = list(self._subscribers.get(symbol, []))
+            callbacks.append(callback)
+            self._subscribers[symbol] = callbacks
+
+        def unsubscribe():
+            with self._write_lock:
+                callbacks = self._subscribers.get(symbol, [])
+                self._subscribers[symbol] = [c for c in callbacks if c is not callback]
+        return unsubscribe
+
+class MarketDataStream:
+    """Keeps a PriceBook current from the MEXC contract ticker websocket.
+
+    The push.ticker channel carries fair (mark), last, bid and ask prices in
+    one message. Reconnects with backoff if the connection drops.
+    """
+
+    def __init__(self,
+                 book: PriceBook,
+                 symbols: Iterable[str],
+                 url: str = 'wss://contract.mexc.com/edge',
+                 ping_interval: float = 15.0):
+        self.book = book
+        self.symbols = list(symbols)
+        self.url = url
+        self.ping_interval = ping_interval
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def to_contract_symbol(symbol: str) -> str:
+        """'BTCUSDT' -> 'BTC_USDT'"""
+        if '_' in symbol or not symbol.endswith('USDT'):
+            return symbol
+        return f'{symbol[:-4]}_USDT'
+
+    @staticmethod
+    def parse_message(raw: str) -> Optional[Dict]:
+        """Extract prices from a push.ticker message, None for anything else"""
+        message = json.loads(raw)
+        if message.get('channel') != 'push.ticker':
+            return None
+        data = message.get('data') or {}
+
+        def number(key):
+            value = data.get(key)
+            return float(value) if value is not None else None
+
+        return {
+            'symbol': data.get('symbol', '').replace('_', ''),
+            'mark': number('fairPrice'),
+            'last': number('lastPrice'),
+            'bid': number('bid1'),
+            'ask': number('ask1'),
+            'timestamp': message['ts'] / 1000 if 'ts' in message else None
+        }
+
+    async def _keepalive(self, ws) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send(json.dumps({'method': 'ping'}))
+
+    async def run(self) -> None:
+        """Consume the feed until stop() is called"""
+        self._running = True
+        backoff = 1.0
+        while self._running:
+            try:
+                async with websockets.connect(self.url) as ws:
+                    for symbol in self.symbols:
+                        await ws.send(json.dumps({
+                            'method': 'sub.ticker',
+                            'param': {'symbol': self.to_contract_symbol(symbol)}
+                        }))
+                    backoff = 1.0
+                    keepalive = asyncio.ensure_future(self._keepalive(ws))
+                    try:
+                        async for raw in ws:
+                            if not self._running:
+                                break
+                            update = self.parse_message(raw)
+                            if update and update['symbol']:
+                                self.book.update(**update)
+                    finally:
+                        keepalive.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._running:
+                    break
+                print(f"Market data stream error: {str(e)}, "
+                      f"reconnecting in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def start_in_thread(self) -> threading.Thread:
+        """Run the feed on its own event loop, for synchronous callers"""
+        def target():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.run())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        """Stop the feed (the current connection closes on its next message)"""
+        self._running = False
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(
+                lambda: [task.cancel() for task in asyncio.all_tasks(self._loop)])
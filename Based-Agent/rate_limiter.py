@@ -0,0 +1,287 @@
+import asyncio
+import contextlib
+import copy
+import functools
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Lower runs first
+PRIORITY_ORDER = 0
+PRIORITY_READ = 1
+
+# Request weights per (method, endpoint); anything else weighs 1
+DEFAULT_WEIGHTS = {
+    ('POST', '/api/v3/order'): 1,
+    ('DELETE', '/api/v3/order'): 1,
+    ('GET', '/api/v3/order'): 2,
+    ('GET', '/api/v3/openOrders'): 3,
+    ('GET', '/api/v3/account'): 10,
+    ('GET', '/api/v3/positionRisk'): 5,
+    ('GET', '/api/v3/premiumIndex'): 1,
+    ('GET', '/api/v3/leverageBracket'): 1,
+    ('GET', '/api/v3/exchangeInfo'): 10,
+}
+
+class TokenBucket:
+    """Classic token bucket: holds up to capacity tokens, refilled
+    continuously at refill_rate tokens per second. Not thread-safe on its
+    own; RequestScheduler serialises access"""
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        refilled = self.tokens + (now - self._updated) * self.refill_rate
+        self.tokens = min(self.capacity, refilled)
+        self._updated = now
+
+    def try_take(self, weight: float, reserve: float = 0.0) -> float:
+        """Take weight tokens while leaving reserve untouched. Returns 0 on
+        success, otherwise the seconds until enough tokens accumulate"""
+        self._refill(time.monotonic())
+        needed = weight + reserve
+        if self.tokens >= needed:
+            self.tokens -= weight
+            return 0.0
+        return (needed - self.tokens) / self.refill_rate
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the exchange answered 429"""
+        self._refill(time.monotonic())
+        self.tokens = 0.0
+
+class RequestScheduler:
+    """Client-side rate limiter and priority scheduler for MEXC requests.
+
+    Every request spends its endpoint weight from a shared token bucket.
+    Waiting requests are served by priority, then arrival order: order
+    placement and cancels (PRIORITY_ORDER) always go ahead of queued reads.
+    Reads also have to leave `order_reserve` tokens in the bucket, so a burst
+    of position queries can never starve an order. Only the head of the queue
+    waits on the clock, for its refill delay; the others sleep until they
+    reach the head and are woken. Concurrent identical reads can be
+    coalesced into a single request; every caller gets its own copy of the
+    response.
+    """
+
+    def __init__(self,
+                 capacity: float = 500,
+                 refill_rate: float = 50.0,
+                 order_reserve: float = 50,
+                 weights: Optional[Dict[Tuple[str, str], float]] = None):
+        """
+        Args:
+            capacity: Bucket size (burst budget) in weight units
+            refill_rate: Weight units restored per second
+            order_reserve: Tokens reads must leave for orders and cancels
+            weights: Override DEFAULT_WEIGHTS
+        """
+        self.bucket = TokenBucket(capacity, refill_rate)
+        self.order_reserve = min(order_reserve, capacity)
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+
+        self._lock = threading.RLock()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._blocked_until = 0.0
+        self._wakers: Dict[Tuple[int, int], Callable[[], Any]] = {}
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._in_flight_async: Dict[Hashable, asyncio.Future] = {}
+        self._followers: Dict[Hashable, int] = {}
+        self._followers_async: Dict[asyncio.Future, int] = {}
+
+        self._stats = {
+            priority: {'requests': 0, 'waited': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+            for priority in (PRIORITY_ORDER, PRIORITY_READ)
+        }
+        self._max_queue_depth = 0
+        self._coalesced = 0
+        self._throttled = 0
+
+    def classify(self, method: str, endpoint: str) -> Tuple[float, int]:
+        """Return (weight, priority) for a request"""
+        weight = min(self.weights.get((method, endpoint), 1), self.bucket.capacity)
+        priority = PRIORITY_READ if method == 'GET' else PRIORITY_ORDER
+        return weight, priority
+
+    def _try_grant(self, ticket: Tuple[int, int], weight: float) -> Optional[float]:
+        """Grant the request if it is at the head of the queue and tokens are
+        available. Returns 0 when granted, the seconds until the head can go,
+        or None behind the head (wait for _wake). Caller holds the lock"""
+        if self._waiting[0] != ticket:
+            return None
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        reserve = self.order_reserve if ticket[0] == PRIORITY_READ else 0.0
+        wait = self.bucket.try_take(weight, reserve)
+        if wait == 0.0:
+            heapq.heappop(self._waiting)
+        return wait
+
+    def _enqueue(self, priority: int) -> Tuple[int, int]:
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(self._waiting, ticket)
+        self._max_queue_depth = max(self._max_queue_depth, len(self._waiting))
+        return ticket
+
+    def _wake(self) -> None:
+        """Wake the waiter at the head of the queue (thread or coroutine) to
+        try again. Caller holds the lock"""
+        if self._waiting:
+            self._wakers[self._waiting[0]]()
+
+    def _dequeue(self, ticket: Tuple[int, int]) -> None:
+        """Drop a ticket that gave up waiting. Caller holds the lock"""
+        del self._wakers[ticket]
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+            self._wake()
+
+    def _record(self, priority: int, waited: float) -> None:
+        stats = self._stats[priority]
+        stats['requests'] += 1
+        if waited > 0.001:
+            stats['waited'] += 1
+        stats['total_wait'] += waited
+        stats['max_wait'] = max(stats['max_wait'], waited)
+
+    def acquire(self, method: str, endpoint: str) -> float:
+        """Block until the request may be sent. Returns seconds waited"""
+        weight, priority = self.classify(method, endpoint)
+        start = time.monotonic()
+        with self._lock:
+            ticket = self._enqueue(priority)
+            ready = threading.Condition(self._lock)
+            self._wakers[ticket] = ready.notify
+            try:
+                while True:
+                    wait = self._try_grant(ticket, weight)
+                    if wait == 0.0:
+                        break
+                    ready.wait(wait)
+            finally:
+                self._dequeue(ticket)
+            waited = time.monotonic() - start
+            self._record(priority, waited)
+            self._wake()
+        return waited
+
+    async def acquire_async(self, method: str, endpoint: str) -> float:
+        """asyncio version of acquire()"""
+        weight, priority = self.classify(method, endpoint)
+        start = time.monotonic()
+        ready = asyncio.Event()
+        with self._lock:
+            ticket = self._enqueue(priority)
+            loop = asyncio.get_running_loop()
+            self._wakers[ticket] = functools.partial(loop.call_soon_threadsafe,
+                                                     ready.set)
+        try:
+            while True:
+                with self._lock:
+                    ready.clear()
+                    wait = self._try_grant(ticket, weight)
+                    if wait == 0.0:
+                        waited = time.monotonic() - start
+                        self._record(priority, waited)
+                        self._wake()
+                        return waited
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(ready.wait(), wait)
+        finally:
+            with self._lock:
+                self._dequeue(ticket)
+
+    def penalize(self, retry_after: float = 1.0) -> None:
+        """Hold all requests for retry_after seconds after a 429"""
+        with self._lock:
+            self._throttled += 1
+            self.bucket.drain()
+            self._blocked_until = max(self._blocked_until,
+                                      time.monotonic() + retry_after)
+            self._wake()
+
+    def coalesce(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn, or wait for an identical call (same key) already in flight
+        and share its result. When the result is shared, every caller gets a
+        deep copy, so one caller's changes cannot leak into another's"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+                self._followers[key] = 0
+            else:
+                self._followers[key] += 1
+                self._coalesced += 1
+
+        if not owner:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                shared = self._followers.pop(key)
+        return copy.deepcopy(result) if shared else result
+
+    async def coalesce_async(self,
+                             key: Hashable,
+                             fn: Callable[[], Awaitable[Any]]) -> Any:
+        """asyncio version of coalesce()"""
+        task = self._in_flight_async.get(key)
+        if task is not None:
+            self._coalesced += 1
+            self._followers_async[task] += 1
+            return copy.deepcopy(await asyncio.shield(task))
+
+        task = asyncio.ensure_future(fn())
+        self._in_flight_async[key] = task
+        self._followers_async[task] = 0
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            if self._in_flight_async.get(key) is task:
+                del self._in_flight_async[key]
+            shared = self._followers_async.pop(task)
+        return copy.deepcopy(result) if shared else result
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, wait times and throttling counters"""
+        with self._lock:
+            depth = {'orders': 0, 'reads': 0}
+            for priority, _ in self._waiting:
+                depth['orders' if priority == PRIORITY_ORDER else 'reads'] += 1
+            waits = {}
+            for priority, stats in self._stats.items():
+                name = 'orders' if priority == PRIORITY_ORDER else 'reads'
+                waits[name] = {
+                    'requests': stats['requests'],
+                    'waited': stats['waited'],
+                    'mean_wait': stats['total_wait'] / max(stats['requests'], 1),
+                    'max_wait': stats['max_wait']
+                }
+            return {
+                'queue_depth': depth,
+                'max_queue_depth': self._max_queue_depth,
+                'wait': waits,
+                'coalesced': self._coalesced,
+                'throttled': self._throttled,
+                'tokens': self.bucket.tokens
+            }
@@ -1,17 +1,99 @@
-from typing import Dict, Optional
 from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Union
+
+from pnl_window import PnLWindow
+from price_book import PriceBook, PriceTick
+from stop_engine import STOP_LOSS, TAKE_PROFIT, StopEngine, StopEvent
+
+try:
+    import numpy as np
+
+    from var_engine import CovarianceVaR
+except ImportError:
+    # Batch sizing and VaR are optional; the scalar path needs only Decimal
+    np = None
+    CovarianceVaR = None
+
+# Agreement between calculate_position_sizes and the Decimal path. Every
+# float64 operation is correctly rounded, so risk amounts, stops and targets
+# are within a few ulps (relative error < 1e-15). Sizes divide by
+# |entry - stop|, which amplifies input rounding by entry / |entry - stop|;
+# for stops at least 0.01% from entry that stays below BATCH_SIZE_RTOL.
+BATCH_RTOL = 1e-15
+BATCH_SIZE_RTOL = 1e-9
+
+ArrayLike = Union[Sequence[float], 'np.ndarray']
 
 class RiskManager:
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, price_book: Optional[PriceBook] = None):
         self.max_position_size = Decimal(str(config.get('maxPositionSize', 1000)))
         self.max_leverage = int(config.get('maxLeverage', 10))
         self.default_stop_loss = Decimal(str(config.get('defaultStopLoss', 2.0)))
         self.default_take_profit = Decimal(str(config.get('defaultTakeProfit', 6.0)))
         self.max_daily_drawdown = Decimal(str(config.get('maxDailyDrawdown', 5.0)))
         self.max_total_risk = Decimal(str(config.get('maxTotalRisk', 20.0)))
+        max_symbol_exposure = config.get('maxSymbolExposure')
+        self.max_symbol_exposure = (Decimal(str(max_symbol_exposure))
+                                    if max_symbol_exposure else None)
+        max_portfolio_var = config.get('maxPortfolioVaR')
+        self.max_portfolio_var = float(max_portfolio_var) if max_portfolio_var else None
         
-        self.daily_pnl = Decimal('0')
-        self.open_positions = {}
+        # Realised PnL in per-minute buckets; the day rolls over by itself
+        self.pnl = PnLWindow(day_start_hour=float(config.get('dayStartHour', 0)),
+                             utc_offset=float(config.get('utcOffset', 0)),
+                             zero=Decimal('0'),
+                             state_path=config.get('pnlStatePath'))
+        self.open_positions: Dict[str, Dict] = {}
+        self.price_book = price_book
+        trailing_stop = config.get('trailingStop')
+        self.stop_engine = StopEngine(
+            breakeven_percent=2.0,
+            trailing_percent=float(trailing_stop) if trailing_stop else None)
+        # Mark prices drive the engine; its events move stops and flag exits
+        self.stop_engine.subscribe(self._apply_stop_events)
+        self._detach_stops = None
+        if price_book is not None:
+            self._detach_stops = self.stop_engine.attach(price_book)
+
+        # Running aggregates over open_positions, adjusted on every open,
+        # resize and close so pre-trade checks never iterate the book
+        self.total_risk = Decimal('0')
+        self.symbol_exposure: Dict[str, Decimal] = {}
+        self.side_notional = {'LONG': Decimal('0'), 'SHORT': Decimal('0')}
+        self.leveraged_exposure = Decimal('0')
+        self._symbol_counts: Dict[str, int] = {}
+
+        # Correlation-aware VaR over the same positions. With a price book it
+        # is fed the last mark of every symbol each time a bar closes;
+        # otherwise feed it with var_engine.update_prices
+        self.var_engine = None
+        if CovarianceVaR is not None:
+            self.var_engine = CovarianceVaR(
+                decay=float(config.get('varDecay', 0.94)),
+                confidence=float(config.get('varConfidence', 0.99)))
+        self.var_bar_seconds = float(config.get('varBarSeconds', 60))
+        self._bar_index: Optional[int] = None
+        self._bar_prices: Dict[str, float] = {}
+        self._detach_var = None
+        if price_book is not None and self.var_engine is not None:
+            self._detach_var = price_book.subscribe(self._sample_bar)
+
+    def _sample_bar(self, tick: PriceTick) -> None:
+        """Collect mark prices and hand the closing ones to var_engine
+        when a tick starts a new bar"""
+        if tick.mark is None:
+            return
+        index = int(tick.timestamp // self.var_bar_seconds)
+        if self._bar_index is not None and index > self._bar_index and self._bar_prices:
+            self.var_engine.update_prices(dict(self._bar_prices))
+        if self._bar_index is None or index > self._bar_index:
+            self._bar_index = index
+        self._bar_prices[tick.symbol] = tick.mark
+
+    @property
+    def daily_pnl(self) -> Decimal:
+        """Realised PnL since the trading day started"""
+        return self.pnl.daily_pnl()
 
     def calculate_position_size(self,
                               account_balance: Decimal,
@@ -37,12 +119,116 @@ class RiskManager:
             'take_profit': entry_price * (1 + self.default_take_profit / 100)
         }
 
+    def calculate_position_sizes(self,
+                                 account_balances: ArrayLike,
+                                 entry_prices: ArrayLike,
+                                 stop_losses: Optional[ArrayLike] = None,
+                                 leverages: Optional[ArrayLike] = None,
+                                 symbols: Optional[Union[str, Sequence[str]]] = None,
+                                 sides: Union[str, Sequence[str]] = 'LONG') -> Dict:
+        """Vectorised calculate_position_size for a burst of signals.
+
+        Inputs broadcast against each other; NaN stop losses (or
+        stop_losses=None) fall back to the default stop. Results match the
+        scalar path within BATCH_RTOL, and sizes within BATCH_SIZE_RTOL.
+
+        When leverages are given, 'allowed' gates every signal the way
+        can_open_position would at its computed size: leverage, daily
+        drawdown and total risk, plus per-symbol exposure and portfolio VaR
+        when symbols are given. Each signal is checked against the current
+        book on its own, not cumulatively with the rest of the burst.
+
+        Returns:
+            Dict of float64 arrays: size, risk_amount, stop_loss, take_profit
+            (and a boolean 'allowed' array)
+        """
+        if np is None:
+            raise ImportError('calculate_position_sizes requires numpy')
+
+        balances = np.asarray(account_balances, dtype=np.float64)
+        entries = np.asarray(entry_prices, dtype=np.float64)
+        shapes = [balances.shape, entries.shape, np.shape(stop_losses)]
+        if leverages is not None:
+            shapes.append(np.shape(leverages))
+            if symbols is not None:
+                # One signal per symbol even when the prices are shared
+                shapes += [np.shape(symbols), np.shape(sides)]
+        shape = np.broadcast_shapes(*shapes)
+        balances = np.broadcast_to(balances, shape)
+        entries = np.broadcast_to(entries, shape)
+        default_stops = entries * (1 - float(self.default_stop_loss) / 100)
+        if stop_losses is None:
+            stops = default_stops
+        else:
+            stops = np.broadcast_to(np.asarray(stop_losses, dtype=np.float64),
+                                    entries.shape)
+            stops = np.where(np.isnan(stops), default_stops, stops)
+
+        risk_amounts = balances * 0.02  # 2% risk per trade
+        risk_per_unit = np.abs(entries - stops)
+        if not risk_per_unit.all():
+            # Same failure as the Decimal path rather than silently returning inf
+            index = np.flatnonzero(risk_per_unit == 0)
+            raise ZeroDivisionError(f'Stop loss equals entry price at index {index}')
+
+        result = {
+            'size': np.minimum(risk_amounts / risk_per_unit,
+                               float(self.max_position_size)),
+            'risk_amount': risk_amounts,
+            'stop_loss': stops,
+            'take_profit': entries * (1 + float(self.default_take_profit) / 100)
+        }
+
+        if leverages is not None:
+            # Portfolio-level gates are the same for every signal in the burst
+            portfolio_ok = (self.daily_pnl > -self.max_daily_drawdown and
+                            self.total_risk < self.max_total_risk)
+            allowed = (np.asarray(leverages) <= self.max_leverage) & portfolio_ok
+            allowed = np.broadcast_to(allowed, entries.shape)
+            if symbols is not None:
+                notionals = result['size'] * entries
+                allowed = allowed & self._symbol_gates(symbols, sides, notionals)
+            result['allowed'] = allowed
+        return result
+
+    def _symbol_gates(self,
+                      symbols: Union[str, Sequence[str]],
+                      sides: Union[str, Sequence[str]],
+                      notionals: 'np.ndarray') -> 'np.ndarray':
+        """Per-symbol exposure and portfolio VaR gates of
+        calculate_position_sizes, looking up each distinct symbol once"""
+        symbols = np.broadcast_to(np.asarray(symbols), notionals.shape)
+        names, inverse = np.unique(symbols, return_inverse=True)
+        inverse = inverse.reshape(notionals.shape)
+        allowed = np.ones(notionals.shape, dtype=bool)
+
+        if self.max_symbol_exposure is not None:
+            current = np.array([float(self.symbol_exposure.get(name, 0))
+                                for name in names])
+            allowed &= current[inverse] + notionals <= float(self.max_symbol_exposure)
+
+        if self.max_portfolio_var is not None and self.var_engine is not None:
+            ready = np.array([self.var_engine.ready(name) for name in names])[inverse]
+            sides = np.char.upper(np.asarray(sides, dtype=str))
+            signed = np.where(np.isin(sides, ('SHORT', 'SELL')), -notionals, notionals)
+            var = self.var_engine.vars_with(symbols.ravel(), signed.ravel())
+            var = var.reshape(notionals.shape)
+            allowed &= ~ready | (var <= self.max_portfolio_var)
+        return allowed
+
     def can_open_position(self,
                          symbol: str,
                          side: str,
                          size: Decimal,
-                         leverage: int) -> Dict:
-        """Check if new position meets risk criteria"""
+                         leverage: int,
+                         entry_price: Optional[Decimal] = None) -> Dict:
+        """Check if new position meets risk criteria.
+
+        Runs in constant time regardless of how many positions are open.
+        The per-symbol exposure and portfolio VaR limits are only checked
+        when entry_price is given and maxSymbolExposure / maxPortfolioVaR
+        are configured; VaR also waits until the symbol has enough bars.
+        """
         # Check leverage limit
         if leverage > self.max_leverage:
             return {
@@ -57,50 +243,217 @@ class RiskManager:
                 'reason': f'Daily drawdown limit reached: {self.daily_pnl}%'
             }
 
-        # Calculate total risk
-        total_risk = sum(pos['risk_amount'] for pos in self.open_positions.values())
-        if total_risk >= self.max_total_risk:
+        # Check total risk
+        if self.total_risk >= self.max_total_risk:
             return {
                 'allowed': False,
-                'reason': f'Maximum total risk reached: {total_risk}%'
+                'reason': f'Maximum total risk reached: {self.total_risk}%'
             }
 
+        # Check per-symbol exposure
+        if self.max_symbol_exposure is not None and entry_price is not None:
+            added = Decimal(str(size)) * Decimal(str(entry_price))
+            exposure = self.symbol_exposure.get(symbol, Decimal('0')) + added
+            if exposure > self.max_symbol_exposure:
+                return {
+                    'allowed': False,
+                    'reason': f'{symbol} exposure {exposure} would exceed '
+                              f'maximum {self.max_symbol_exposure}'
+                }
+
+        # Check portfolio VaR, taking correlation with open positions into account
+        if (self.max_portfolio_var is not None and entry_price is not None and
+                self.var_engine is not None and self.var_engine.ready(symbol)):
+            notional = float(size) * float(entry_price)
+            if side.upper() in ('SHORT', 'SELL'):
+                notional = -notional
+            var = self.var_engine.var_with(symbol, notional)
+            if var > self.max_portfolio_var:
+                return {
+                    'allowed': False,
+                    'reason': f'Portfolio VaR {var:.2f} would exceed '
+                              f'maximum {self.max_portfolio_var}'
+                }
+
         return {'allowed': True}
 
+    def _apply_aggregates(self, position: Dict, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) a position's contribution"""
+        symbol = position['symbol']
+        notional = position['size'] * position['entry_price']
+        self.total_risk += sign * position['risk_amount']
+        self.side_notional[position['side']] += sign * notional
+        self.leveraged_exposure += sign * notional * position['leverage']
+        if self.var_engine is not None:
+            signed = notional if position['side'] == 'LONG' else -notional
+            self.var_engine.add_exposure(symbol, float(sign * signed))
+
+        count = self._symbol_counts.get(symbol, 0) + sign
+        if count:
+            self._symbol_counts[symbol] = count
+            exposure = self.symbol_exposure.get(symbol, Decimal('0'))
+            self.symbol_exposure[symbol] = exposure + sign * notional
+        else:
+            # Drop the entry outright so rounding can never leave a residue
+            self._symbol_counts.pop(symbol, None)
+            self.symbol_exposure.pop(symbol, None)
+
+    def open_position(self,
+                      symbol: str,
+                      side: str,
+                      size: Decimal,
+                      entry_price: Decimal,
+                      leverage: int = 1,
+                      risk_amount: Decimal = Decimal('0'),
+                      key: Optional[str] = None,
+                      **extra) -> Dict:
+        """Register an open position and fold it into the aggregates.
+
+        Positions are keyed by symbol unless a key is given (e.g. one per
+        side in hedge mode). Re-opening an existing key replaces it. A
+        position opened with a stop_loss is handed to stop_engine.
+        """
+        key = key or symbol
+        side = side.upper()
+        side = {'BUY': 'LONG', 'SELL': 'SHORT'}.get(side, side)
+        if key in self.open_positions:
+            self.close_position(key)
+
+        position = dict(extra,
+                        symbol=symbol,
+                        side=side,
+                        size=Decimal(str(size)),
+                        entry_price=Decimal(str(entry_price)),
+                        leverage=int(leverage),
+                        risk_amount=Decimal(str(risk_amount)))
+        self.open_positions[key] = position
+        self._apply_aggregates(position, 1)
+        if position.get('stop_loss') is not None:
+            self.stop_engine.track(key, symbol, side, position['entry_price'],
+                                   position['stop_loss'],
+                                   take_profit=position.get('take_profit'))
+        return position
+
+    def resize_position(self,
+                        key: str,
+                        size: Decimal,
+                        risk_amount: Optional[Decimal] = None,
+                        entry_price: Optional[Decimal] = None) -> Optional[Dict]:
+        """Change an open position's size (and optionally its risk or
+        average entry), adjusting the aggregates by the difference"""
+        position = self.open_positions.get(key)
+        if position is None:
+            return None
+
+        self._apply_aggregates(position, -1)
+        position['size'] = Decimal(str(size))
+        if risk_amount is not None:
+            position['risk_amount'] = Decimal(str(risk_amount))
+        if entry_price is not None:
+            position['entry_price'] = Decimal(str(entry_price))
+        self._apply_aggregates(position, 1)
+        return position
+
+    def close_position(self, key: str) -> Optional[Dict]:
+        """Remove a position from the registry and the aggregates"""
+        position = self.open_positions.pop(key, None)
+        if position is not None:
+            self._apply_aggregates(position, -1)
+            self.stop_engine.untrack(key)
+        return position
+
     def update_position(self,
                        symbol: str,
                        pnl: Decimal,
-                       is_closed: bool = False) -> None:
+                       is_closed: bool = False,
+                       size: Optional[Decimal] = None) -> None:
         """Update position and risk metrics"""
-        self.daily_pnl += pnl
+        self.pnl.record(Decimal(str(pnl)))
         
         if is_closed:
-            if symbol in self.open_positions:
-                del self.open_positions[symbol]
+            self.close_position(symbol)
+        elif size is not None:
+            self.resize_position(symbol, size)
+
+    def exposure(self) -> Dict:
+        """Snapshot of the running portfolio aggregates"""
+        gross = self.side_notional['LONG'] + self.side_notional['SHORT']
+        return {
+            'positions': len(self.open_positions),
+            'total_risk': self.total_risk,
+            'long_notional': self.side_notional['LONG'],
+            'short_notional': self.side_notional['SHORT'],
+            'net_notional': self.side_notional['LONG'] - self.side_notional['SHORT'],
+            'leveraged_exposure': self.leveraged_exposure,
+            'average_leverage': (self.leveraged_exposure / gross
+                                 if gross else Decimal('0'))
+        }
 
     def reset_daily_metrics(self) -> None:
-        """Reset daily risk metrics"""
-        self.daily_pnl = Decimal('0')
+        """Reset daily risk metrics ahead of the automatic day rollover"""
+        self.pnl.reset_day()
+
+    def drawdown_metrics(self) -> Dict:
+        """PnL, drawdown from peak and worst peak-to-trough for the 1h, 24h
+        and 7d windows"""
+        return self.pnl.metrics()
+
+    def close(self) -> None:
+        """Stop following the price book and persist the PnL window,
+        including the bucket in progress. Call on shutdown"""
+        for detach in (self._detach_stops, self._detach_var):
+            if detach is not None:
+                detach()
+        self._detach_stops = self._detach_var = None
+        self.pnl.save()
+
+    def _apply_stop_events(self, events: List[StopEvent]) -> None:
+        """Mirror the stops the engine moved and flag positions whose stop
+        loss or take profit was crossed.
+
+        Flagged positions stay in the book and the aggregates until the
+        exchange fill is confirmed with update_position(..., is_closed=True).
+        Whoever owns the exchange orders subscribes to stop_engine as well
+        (see TradingBot.follow_stops)
+        """
+        for event in events:
+            position = self.open_positions.get(event.key)
+            if position is None:
+                continue
+            if event.kind in (STOP_LOSS, TAKE_PROFIT):
+                position['exit_pending'] = event.kind
+            else:
+                position['stop_loss'] = Decimal(str(event.stop_loss))
 
     def get_adjusted_stops(self,
                           symbol: str,
-                          current_price: Decimal,
+                          current_price: Optional[Decimal],
                           position: Dict) -> Dict:
-        """Calculate adjusted stop loss and take profit levels"""
+        """Stop loss and take profit levels of the position under key symbol
+
+        Read-only: a position tracked by stop_engine gets the engine's
+        current stop. Prices reach the engine only through the price book or
+        stop_engine.on_tick. An untracked position's stop moves to breakeven
+        once current_price is the engine's breakeven_percent in profit.
+        Returns {} for a position that is not open.
+        """
         if symbol not in self.open_positions:
             return {}
 
-        entry_price = Decimal(str(position['entry_price']))
-        pnl_percent = (current_price - entry_price) / entry_price * 100
-
-        # Move stop loss to breakeven if in profit
-        if pnl_percent >= 2:
-            return {
-                'stop_loss': entry_price,
-                'take_profit': position['take_profit']
-            }
-
+        stop_loss = self.stop_engine.stop_loss(symbol)
+        if stop_loss is not None:
+            stop_loss = Decimal(str(stop_loss))
+        else:
+            stop_loss = position['stop_loss']
+            if current_price is not None:
+                entry_price = Decimal(str(position['entry_price']))
+                move = Decimal(str(current_price)) - entry_price
+                pnl_percent = move / entry_price * 100
+                if position.get('side') == 'SHORT':
+                    pnl_percent = -pnl_percent
+                if pnl_percent >= Decimal(str(self.stop_engine.breakeven_percent)):
+                    stop_loss = entry_price
         return {
-            'stop_loss': position['stop_loss'],
+            'stop_loss': stop_loss,
             'take_profit': position['take_profit']
         }
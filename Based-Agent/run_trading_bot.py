@@ -1,5 +1,6 @@
 import os
 from mexc_trading import TradingBot
+from trade_journal import TradeJournal
 from discord_monitor import run_discord_bot
 
 def main():
@@ -17,9 +18,31 @@ def main():
     trading_bot = TradingBot(
         api_key=mexc_api_key,
         api_secret=mexc_api_secret,
-        testnet=False  # Set to True for testing
+        testnet=False,  # Set to True for testing
+        journal=TradeJournal(os.getenv('TRADE_JOURNAL_PATH', 'trade_journal.db'))
     )
     
+    # Cache leverage/margin settings so trades skip redundant config calls
+    try:
+        trading_bot.trader.warm_up_account_config()
+    except Exception as e:
+        print(f"Account config warm-up failed: {str(e)}")
+    
+    # Load tick/lot sizes so orders are quantised before they are sent
+    try:
+        trading_bot.trader.load_exchange_info()
+    except Exception as e:
+        print(f"Exchange info load failed: {str(e)}")
+    
+    # Drop journaled trades whose brackets closed while we were down
+    if trading_bot.active_trades:
+        try:
+            result = trading_bot.reconcile()
+            print(f"Recovered {len(trading_bot.active_trades)} open trade(s), "
+                  f"{len(result['closed'])} closed while offline")
+        except Exception as e:
+            print(f"Trade reconciliation failed: {str(e)}")
+    
     # Run Discord bot
     run_discord_bot(trading_bot, discord_token)
 
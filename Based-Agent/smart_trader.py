@@ -1,21 +1,72 @@
-from typing import Optional, Dict, Any
-from mexc_trading import MEXCTrader
+from typing import Optional, Dict, Any, List
+from async_mexc_trading import AsyncTradingBot
+from price_book import PriceBook, MarketDataStream
+from trade_journal import TradeJournal
 from solana_integration import SolanaTrader, DexSwapper
 import asyncio
+import contextlib
 
 class SmartTrader:
     def __init__(self,
                  mexc_api_key: Optional[str] = None,
                  mexc_api_secret: Optional[str] = None,
-                 solana_private_key: Optional[str] = None):
+                 solana_private_key: Optional[str] = None,
+                 journal: Optional[TradeJournal] = None):
         
-        # Initialize traders
-        self.mexc = MEXCTrader(mexc_api_key, mexc_api_secret) if mexc_api_key else None
+        # Latest prices, kept current by start_market_data()
+        self.price_book = PriceBook()
+        self.market_data: Optional[MarketDataStream] = None
+        self._market_data_task: Optional[asyncio.Task] = None
+
+        # Initialize traders. The MEXC bot journals its own bracket orders,
+        # so they can be reconciled against the exchange
+        self.mexc = AsyncTradingBot(mexc_api_key, mexc_api_secret,
+                                    concurrent_brackets=True,
+                                    price_book=self.price_book,
+                                    journal=journal) if mexc_api_key else None
         self.solana = SolanaTrader(solana_private_key) if solana_private_key else None
         self.dex = DexSwapper()
         
-        # Track active positions
+        # Track active positions, restoring them from the journal after a restart.
+        # DEX swaps are journaled as {'platform', 'details'}, MEXC trades as
+        # the bot's bracket details
+        self.journal = journal
         self.active_trades = {}
+        for key, trade in (journal.open_trades if journal else {}).items():
+            if 'platform' in trade:
+                self.active_trades[key] = trade
+                if self.mexc:
+                    self.mexc.active_trades.pop(key, None)
+            else:
+                self.active_trades[key] = {'platform': 'MEXC', 'details': trade}
+
+    async def start(self) -> Optional[Dict]:
+        """Drop journaled MEXC trades whose brackets closed while we were down.
+        Call once before trading"""
+        if not (self.mexc and self.journal):
+            return None
+        result = await self.mexc.reconcile()
+        for symbol in result['closed']:
+            self.active_trades.pop(symbol, None)
+        return result
+
+    def start_market_data(self, symbols: List[str]) -> None:
+        """Stream prices for symbols (e.g. 'BTCUSDT') into the price book"""
+        self.market_data = MarketDataStream(self.price_book, symbols)
+        self._market_data_task = asyncio.ensure_future(self.market_data.run())
+
+    async def close(self) -> None:
+        """Stop market data and release pooled exchange connections"""
+        if self._market_data_task:
+            self.market_data.stop()
+            self._market_data_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._market_data_task
+            self._market_data_task = None
+        if self.mexc:
+            await self.mexc.close()
+        if self.journal:
+            await asyncio.to_thread(self.journal.flush)
         
     async def execute_trade(self,
                          token: str,
@@ -31,7 +82,7 @@ class SmartTrader:
             if leverage and self.mexc:
                 try:
                     symbol = f"{token}USDT"
-                    trade = self.mexc.place_leveraged_trade(
+                    trade = await self.mexc.place_leveraged_trade(
                         symbol=symbol,
                         side=side,
                         quantity=quantity,
@@ -39,6 +90,7 @@ class SmartTrader:
                         stop_loss_percent=stop_loss_percent,
                         take_profit_percent=take_profit_percent
                     )
+                    # Journaled by the bot
                     self.active_trades[symbol] = {
                         'platform': 'MEXC',
                         'details': trade
@@ -67,6 +119,8 @@ class SmartTrader:
                         'platform': 'Solana DEX',
                         'details': swap
                     }
+                    if self.journal:
+                        self.journal.record_open(token, self.active_trades[token])
                     return {
                         'status': 'success',
                         'platform': 'Solana DEX',
@@ -93,7 +147,7 @@ class SmartTrader:
         trade = self.active_trades[token]
         try:
             if trade['platform'] == 'MEXC':
-                result = self.mexc.close_position(token)
+                result = await self.mexc.close_position(token)
             else:
                 # Close DEX position
                 route = await self.dex.get_best_route(
@@ -104,6 +158,9 @@ class SmartTrader:
                 result = await self.dex.execute_swap(route)
             
             del self.active_trades[token]
+            # The bot journals MEXC closes itself
+            if self.journal and trade['platform'] != 'MEXC':
+                self.journal.record_close(token)
             return {
                 'status': 'success',
                 'platform': trade['platform'],
@@ -122,7 +179,7 @@ class SmartTrader:
         
         if self.mexc:
             try:
-                mexc_balance = self.mexc.get_account_info()
+                mexc_balance = await self.mexc.trader.get_account_info()
                 balances['MEXC'] = mexc_balance
             except Exception as e:
                 balances['MEXC'] = f"Error: {str(e)}"
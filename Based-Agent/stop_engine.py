@@ -0,0 +1,269 @@
+import heapq
+import itertools
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from price_book import PriceBook, PriceTick
+
+# Trigger kinds
+STOP_LOSS = 'stop_loss'
+TAKE_PROFIT = 'take_profit'
+BREAKEVEN = 'breakeven'
+TRAILING = 'trailing'
+
+class StopEvent(NamedTuple):
+    """One adjustment produced by a price tick. For stop_loss and
+    take_profit the position has been closed and dropped from the engine;
+    for breakeven and trailing, stop_loss holds the new stop"""
+    key: str
+    symbol: str
+    kind: str
+    price: float
+    stop_loss: float
+
+class StopEngine:
+    """Price-indexed stop, breakeven and trailing triggers for many positions.
+
+    Each symbol keeps two heaps of trigger prices: one for thresholds crossed
+    by a rising price (min-heap) and one for a falling price (max-heap). A
+    long's stop loss sits in the falling heap and its take profit, breakeven
+    and trailing thresholds in the rising heap; shorts are mirrored. A tick
+    only pops the triggers it crossed, so its cost depends on how many
+    positions need adjusting rather than how many are open. When a stop
+    moves, fresh triggers are pushed and the old ones are skipped lazily via
+    a per-position version number.
+    """
+
+    def __init__(self,
+                 breakeven_percent: float = 2.0,
+                 trailing_percent: Optional[float] = None):
+        """
+        Args:
+            breakeven_percent: Profit (%) at which the stop moves to entry
+            trailing_percent: Default trailing distance (%), None to disable
+        """
+        self.breakeven_percent = breakeven_percent
+        self.trailing_percent = trailing_percent
+        self.positions: Dict[str, Dict[str, Any]] = {}
+        self._rising: Dict[str, List[Tuple]] = {}
+        self._falling: Dict[str, List[Tuple]] = {}
+        self._sequence = itertools.count()
+        self._stale = 0
+        self._listeners: List[Callable[[List[StopEvent]], None]] = []
+        self._lock = threading.Lock()
+
+    def track(self,
+              key: str,
+              symbol: str,
+              side: str,
+              entry_price: float,
+              stop_loss: float,
+              take_profit: Optional[float] = None,
+              breakeven_percent: Optional[float] = None,
+              trailing_percent: Optional[float] = None) -> None:
+        """Start (or restart) watching a position's stops"""
+        side = side.upper()
+        side = {'BUY': 'LONG', 'SELL': 'SHORT'}.get(side, side)
+        if breakeven_percent is None:
+            breakeven_percent = self.breakeven_percent
+        if trailing_percent is None:
+            trailing_percent = self.trailing_percent
+        entry_price = float(entry_price)
+        stop_loss = float(stop_loss)
+        long = side == 'LONG'
+
+        # Already at or past breakeven counts as done
+        breakeven_at = None
+        at_entry = stop_loss >= entry_price if long else stop_loss <= entry_price
+        if breakeven_percent is not None and not at_entry:
+            move = breakeven_percent / 100
+            breakeven_at = entry_price * (1 + move if long else 1 - move)
+
+        with self._lock:
+            if key in self.positions:
+                self._drop(key)
+            position = {
+                'symbol': symbol,
+                'long': long,
+                'entry_price': entry_price,
+                'stop_loss': stop_loss,
+                'take_profit': float(take_profit) if take_profit else None,
+                'breakeven_at': breakeven_at,
+                'trail': trailing_percent / 100 if trailing_percent else None,
+                'extreme': None,
+                # Drawn from the global sequence so a re-tracked key never
+                # matches its old heap entries
+                'version': next(self._sequence)
+            }
+            self.positions[key] = position
+            self._push_all(key, position)
+
+    def untrack(self, key: str) -> None:
+        with self._lock:
+            if key in self.positions:
+                self._drop(key)
+
+    def stop_loss(self, key: str) -> Optional[float]:
+        """A tracked position's current stop, None if it is not tracked"""
+        with self._lock:
+            position = self.positions.get(key)
+            return position['stop_loss'] if position is not None else None
+
+    def _drop(self, key: str) -> None:
+        self.positions.pop(key)
+        # Its heap entries are now stale; compact once they dominate
+        self._stale += 1
+
+    def _trailing_threshold(self, position: Dict[str, Any]) -> float:
+        """Price beyond which the trailing stop would improve on the current
+        stop. Never the last extreme itself, so a flat market is ignored"""
+        extreme = position['extreme']
+        if position['long']:
+            threshold = position['stop_loss'] / (1 - position['trail'])
+            if extreme is None:
+                return threshold
+            return max(threshold, math.nextafter(extreme, math.inf))
+        threshold = position['stop_loss'] / (1 + position['trail'])
+        if extreme is None:
+            return threshold
+        return min(threshold, math.nextafter(extreme, -math.inf))
+
+    def _push(self,
+              key: str,
+              position: Dict[str, Any],
+              kind: str,
+              threshold: float) -> None:
+        """Index a trigger. For longs, stops fire on a falling price and
+        everything else on a rising one; shorts the other way round"""
+        rising = position['long'] != (kind == STOP_LOSS)
+        entry = (next(self._sequence), key, position['version'], kind)
+        symbol = position['symbol']
+        if rising:
+            heapq.heappush(self._rising.setdefault(symbol, []), (threshold,) + entry)
+        else:
+            heapq.heappush(self._falling.setdefault(symbol, []), (-threshold,) + entry)
+
+    def _push_all(self, key: str, position: Dict[str, Any]) -> None:
+        self._push(key, position, STOP_LOSS, position['stop_loss'])
+        if position['take_profit']:
+            self._push(key, position, TAKE_PROFIT, position['take_profit'])
+        if position['breakeven_at'] is not None:
+            self._push(key, position, BREAKEVEN, position['breakeven_at'])
+        if position['trail']:
+            self._push(key, position, TRAILING, self._trailing_threshold(position))
+
+    def _pop_crossed(self, symbol: str, price: float) -> Dict[str, List[str]]:
+        """Pop every live trigger crossed by price, grouped by position"""
+        crossed: Dict[str, List[str]] = {}
+        heaps = ((self._rising.get(symbol), 1), (self._falling.get(symbol), -1))
+        for heap, sign in heaps:
+            if not heap:
+                continue
+            bound = sign * price
+            while heap and heap[0][0] <= bound:
+                _, _, key, version, kind = heapq.heappop(heap)
+                position = self.positions.get(key)
+                if position is None or position['version'] != version:
+                    self._stale = max(self._stale - 1, 0)
+                    continue
+                crossed.setdefault(key, []).append(kind)
+        return crossed
+
+    def on_tick(self, symbol: str, price: float) -> List[StopEvent]:
+        """Apply one price update and return the adjustments it caused"""
+        with self._lock:
+            events = self._process(symbol, float(price))
+        if events:
+            self._notify(events)
+        return events
+
+    def on_ticks(self, ticks: Iterable[Tuple[str, float]]) -> List[StopEvent]:
+        """Apply a batch of (symbol, price) updates in order; listeners get
+        all resulting events in one call"""
+        events: List[StopEvent] = []
+        with self._lock:
+            for symbol, price in ticks:
+                events.extend(self._process(symbol, float(price)))
+        if events:
+            self._notify(events)
+        return events
+
+    def _process(self, symbol: str, price: float) -> List[StopEvent]:
+        events = []
+        for key, kinds in self._pop_crossed(symbol, price).items():
+            position = self.positions[key]
+            long = position['long']
+
+            exit_kind = next((k for k in (STOP_LOSS, TAKE_PROFIT) if k in kinds), None)
+            if exit_kind:
+                events.append(StopEvent(key, symbol, exit_kind, price,
+                                        position['stop_loss']))
+                self._drop(key)
+                continue
+
+            better = max if long else min
+            stop = position['stop_loss']
+            kind = None
+            if BREAKEVEN in kinds:
+                position['breakeven_at'] = None
+                if better(stop, position['entry_price']) != stop:
+                    stop, kind = position['entry_price'], BREAKEVEN
+            if TRAILING in kinds:
+                trail = position['trail']
+                trailed = price * (1 - trail if long else 1 + trail)
+                if better(stop, trailed) != stop:
+                    stop, kind = trailed, TRAILING
+
+            if kind is None:
+                # Crossed but nothing to improve: re-arm what popped
+                if TRAILING in kinds:
+                    self._push(key, position, TRAILING,
+                               self._trailing_threshold(position))
+                continue
+
+            position['stop_loss'] = stop
+            if kind == TRAILING:
+                position['extreme'] = price
+            position['version'] = next(self._sequence)
+            self._stale += 1
+            self._push_all(key, position)
+            events.append(StopEvent(key, symbol, kind, price, stop))
+
+        if self._stale > 2 * len(self.positions) + 64:
+            self._compact()
+        return events
+
+    def _compact(self) -> None:
+        """Rebuild the heaps from live triggers only"""
+        self._rising.clear()
+        self._falling.clear()
+        for key, position in self.positions.items():
+            self._push_all(key, position)
+        self._stale = 0
+
+    def subscribe(self,
+                  callback: Callable[[List[StopEvent]], None]) -> Callable[[], None]:
+        """Call callback with each non-empty batch of events. Returns a
+        function that unsubscribes"""
+        self._listeners = self._listeners + [callback]
+
+        def unsubscribe():
+            self._listeners = [c for c in self._listeners if c is not callback]
+        return unsubscribe
+
+    def _notify(self, events: List[StopEvent]) -> None:
+        for callback in self._listeners:
+            try:
+                callback(events)
+            except Exception as e:
+                print(f"Stop engine listener error: {str(e)}")
+
+    def attach(self,
+               book: PriceBook,
+               symbol: Optional[str] = None) -> Callable[[], None]:
+        """Drive the engine from a PriceBook's mark prices"""
+        def on_price(tick: PriceTick):
+            if tick.mark is not None:
+                self.on_tick(tick.symbol, tick.mark)
+        return book.subscribe(on_price, symbol)
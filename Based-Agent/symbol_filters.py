@@ -0,0 +1,176 @@
+import math
+import threading
+from decimal import Decimal
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+
+class SymbolFilters(NamedTuple):
+    """Trading rules for one symbol, with rounding precision precomputed"""
+    symbol: str
+    tick_size: float
+    step_size: float
+    min_qty: float
+    min_notional: float
+    max_leverage: Optional[int]
+    price_decimals: int
+    qty_decimals: int
+
+def _decimals(step: str) -> int:
+    """Number of decimal places in a step such as '0.0010'"""
+    exponent = Decimal(step).normalize().as_tuple().exponent
+    return max(-exponent, 0)
+
+def parse_symbol_filters(entry: Dict[str, Any]) -> SymbolFilters:
+    """Build SymbolFilters from one exchangeInfo 'symbols' entry.
+
+    Understands Binance-style filter lists (PRICE_FILTER, LOT_SIZE,
+    MIN_NOTIONAL) and falls back to MEXC's precision fields.
+    """
+    filters = {f.get('filterType'): f for f in entry.get('filters') or []}
+
+    if 'PRICE_FILTER' in filters:
+        tick = str(filters['PRICE_FILTER']['tickSize'])
+    else:
+        tick = str(Decimal(1).scaleb(-int(entry.get('quotePrecision', 8))))
+
+    if 'LOT_SIZE' in filters:
+        step = str(filters['LOT_SIZE']['stepSize'])
+        min_qty = float(filters['LOT_SIZE'].get('minQty', 0))
+    else:
+        precision = int(entry.get('baseAssetPrecision', 8))
+        step = str(entry.get('baseSizePrecision') or Decimal(1).scaleb(-precision))
+        min_qty = float(step)
+
+    notional = filters.get('MIN_NOTIONAL') or filters.get('NOTIONAL') or {}
+    min_notional = notional.get('minNotional', entry.get('quoteAmountPrecision', 0))
+    min_notional = float(min_notional or 0)
+
+    max_leverage = entry.get('maxLeverage')
+    return SymbolFilters(
+        symbol=entry['symbol'],
+        tick_size=float(tick),
+        step_size=float(step),
+        min_qty=min_qty,
+        min_notional=min_notional,
+        max_leverage=int(max_leverage) if max_leverage else None,
+        price_decimals=_decimals(tick),
+        qty_decimals=_decimals(step)
+    )
+
+class ExchangeInfoCache:
+    """Symbol metadata from /api/v3/exchangeInfo, loaded once and refreshed
+    in the background, used to quantise orders locally before they are
+    signed so the exchange never rejects them for precision"""
+
+    def __init__(self,
+                 refresh_interval: float = 3600.0,
+                 price_source: Optional[Callable[[str], Optional[float]]] = None):
+        """
+        Args:
+            refresh_interval: Seconds between background reloads
+            price_source: Returns a current price for a symbol, or None if
+                it has none fresh (e.g. PriceBook.get_mark_price). Used for
+                the notional of orders without a price, such as MARKET
+        """
+        self.refresh_interval = refresh_interval
+        self.price_source = price_source
+        self._filters: Dict[str, SymbolFilters] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def load(self, info: Dict[str, Any]) -> int:
+        """Replace the cache from an exchangeInfo response. Returns symbols loaded"""
+        filters = {}
+        for entry in info.get('symbols') or []:
+            try:
+                filters[entry['symbol']] = parse_symbol_filters(entry)
+            except (KeyError, ValueError, ArithmeticError) as e:
+                print(f"Skipping exchange info for {entry.get('symbol')}: {str(e)}")
+        # Swap the whole table so readers never see a partial refresh
+        self._filters = filters
+        return len(filters)
+
+    def get(self, symbol: str) -> Optional[SymbolFilters]:
+        return self._filters.get(symbol)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._filters
+
+    def start_refresh(self, fetch: Callable[[], Dict[str, Any]]) -> None:
+        """Reload from fetch() every refresh_interval seconds in a daemon
+        thread. Does nothing if the refresher is already running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop.wait(self.refresh_interval):
+                try:
+                    self.load(fetch())
+                except Exception as e:
+                    print(f"Exchange info refresh failed: {str(e)}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop_refresh(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def round_price(self, symbol: str, price: float) -> float:
+        """Round a price to the nearest tick"""
+        f = self._filters.get(symbol)
+        if f is None:
+            return price
+        return round(round(price / f.tick_size) * f.tick_size, f.price_decimals)
+
+    def round_quantity(self, symbol: str, quantity: float) -> float:
+        """Round a quantity down to the lot step"""
+        f = self._filters.get(symbol)
+        if f is None:
+            return quantity
+        # The epsilon keeps exact multiples like 0.3 / 0.1 from flooring to 2
+        steps = math.floor(quantity / f.step_size + 1e-9)
+        return round(steps * f.step_size, f.qty_decimals)
+
+    def normalize_order(self, params: Dict[str, Any],
+                        reference_price: Optional[float] = None) -> Dict[str, Any]:
+        """Quantise quantity, price and stopPrice of an order in place.
+
+        Raises ValueError when the rounded order falls below the symbol's
+        minimum quantity or notional, rather than paying a round trip for
+        the rejection. Orders without a price or stop price (MARKET) are
+        valued at reference_price, else at price_source's price; with
+        neither, their notional is left to the exchange to check. Symbols
+        without metadata pass through untouched.
+        """
+        symbol = params['symbol']
+        f = self._filters.get(symbol)
+        if f is None:
+            return params
+
+        quantity = self.round_quantity(symbol, float(params['quantity']))
+        if quantity < f.min_qty or quantity <= 0:
+            raise ValueError(f'Quantity {params["quantity"]} is below the minimum '
+                             f'{f.min_qty} for {symbol}')
+        params['quantity'] = quantity
+
+        for key in ('price', 'stopPrice'):
+            if params.get(key):
+                params[key] = self.round_price(symbol, float(params[key]))
+
+        reference = params.get('price') or params.get('stopPrice') or reference_price
+        if not reference and self.price_source is not None:
+            reference = self.price_source(symbol)
+        notional = quantity * reference if reference else None
+        if notional is not None and f.min_notional and notional < f.min_notional:
+            raise ValueError(f'Order notional {notional} is below the minimum '
+                             f'{f.min_notional} for {symbol}')
+        return params
+
+    def check_leverage(self, symbol: str, leverage: int) -> None:
+        """Raise ValueError if leverage exceeds the symbol's maximum"""
+        f = self._filters.get(symbol)
+        if f is not None and f.max_leverage and leverage > f.max_leverage:
+            raise ValueError(f'Leverage {leverage}x exceeds maximum '
+                             f'{f.max_leverage}x for {symbol}')
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+import requests
+
+from account_config import AccountConfigCache
+from async_mexc_trading import AsyncMEXCTrader
+from mexc_simulator import MEXCSimulator
+from mexc_trading import MEXCTrader
+
+
+def test_position_side_follows_mode():
+    cache = AccountConfigCache()
+    assert cache.position_side('BTCUSDT', 'BUY') is None
+    assert cache.position_side('BTCUSDT', 'SELL', 'LONG') == 'LONG'
+
+    cache.set_position_mode('BTCUSDT', 'hedge')
+    assert cache.position_side('BTCUSDT', 'BUY') == 'LONG'
+    assert cache.position_side('BTCUSDT', 'SELL') == 'SHORT'
+    assert cache.position_side('BTCUSDT', 'SELL', 'LONG') == 'LONG'
+    # Closing orders reduce the side opposite their own
+    assert cache.position_side('BTCUSDT', 'SELL', reduce_only=True) == 'LONG'
+    assert cache.position_side('BTCUSDT', 'BUY', reduce_only=True) == 'SHORT'
+
+    cache.set_position_mode('BTCUSDT', 'ONE_WAY')
+    assert cache.position_side('BTCUSDT', 'BUY', 'LONG') == 'BOTH'
+
+    cache.invalidate('BTCUSDT')
+    assert cache.needs_position_mode('BTCUSDT', 'ONE_WAY')
+
+
+def test_load_positions_sets_mode():
+    cache = AccountConfigCache()
+    cache.load_positions({'data': [
+        {'symbol': 'BTCUSDT', 'positionSide': 'LONG', 'leverage': '20'},
+        {'symbol': 'ETHUSDT', 'positionSide': 'BOTH', 'marginType': 'isolated'},
+    ]})
+    assert not cache.needs_position_mode('BTCUSDT', 'HEDGE')
+    assert cache.get_position_mode('ETHUSDT') == 'ONE_WAY'
+    assert cache.position_side('ETHUSDT', 'BUY', 'LONG') == 'BOTH'
+
+
+def test_trader_skips_known_mode_and_sets_position_side():
+    with MEXCSimulator() as sim:
+        trader = MEXCTrader('key', 'secret', base_url=sim.url)
+        try:
+            trader.set_position_mode('BTCUSDT', 'ONE_WAY')
+            sent = sim.stats()['requests']
+            assert trader.set_position_mode('BTCUSDT', 'ONE_WAY')['cached']
+            assert sim.stats()['requests'] == sent
+
+            # The caller's LONG would be rejected by a one-way symbol
+            order = trader.place_order('BTCUSDT', 'BUY', 'MARKET', 0.01,
+                                       position_side='LONG')
+            assert order['positionSide'] == 'BOTH'
+
+            trader.set_position_mode('ETHUSDT', 'HEDGE')
+            order = trader.place_order('ETHUSDT', 'SELL', 'MARKET', 0.1)
+            assert order['positionSide'] == 'SHORT'
+            close = trader.place_order('ETHUSDT', 'BUY', 'MARKET', 0.1,
+                                       reduce_only=True)
+            assert close['positionSide'] == 'SHORT'
+            assert sim.engine.positions[('ETHUSDT', 'SHORT')]['amount'] == 0
+
+            # A mode changed behind the cache's back is forgotten on rejection
+            sim.engine.position_mode['ETHUSDT'] = 'ONE_WAY'
+            with pytest.raises(requests.HTTPError):
+                trader.place_order('ETHUSDT', 'SELL', 'MARKET', 0.1)
+            assert trader.account_config.get_position_mode('ETHUSDT') is None
+        finally:
+            trader.close()
+
+
+def test_async_trader_skips_known_mode_and_sets_position_side():
+    async def scenario(sim):
+        async with AsyncMEXCTrader('key', 'secret', base_url=sim.url) as trader:
+            await trader.set_position_mode('BTCUSDT', 'HEDGE')
+            sent = sim.stats()['requests']
+            assert (await trader.set_position_mode('BTCUSDT', 'HEDGE'))['cached']
+            assert sim.stats()['requests'] == sent
+
+            order = await trader.place_order('BTCUSDT', 'BUY', 'MARKET', 0.01)
+            assert order['positionSide'] == 'LONG'
+
+            # A stop that closes the long goes to the LONG side, not SHORT
+            stop = await trader.place_order('BTCUSDT', 'SELL', 'STOP_MARKET', 0.01,
+                                            stop_price=45000.0)
+            assert stop['positionSide'] == 'LONG'
+
+    with MEXCSimulator() as sim:
+        asyncio.run(scenario(sim))
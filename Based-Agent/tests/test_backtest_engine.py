@@ -0,0 +1,50 @@
+import pytest
+
+from backtest_engine import merge_equity_curves
+from backtester import Backtester
+from golden_data import golden_ohlcv
+
+
+@pytest.mark.parametrize('seed', [42, 7, 1234])
+@pytest.mark.parametrize('risk', [0.02, 0.1])
+def test_vectorized_core_matches_bar_loop(seed, risk):
+    tester = Backtester('', '')
+    df = tester.analyze_signals(golden_ohlcv(50_000, seed=seed))
+
+    loop = tester.simulate_trades(df, 1000.0, risk, vectorized=False)
+    vectorized = tester.simulate_trades(df, 1000.0, risk, vectorized=True)
+    assert loop['trades']
+    assert vectorized == loop
+
+
+def test_vectorized_core_without_trades():
+    tester = Backtester('', '')
+    df = tester.analyze_signals(golden_ohlcv(5))
+
+    vectorized = tester.simulate_trades(df, 1000.0, 0.02, vectorized=True)
+    assert vectorized['trades'] == []
+    assert vectorized == tester.simulate_trades(df, 1000.0, 0.02, vectorized=False)
+
+
+def test_merge_equity_curves_across_pairs():
+    def curve(*points):
+        return iter([{'timestamp': t, 'equity': e} for t, e in points])
+
+    def merged(interval_ms=None):
+        curves = [curve((10, 110.0), (30, 90.0)),
+                  curve((20, 150.0), (30, 260.0), (65, 250.0)),
+                  curve()]
+        points = merge_equity_curves(curves, [100.0, 200.0, 50.0], interval_ms)
+        return [(p['timestamp'], p['equity'], p['drawdown']) for p in points]
+
+    # B and the pair without points hold their initial equity until they
+    # move, and the shared timestamp 30 is one point
+    assert merged() == [(10, 360.0, 0.0),
+                        (20, 310.0, pytest.approx(50 / 360 * 100)),
+                        (30, 400.0, 0.0),
+                        (65, 390.0, pytest.approx(2.5))]
+    # Buckets close on their last state, so the intra-bucket peak of 360
+    # never counts towards the drawdown
+    assert merged(25) == [(0, 310.0, 0.0), (25, 400.0, 0.0),
+                          (50, 390.0, pytest.approx(2.5))]
+    assert list(merge_equity_curves([], [])) == []
@@ -0,0 +1,121 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from backtest_service import CANCELLED, DONE, BacktestService
+
+
+class StubTester:
+    """Backtester stand-in whose pairs finish only once gate is set"""
+
+    def __init__(self, gate: threading.Event):
+        self.gate = gate
+
+    def iter_backtest(self, config, _workers=None):
+        for pair in config['pairs']:
+            assert self.gate.wait(5)
+            yield pair, {'trades': [], 'total_return': 1.0, 'final_capital': 101.0}
+
+    def summarize(self, _config, results):
+        return {'total_trades': 0, 'win_rate': 0.0, 'average_pnl': 0.0,
+                'total_pnl': sum(r['total_return'] for r in results.values()),
+                'trades': [], 'equity_curve': [], 'max_drawdown': 0.0}
+
+
+@pytest.fixture
+def gate():
+    return threading.Event()
+
+
+@pytest.fixture
+def service(gate):
+    created = []
+
+    def factory():
+        created.append(StubTester(gate))
+        return created[-1]
+
+    service = BacktestService(factory, max_workers=1, max_pending=2)
+    service.created = created
+    yield service
+    gate.set()
+    service.close()
+
+
+def config(*pairs, **extra):
+    return dict({'startDate': '2024-01-01', 'endDate': '2024-01-02',
+                 'initialBalance': 1000, 'pairs': list(pairs)}, **extra)
+
+
+def test_submit_joins_running_job_and_caches_result(service, gate):
+    # Nothing is built until a job runs
+    assert service.created == []
+
+    job_id = service.submit(config('BTC/USDT', 'ETH/USDT'))
+    # Fields outside the result, like UI state, do not make a new job
+    assert service.submit(config('BTC/USDT', 'ETH/USDT', running=True)) == job_id
+
+    gate.set()
+    result = service.result(job_id, timeout=5)
+    assert result['results']['totalPnL'] == 2.0
+    assert [e['type'] for e in service.events(job_id)] == [
+        'queued', 'started', 'partial', 'partial', DONE]
+    assert len(service.created) == 1
+
+    cached_id = service.submit(config('BTC/USDT', 'ETH/USDT'))
+    assert cached_id != job_id
+    assert service.status(cached_id)['cached']
+    assert service.result(cached_id, timeout=0) == result
+    assert len(service.created) == 1
+
+    # A different strategy setting is a different result
+    other = BacktestService(lambda: StubTester(gate), settings={'leverage': 3})
+    try:
+        assert other.config_key(config('BTC/USDT')) != service.config_key(
+            config('BTC/USDT'))
+    finally:
+        other.close()
+
+
+def test_cancel_running_and_queued_jobs(service, gate):
+    running = service.submit(config('BTC/USDT', 'ETH/USDT'))
+    queued = service.submit(config('SOL/USDT'))
+    with pytest.raises(RuntimeError):
+        service.submit(config('XRP/USDT'))
+
+    # Wait for the first job to start so it is cancelled mid-run
+    assert service.events(running, 1, timeout=5)[0]['type'] == 'started'
+    assert service.cancel(queued)
+    assert service.cancel(running)
+    gate.set()
+    assert service.result(running, timeout=5) is None
+    assert service.status(running)['state'] == CANCELLED
+    assert service.status(queued)['state'] == CANCELLED
+    assert not service.cancel(running)
+    # The queued job never started
+    assert len(service.created) == 1
+
+    # Cancelled results are not cached, so resubmitting runs again
+    job_id = service.submit(config('SOL/USDT'))
+    assert service.result(job_id, timeout=5)['status'] == 'success'
+    assert not service.status(job_id)['cached']
+
+
+@pytest.mark.parametrize('interval, after, cacheable', [
+    ('1m', 60, True), ('1m', 59, False),
+    ('1h', 3600, True), ('1h', 3599, False),
+    ('4h', 3600, False),
+])
+def test_cacheable_once_the_last_bar_closes(monkeypatch, gate, interval, after,
+                                            cacheable):
+    service = BacktestService(lambda: StubTester(gate), settings={'interval': interval})
+    try:
+        # The bar opening at endDate is part of the range
+        end = datetime.strptime('2024-01-02', '%Y-%m-%d').timestamp()
+        monkeypatch.setattr(time, 'time', lambda: end + after)
+        assert service.cacheable(config('BTC/USDT')) == cacheable
+    finally:
+        monkeypatch.undo()
+        service.close()
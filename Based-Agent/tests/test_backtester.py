@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+
+import pandas as pd
+import pytest
+
+import backtester
+from golden_data import PagedGoldenBacktester
+from ohlcv_cache import OHLCVCache
+
+BARS = 60_000
+
+
+@pytest.fixture(scope='module')
+def tester():
+    return PagedGoldenBacktester(BARS)
+
+
+def config(tester, days: int, **extra):
+    start = datetime.fromtimestamp(tester.frame['timestamp'].iloc[0] / 1000)
+    return dict({'startDate': start.strftime('%Y-%m-%d'),
+                 'endDate': (start + timedelta(days=days)).strftime('%Y-%m-%d'),
+                 'initialBalance': 1000,
+                 'pairs': ['BTC/USDT']}, **extra)
+
+
+@pytest.mark.parametrize('chunk_bars', [997, 10_000, 2 * BARS])
+@pytest.mark.parametrize('interval', [None, '1h'])
+def test_streamed_backtest_matches_whole(tester, chunk_bars, interval):
+    extra = {'equityInterval': interval} if interval else {}
+    whole = tester.run_backtest(config(tester, 40, **extra))
+    streamed = tester.run_backtest(config(tester, 40, chunkBars=chunk_bars, **extra))
+    assert whole['trades']
+    assert streamed == whole
+
+
+def test_pages_cover_range_in_order(tester):
+    start = int(tester.frame['timestamp'].iloc[100])
+    end = int(tester.frame['timestamp'].iloc[25_000])
+    for prefetch in (True, False):
+        pages = list(tester.iter_klines('BTC/USDT', start, end,
+                                        chunk_bars=4096, prefetch=prefetch))
+        assert all(len(page) <= 4096 for page in pages)
+        whole = tester.get_historical_data('BTC/USDT', start, end)
+        assert pd.concat(pages).reset_index(drop=True).equals(whole)
+
+
+def test_streamed_from_cache_matches_whole(tmp_path):
+    cached = PagedGoldenBacktester(BARS, cache=OHLCVCache(str(tmp_path)))
+    whole = cached.run_backtest(config(cached, 30))
+    # The range is cached now, so pages are slices of the memory maps
+    streamed = cached.run_backtest(config(cached, 30, chunkBars=5000))
+    assert streamed == whole
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_workers_match_in_process(tmp_path, cached):
+    cache = OHLCVCache(str(tmp_path)) if cached else None
+    tester = PagedGoldenBacktester(BARS, cache=cache)
+    cfg = config(tester, 20, pairs=['BTC/USDT', 'ETH/USDT', 'SOL/USDT'])
+    expected = tester.run_backtest(cfg)
+    assert expected['trades']
+    assert tester.run_backtest(cfg, workers=2) == expected
+
+
+def test_closing_early_unlinks_shared_memory(tester, monkeypatch):
+    names = []
+
+    def share(df):
+        shm = share_ohlcv(df)
+        names.append(shm.name)
+        return shm
+    share_ohlcv = backtester._share_ohlcv
+    monkeypatch.setattr(backtester, '_share_ohlcv', share)
+
+    cfg = config(tester, 20, pairs=['BTC/USDT', 'ETH/USDT', 'SOL/USDT'])
+    results = tester.iter_backtest(cfg, workers=2)
+    next(results)
+    # What BacktestService does when a running job is cancelled
+    results.close()
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
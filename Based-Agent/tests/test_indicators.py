@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import indicators
+from backtest_engine import CrossoverSignal, crossover_signals
+from golden_data import golden_ohlcv
+
+BARS = 20_000
+
+
+@pytest.fixture(scope='module')
+def columns():
+    df = golden_ohlcv(BARS)
+    return {name: df[name].to_numpy() for name in ('high', 'low', 'close', 'volume')}
+
+
+def bitwise_equal(batch, streamed) -> bool:
+    a = np.asarray(batch, dtype=float)
+    b = np.asarray(streamed, dtype=float)
+    same = (a.view(np.int64) == b.view(np.int64)) | (np.isnan(a) & np.isnan(b))
+    return a.shape == b.shape and bool(same.all())
+
+
+CASES = {
+    'ema': (lambda: indicators.EMA(span=21),
+            lambda c: indicators.ema(c['close'], span=21),
+            ('close',)),
+    'ema_alpha_half': (lambda: indicators.EMA(alpha=0.5),
+                       lambda c: indicators.ema(c['close'], alpha=0.5),
+                       ('close',)),
+    'sma': (lambda: indicators.SMA(20),
+            lambda c: indicators.sma(c['close'], 20),
+            ('close',)),
+    'rsi': (lambda: indicators.RSI(14),
+            lambda c: indicators.rsi(c['close'], 14),
+            ('close',)),
+    'atr': (lambda: indicators.ATR(14),
+            lambda c: indicators.atr(c['high'], c['low'], c['close'], 14),
+            ('high', 'low', 'close')),
+    'bollinger': (lambda: indicators.Bollinger(20),
+                  lambda c: indicators.bollinger(c['close'], 20),
+                  ('close',)),
+    'vwap': (lambda: indicators.VWAP(),
+             lambda c: indicators.vwap(c['high'], c['low'], c['close'], c['volume']),
+             ('high', 'low', 'close', 'volume')),
+    'macd': (lambda: indicators.MACD(),
+             lambda c: indicators.macd(c['close']),
+             ('close',)),
+}
+
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_streaming_matches_batch_bit_for_bit(columns, name):
+    make, batch, inputs = CASES[name]
+    indicator = make()
+    rows = zip(*(columns[column].tolist() for column in inputs), strict=True)
+    streamed = [indicator.update(*row) for row in rows]
+
+    expected = batch(columns)
+    if isinstance(expected, tuple):
+        for i, column in enumerate(expected):
+            assert bitwise_equal(column, [value[i] for value in streamed])
+    else:
+        assert bitwise_equal(expected, streamed)
+
+
+@pytest.mark.parametrize('make, batch', [
+    (lambda: indicators.EMA(span=21), lambda close: indicators.ema(close, span=21)),
+    (lambda: indicators.RSI(14), lambda close: indicators.rsi(close, 14)),
+])
+def test_update_many_matches_batch(columns, make, batch):
+    close = columns['close']
+    indicator = make()
+    chunks = [indicator.update_many(chunk) for chunk in np.array_split(close, 7)]
+    assert bitwise_equal(batch(close), np.concatenate(chunks))
+
+
+def test_nan_gaps_match(columns):
+    close = columns['close'][:500].copy()
+    close[[3, 4, 100, 250]] = np.nan
+    ema = indicators.EMA(span=9)
+    streamed = [ema.update(x) for x in close.tolist()]
+    assert bitwise_equal(indicators.ema(close, span=9), streamed)
+    rsi = indicators.RSI(14)
+    streamed = [rsi.update(x) for x in close.tolist()]
+    assert bitwise_equal(indicators.rsi(close, 14), streamed)
+
+
+def test_crossover_signal_matches_batch(columns):
+    close = columns['close']
+    expected = crossover_signals(close)['signal']
+    assert expected.any()
+
+    signal = CrossoverSignal()
+    assert np.array_equal(expected, [signal.update(price) for price in close.tolist()])
+
+    chunked = CrossoverSignal()
+    chunks = [chunked.update_many(chunk) for chunk in np.array_split(close, 5)]
+    assert np.array_equal(expected, np.concatenate(chunks))
@@ -0,0 +1,147 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+from async_mexc_trading import AsyncTradingBot
+from mexc_simulator import MEXCSimulator, SimulatorConfig
+from mexc_trading import BracketOrderError, MEXCTrader, TradingBot
+from price_book import PriceBook
+from risk_manager import RiskManager
+
+
+def reject_order_type(sim: MEXCSimulator, order_type: str) -> None:
+    """Make the simulator reject every new order of order_type"""
+    place = sim.routes[('POST', '/api/v3/order')]
+
+    def route(params):
+        if params['type'] == order_type:
+            raise ValueError(f'Injected {order_type} rejection')
+        return place(params)
+    sim.routes[('POST', '/api/v3/order')] = route
+
+
+def assert_unwound(sim: MEXCSimulator, error: BracketOrderError) -> None:
+    assert list(error.failed) == ['stop_loss_order']
+    assert error.rollback['take_profit_order']['status'] == 'CANCELED'
+    assert error.rollback['close_order']['status'] == 'FILLED'
+    # Entry, take profit and the closing order reached the exchange
+    orders = sorted(sim.engine.orders.values(), key=lambda o: o['orderId'])
+    assert [o['type'] for o in orders] == ['MARKET', 'TAKE_PROFIT_MARKET', 'MARKET']
+    assert sim.engine.open_orders() == []
+    assert all(p['amount'] == 0 for p in sim.engine.positions.values())
+
+
+def test_bracket_unwinds_when_stop_leg_fails():
+    with MEXCSimulator() as sim:
+        reject_order_type(sim, 'STOP_MARKET')
+        with TradingBot('key', 'secret', base_url=sim.url,
+                        concurrent_brackets=True) as bot:
+            with pytest.raises(BracketOrderError) as raised:
+                bot.place_leveraged_trade('BTCUSDT', 'LONG', 0.01)
+            assert bot.active_trades == {}
+        assert_unwound(sim, raised.value)
+
+
+def test_async_bracket_unwinds_when_stop_leg_fails():
+    async def scenario(sim):
+        async with AsyncTradingBot('key', 'secret', base_url=sim.url,
+                                   concurrent_brackets=True) as bot:
+            with pytest.raises(BracketOrderError) as raised:
+                await bot.place_leveraged_trade('BTCUSDT', 'LONG', 0.01)
+            assert bot.active_trades == {}
+        return raised.value
+
+    with MEXCSimulator() as sim:
+        reject_order_type(sim, 'STOP_MARKET')
+        error = asyncio.run(scenario(sim))
+        assert_unwound(sim, error)
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_bot_follows_stop_engine_on_the_exchange():
+    book = PriceBook()
+    manager = RiskManager({'maxLeverage': 20}, price_book=book)
+    with (MEXCSimulator() as sim,
+          TradingBot('key', 'secret', base_url=sim.url, price_book=book) as bot):
+        book.update('BTCUSDT', mark=50000.0)
+        trade = bot.place_leveraged_trade('BTCUSDT', 'LONG', 0.01)
+        manager.open_position('BTCUSDT', 'LONG', 0.01, trade['entry_price'],
+                              leverage=10, stop_loss=trade['stop_loss'],
+                              take_profit=trade['take_profit'])
+        bot.follow_stops(manager)
+        first_stop = trade['stop_loss_order']['orderId']
+
+        # Breakeven replaces the exchange stop
+        sim.set_mark_price('BTCUSDT', 51000.0)
+        book.update('BTCUSDT', mark=51000.0)
+        wait_until(lambda: bot.active_trades['BTCUSDT']['stop_loss'] == 50000.0)
+        assert sim.engine.orders[first_stop]['status'] == 'CANCELED'
+        stop = sim.engine.orders[trade['stop_loss_order']['orderId']]
+        assert (stop['stopPrice'], stop['status']) == (50000.0, 'NEW')
+
+        # Gapping through the stop: the exchange fills it, and only then
+        # does the position leave the risk book
+        sim.set_mark_price('BTCUSDT', 49000.0)
+        assert stop['status'] == 'FILLED'
+        assert 'BTCUSDT' in manager.open_positions
+        book.update('BTCUSDT', mark=49000.0)
+        wait_until(lambda: 'BTCUSDT' not in manager.open_positions)
+        assert bot.active_trades == {}
+        assert sim.engine.open_orders() == []
+        assert manager.daily_pnl == pytest.approx(-20.0)
+
+
+def test_timed_out_order_is_looked_up_not_resent():
+    with MEXCSimulator() as sim:
+        place = sim.routes[('POST', '/api/v3/order')]
+        find = sim.routes[('GET', '/api/v3/order')]
+        sent, looked_up = [], []
+
+        def slow_place(params):
+            sent.append(params['newClientOrderId'])
+            ack = place(params)
+            if len(sent) == 1:
+                # Filled on the exchange, but the answer comes too late
+                time.sleep(1.0)
+            return ack
+
+        def record_lookup(params):
+            looked_up.append(params.get('origClientOrderId'))
+            return find(params)
+        sim.routes[('POST', '/api/v3/order')] = slow_place
+        sim.routes[('GET', '/api/v3/order')] = record_lookup
+
+        with MEXCTrader('key', 'secret', base_url=sim.url, timeout=0.2,
+                        retry_backoff=0.01) as trader:
+            order = trader.place_order('BTCUSDT', 'BUY', 'MARKET', 0.01)
+            client_order_id = order['clientOrderId']
+            assert sent == [client_order_id]
+            assert looked_up == [client_order_id]
+            assert order['status'] == 'FILLED'
+
+            # Replaying the id returns the acknowledgement without a request
+            requests = sim.stats()['requests']
+            again = trader.place_order('BTCUSDT', 'BUY', 'MARKET', 0.01,
+                                       client_order_id=client_order_id)
+            assert again == order
+            assert sim.stats()['requests'] == requests
+
+        assert len(sim.engine.orders) == 1
+        assert sim.engine.positions[('BTCUSDT', 'BOTH')]['amount'] == 0.01
+
+
+def test_simulator_seed_leaves_global_rng_alone():
+    state = random.getstate()
+    first = MEXCSimulator(SimulatorConfig(seed=7))
+    second = MEXCSimulator(SimulatorConfig(seed=7))
+    assert random.getstate() == state
+    draws = [first.random.random() for _ in range(3)]
+    assert draws == [second.random.random() for _ in range(3)]
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import monte_carlo as mc
+from monte_carlo import BOOTSTRAP, SHUFFLE, monte_carlo, simulate, trade_increments
+
+
+def trades(*pnls, capital=1000.0):
+    """Trades of the given PnL, each sized from capital"""
+    return [{'date': i, 'pnl': pnl, 'profit': pnl / capital * 100}
+            for i, pnl in enumerate(pnls)]
+
+
+def random_trades(count, seed=1):
+    rng = np.random.default_rng(seed)
+    return trades(*rng.normal(5, 40, count))
+
+
+def test_shuffled_compounding_paths_end_at_original_equity():
+    increments = trade_increments(random_trades(200), compound=True)
+    paths = simulate(increments, 500, SHUFFLE, compound=True, seed=0)
+    original = 1000.0 * np.exp(increments.sum())
+    assert paths['final_equity'] == pytest.approx(np.full(500, original))
+    # Only the path differs
+    assert paths['max_drawdown'].std() > 0
+
+
+def test_seeded_runs_are_reproducible():
+    run = random_trades(100)
+    first = monte_carlo(run, simulations=2000, seed=3)
+    assert monte_carlo(run, simulations=2000, seed=3) == first
+    assert monte_carlo(run, simulations=2000, seed=4) != first
+
+
+def test_ruin_and_drawdown_of_hand_built_trades():
+    # +100, -600, +600 from 1000: down to 500 from a peak of 1100
+    summary = monte_carlo(trades(100, -600, 600), simulations=20_000,
+                          methods=[SHUFFLE], ruin_fraction=0.5, compound=False)
+    assert summary['original'] == {'final_equity': 1100.0,
+                                   'max_drawdown': pytest.approx(600 / 1100 * 100)}
+
+    shuffled = summary[SHUFFLE]
+    # Three of the six orders dip to 500 or below; every one ends at 1100
+    assert shuffled['risk_of_ruin'] == pytest.approx(50, abs=2)
+    assert shuffled['probability_of_loss'] == 0
+    assert shuffled['final_equity']['mean'] == pytest.approx(1100.0)
+    # Best order: 600 off a 1700 peak; worst: 600 lost from the start
+    assert shuffled['max_drawdown']['p5'] == pytest.approx(600 / 1700 * 100)
+    assert shuffled['max_drawdown']['p95'] == pytest.approx(60.0)
+
+
+def test_empty_trades():
+    summary = monte_carlo([], initial_capital=500.0, simulations=100)
+    assert summary['trades'] == 0
+    assert summary['original'] == {'final_equity': 500.0, 'max_drawdown': 0.0}
+    for method in (BOOTSTRAP, SHUFFLE):
+        assert summary[method]['final_equity']['p50'] == 500.0
+        assert summary[method]['max_drawdown']['p95'] == 0.0
+        assert summary[method]['risk_of_ruin'] == 0.0
+        assert summary[method]['probability_of_loss'] == 0.0
+
+
+@pytest.mark.parametrize('method', [BOOTSTRAP, SHUFFLE])
+def test_batches_match_one_batch(monkeypatch, method):
+    increments = trade_increments(random_trades(50), compound=True)
+    whole = simulate(increments, 100, method, seed=9)
+    # Seven simulations per batch
+    monkeypatch.setattr(mc, 'BATCH_ELEMENTS', 7 * len(increments))
+    batched = simulate(increments, 100, method, seed=9)
+    for name, values in whole.items():
+        np.testing.assert_array_equal(batched[name], values)
@@ -0,0 +1,179 @@
+import os
+import threading
+from itertools import pairwise
+
+import numpy as np
+import pandas as pd
+
+from golden_data import golden_ohlcv
+from ohlcv_cache import KLINE_COLUMNS, MAX_SEGMENTS, OHLCVCache, read_slice
+
+MINUTE = 60_000
+
+
+class Source:
+    """Golden klines served like an exchange, recording every fetch"""
+
+    def __init__(self, bars: int):
+        self.frame = golden_ohlcv(bars, start=0)
+        self.fetched = []
+
+    def __call__(self, start: int, end: int) -> pd.DataFrame:
+        timestamps = self.frame['timestamp'].to_numpy()
+        rows = self.frame.iloc[np.searchsorted(timestamps, start):
+                               np.searchsorted(timestamps, end, side='right')]
+        self.fetched.append((start, end, len(rows)))
+        return rows
+
+
+def test_fill_extend_and_warm_load_match_source(tmp_path):
+    source = Source(20_000)
+    cache = OHLCVCache(str(tmp_path))
+    last = int(source.frame['timestamp'].iloc[-1])
+    half = last // 2
+
+    cache.get('BTCUSDT', '1m', 0, half, source)
+    df = cache.get('BTCUSDT', '1m', 0, last, source)
+    # Only the gap is downloaded the second time
+    assert source.fetched == [(0, half, 10_000), (half + 1, last, 10_000)]
+    assert list(df.columns) == KLINE_COLUMNS
+    assert (df.to_numpy() == source.frame.to_numpy()).all()
+
+    warm = cache.get('BTCUSDT', '1m', 0, last, source)
+    assert len(source.fetched) == 2
+    assert (warm.to_numpy() == source.frame.to_numpy()).all()
+
+    middle = cache.load('BTCUSDT', '1m', 100 * MINUTE, 199 * MINUTE)
+    assert (middle.to_numpy() == source.frame.iloc[100:200].to_numpy()).all()
+    assert cache.missing('BTCUSDT', '1m', 0, last) == []
+
+
+def test_empty_ranges_are_covered(tmp_path):
+    source = Source(100)
+    cache = OHLCVCache(str(tmp_path))
+    beyond = 1000 * MINUTE
+
+    assert len(cache.get('BTCUSDT', '1m', beyond, 2 * beyond, source)) == 0
+    cache.get('BTCUSDT', '1m', beyond, 2 * beyond, source)
+    assert len(source.fetched) == 1
+
+
+def test_open_bars_are_refetched(tmp_path):
+    source = Source(100)
+    last = int(source.frame['timestamp'].iloc[-1])
+    # The last bar is still open
+    cache = OHLCVCache(str(tmp_path), clock=lambda: (last + MINUTE // 2) / 1000)
+
+    cache.get('BTCUSDT', '1m', 0, last, source)
+    # Covered up to one bar before now
+    gap = (last - MINUTE // 2 + 1, last)
+    assert cache.missing('BTCUSDT', '1m', 0, last) == [gap]
+    cache.get('BTCUSDT', '1m', 0, last, source)
+    assert source.fetched[-1] == gap + (1,)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    source = Source(1000)
+    ticks = iter(range(1_000_000_000, 2_000_000_000))
+    cache = OHLCVCache(str(tmp_path), clock=lambda: float(next(ticks)))
+    last = int(source.frame['timestamp'].iloc[-1])
+    cache.get('AAAUSDT', '1m', 0, last, source)
+    entry = cache.size()
+
+    # Room for two entries; the slack covers meta.json growing by a few bytes
+    cache.max_bytes = 2 * entry + 512
+    cache.get('BBBUSDT', '1m', 0, last, source)
+    cache.get('AAAUSDT', '1m', 0, last, source)
+    cache.get('CCCUSDT', '1m', 0, last, source)
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names == ['AAAUSDT_1m', 'CCCUSDT_1m']
+
+
+def test_gap_fills_write_only_new_bars(tmp_path):
+    source = Source(3000)
+    cache = OHLCVCache(str(tmp_path))
+    path = cache.path('BTCUSDT', '1m')
+
+    cache.get('BTCUSDT', '1m', 0, 999 * MINUTE, source)
+    before = cache._read_meta(path)
+    cache.get('BTCUSDT', '1m', 0, 1099 * MINUTE, source)
+    after = cache._read_meta(path)
+
+    # The base segment is untouched; the switch is one meta.json replace
+    assert [segment['rows'] for segment in after['segments']] == [1000, 100]
+    assert after['segments'][0] == before['segments'][0]
+    assert after['version'] == before['version'] + 1
+    expected = source.frame.iloc[:1100].to_numpy()
+    assert (read_slice(path, 0, 1099 * MINUTE).to_numpy() == expected).all()
+
+    for end in range(1199, 3000, 100):
+        cache.get('BTCUSDT', '1m', 0, end * MINUTE, source)
+        segments = cache._read_meta(path)['segments']
+        assert len(segments) <= MAX_SEGMENTS
+        # Each segment is well over twice the size of the next
+        assert all(a['rows'] > 2 * b['rows'] for a, b in pairwise(segments))
+    last = int(source.frame['timestamp'].iloc[-1])
+    loaded = cache.load('BTCUSDT', '1m', 0, last)
+    assert (loaded.to_numpy() == source.frame.to_numpy()).all()
+
+    # Files of the current and the previous version are kept, nothing else
+    names = {name.split('.', 1)[0] for name in os.listdir(path)
+             if name.endswith('.npy')}
+    assert {segment['name'] for segment in segments} <= names
+    assert len(names) <= 2 * len(segments) + 1
+
+
+def test_refetched_bar_replaces_cached_copy(tmp_path):
+    source = Source(100)
+    last = int(source.frame['timestamp'].iloc[-1])
+    cache = OHLCVCache(str(tmp_path), clock=lambda: (last + MINUTE // 2) / 1000)
+    cache.get('BTCUSDT', '1m', 0, last, source)
+
+    source.frame.loc[99, 'close'] = 1.0
+    df = cache.get('BTCUSDT', '1m', 0, last, source)
+    assert len(df) == 100
+    assert df['close'].iloc[-1] == 1.0
+
+
+def test_concurrent_fills_keep_every_range(tmp_path):
+    source = Source(4000)
+    cache = OHLCVCache(str(tmp_path))
+    path = cache.path('BTCUSDT', '1m')
+    os.makedirs(path)
+    # Each writer has fetched its own gap before any of them stores
+    gaps = [(i * 1000 * MINUTE, (i + 1) * 1000 * MINUTE - 1) for i in range(4)]
+    start = threading.Barrier(len(gaps))
+
+    def fill(gap):
+        frame = source(*gap)
+        start.wait()
+        cache._store('BTCUSDT', '1m', [gap], [frame])
+
+    threads = [threading.Thread(target=fill, args=(gap,)) for gap in gaps]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    last = int(source.frame['timestamp'].iloc[-1])
+    assert cache.missing('BTCUSDT', '1m', 0, last) == []
+    loaded = cache.load('BTCUSDT', '1m', 0, last)
+    assert (loaded.to_numpy() == source.frame.to_numpy()).all()
+    names = [segment['name'] for segment in cache._read_meta(path)['segments']]
+    assert len(set(names)) == len(names)
+    assert not [name for name in os.listdir(path) if name.endswith('.tmp')]
+
+
+def test_load_stamps_the_entry_not_meta(tmp_path):
+    source = Source(100)
+    now = [1_000_000_000.0]
+    cache = OHLCVCache(str(tmp_path), clock=lambda: now[0])
+    last = int(source.frame['timestamp'].iloc[-1])
+    cache.get('BTCUSDT', '1m', 0, last, source)
+    path = cache.path('BTCUSDT', '1m')
+    meta = os.stat(os.path.join(path, 'meta.json'))
+
+    now[0] += 60
+    cache.load('BTCUSDT', '1m', 0, last)
+    assert os.stat(path).st_mtime == now[0]
+    assert os.stat(os.path.join(path, 'meta.json')).st_mtime_ns == meta.st_mtime_ns
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from backtest_engine import IndicatorCache
+from golden_data import PagedGoldenBacktester
+from param_sweep import STATUS_COMPLETE, STATUS_PRUNED, ParameterSweep, evaluate
+
+GRID = {'stop_loss_percent': [0.5, 1, 2, 3], 'take_profit_percent': [1, 4, 8],
+        'fast_period': [5, 9]}
+
+
+@pytest.fixture(scope='module')
+def tester():
+    return PagedGoldenBacktester(60_000)
+
+
+@pytest.fixture(scope='module')
+def cfg(tester):
+    start = datetime.fromtimestamp(tester.frame['timestamp'].iloc[0] / 1000)
+    return {'startDate': start.strftime('%Y-%m-%d'),
+            'endDate': (start + timedelta(days=30)).strftime('%Y-%m-%d'),
+            'initialBalance': 1000,
+            'pairs': ['BTC/USDT', 'ETH/USDT']}
+
+
+def test_default_row_matches_run_backtest(tester, cfg):
+    expected = tester.run_backtest(cfg)
+    assert expected['total_trades'] == 292
+    grid = {'stop_loss_percent': [1, tester.stop_loss_percent, 3]}
+    for workers in (None, 2):
+        table = ParameterSweep(tester, grid, workers=workers,
+                               prune_fraction=None).run(cfg)
+        row = table[table['stop_loss_percent'] == tester.stop_loss_percent].iloc[0]
+        assert row['trades'] == 292
+        assert row['win_rate'] == pytest.approx(expected['win_rate'])
+
+
+def test_pruned_rows_keep_partial_metrics_and_rank_last(tester, cfg):
+    sweep = ParameterSweep(tester, GRID, prune_fraction=0.25)
+    table = sweep.run(cfg)
+    pruned = table[table['status'] == STATUS_PRUNED]
+    assert 0 < len(pruned) == sweep.stats['pruned'] < len(table)
+    assert (table['status'].iloc[:len(table) - len(pruned)] == STATUS_COMPLETE).all()
+
+    data = sweep.load(cfg)
+    for _, row in pruned.iterrows():
+        combo = {name: row[name] for name in sweep.combinations()[0]}
+        partial = evaluate(data, [combo], 500.0, 0.25, IndicatorCache())[0]
+        assert partial['total_return'] < 0
+        assert {name: row[name] for name in partial} == pytest.approx(partial)
+
+
+def test_workers_match_in_process(tester, cfg):
+    table = ParameterSweep(tester, GRID).run(cfg)
+    pooled = ParameterSweep(tester, GRID, workers=2).run(cfg)
+    pd.testing.assert_frame_equal(pooled, table)
+
+
+def test_stop_and_target_combos_share_indicators(tester, cfg):
+    single = ParameterSweep(tester, {'stop_loss_percent': [2]}, prune_fraction=None)
+    single.run(cfg)
+    misses = single.stats['indicator_misses']
+    assert misses > 0
+
+    grid = {'stop_loss_percent': [1, 2, 3], 'take_profit_percent': [3, 6, 9]}
+    sweep = ParameterSweep(tester, grid, prune_fraction=None)
+    sweep.run(cfg)
+    # Only the first combination computes anything
+    assert sweep.stats['indicator_misses'] == misses
+    assert sweep.stats['indicator_hits'] == 8 * misses
+
+
+def test_rejects_unknown_parameter_and_metric(tester):
+    with pytest.raises(ValueError, match='stop_loss'):
+        ParameterSweep(tester, {'stop_loss': [1, 2]})
+    with pytest.raises(ValueError, match='sharpe'):
+        ParameterSweep(tester, {'stop_loss_percent': [1, 2]}, metric='sharpe')
@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+from pnl_window import PnLWindow
+from risk_manager import RiskManager
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_totals_survive_restart(tmp_path):
+    path = str(tmp_path / 'pnl.jsonl')
+    clock = Clock()
+    window = PnLWindow(clock=clock, state_path=path)
+    for pnl in (5.0, -2.0, 8.0, 4.0, 6.0, 3.0, 7.0, 9.0, -1.0, 10.0, 2.0):
+        window.record(pnl)
+        clock.now += 60
+    # Closes the last bucket
+    window.daily_pnl()
+
+    restarted = PnLWindow(clock=clock, state_path=path)
+    assert restarted.total == window.total == 51.0
+    assert restarted.daily_pnl() == window.daily_pnl()
+    assert restarted.metrics() == window.metrics()
+
+
+def test_save_keeps_bucket_in_progress(tmp_path):
+    path = str(tmp_path / 'pnl.jsonl')
+    clock = Clock()
+    window = PnLWindow(clock=clock, zero=Decimal('0'), state_path=path)
+    window.record(Decimal('1.5'))
+    clock.now += 60
+    window.record(Decimal('2.25'))
+    window.save()
+
+    restarted = PnLWindow(clock=clock, zero=Decimal('0'), state_path=path)
+    assert restarted.total == Decimal('3.75')
+    assert restarted.metrics() == window.metrics()
+
+    # The bucket closes after the save; its final summary supersedes the saved one
+    window.record(Decimal('1'))
+    clock.now += 60
+    window.daily_pnl()
+    restarted = PnLWindow(clock=clock, zero=Decimal('0'), state_path=path)
+    assert restarted.total == Decimal('4.75')
+
+
+def test_log_without_header_and_torn_line(tmp_path):
+    path = tmp_path / 'pnl.jsonl'
+    clock = Clock()
+    index = int(clock.now // 60) - 1
+    path.write_text(f'[{index}, 0, 4, 0, 4, 0]\n'
+                    '{"total": 4, "day": 0, "day_open": 0}\n'
+                    f'[{index}, 0')
+
+    window = PnLWindow(clock=clock, state_path=str(path))
+    assert window.total == 4
+    assert window.pnl('1h') == 4
+
+
+def test_long_run_compacts_log(tmp_path):
+    path = tmp_path / 'pnl.jsonl'
+    clock = Clock()
+    window = PnLWindow(clock=clock, windows={'1h': 3600}, state_path=str(path))
+    for _ in range(1000):
+        window.record(1.0)
+        clock.now += 60
+    window.daily_pnl()
+
+    assert len(path.read_text().splitlines()) < 2 * 60 + 64 + 2
+    restarted = PnLWindow(clock=clock, windows={'1h': 3600}, state_path=str(path))
+    assert restarted.total == 1000.0
+
+
+def test_risk_manager_close_persists_pnl(tmp_path):
+    path = str(tmp_path / 'pnl.jsonl')
+    manager = RiskManager({'pnlStatePath': path})
+    manager.update_position('BTCUSDT', Decimal('12.5'))
+    manager.close()
+
+    assert RiskManager({'pnlStatePath': path}).pnl.total == Decimal('12.5')
+
+
+def test_backdated_record_keeps_the_day():
+    clock = Clock()
+    window = PnLWindow(clock=clock)
+    window.record(-50.0)
+    # A late fill from yesterday is booked today without rolling the day back
+    window.record(-10.0, timestamp=clock.now - 86400)
+    window.record(-5.0)
+    assert window.daily_pnl() == -65.0
+
+    clock.now += 86400
+    assert window.daily_pnl() == 0.0
@@ -0,0 +1,154 @@
+import asyncio
+import contextlib
+import json
+import time
+
+import websockets
+
+from mexc_simulator import MEXCSimulator
+from mexc_trading import TradingBot
+from price_book import MarketDataStream, PriceBook
+
+
+def ticker(symbol: str, price: float, ts: int = 1_700_000_000_000) -> str:
+    return json.dumps({
+        'channel': 'push.ticker',
+        'data': {'symbol': symbol, 'fairPrice': price, 'lastPrice': price + 1,
+                 'bid1': price - 0.5, 'ask1': price + 0.5},
+        'ts': ts
+    })
+
+
+async def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        await asyncio.sleep(0.01)
+
+
+async def consume(feed: MarketDataStream, condition) -> None:
+    task = asyncio.ensure_future(feed.run())
+    try:
+        await wait_for(condition)
+    finally:
+        feed.stop()
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+def test_parse_message():
+    update = MarketDataStream.parse_message(ticker('BTC_USDT', 50000.0))
+    assert update == {'symbol': 'BTCUSDT', 'mark': 50000.0, 'last': 50001.0,
+                      'bid': 49999.5, 'ask': 50000.5, 'timestamp': 1_700_000_000.0}
+    pong = json.dumps({'channel': 'pong', 'data': 1})
+    assert MarketDataStream.parse_message(pong) is None
+    assert MarketDataStream.to_contract_symbol('ETHUSDT') == 'ETH_USDT'
+    assert MarketDataStream.to_contract_symbol('ETH_USDT') == 'ETH_USDT'
+
+
+def test_stream_subscribes_and_fills_book():
+    subscriptions = []
+
+    async def serve(ws):
+        for _ in range(2):
+            subscriptions.append(json.loads(await ws.recv()))
+        await ws.send(json.dumps({'channel': 'rs.sub.ticker', 'data': 'success'}))
+        await ws.send(ticker('BTC_USDT', 50000.0))
+        await ws.send(ticker('ETH_USDT', 3000.0))
+        await ws.wait_closed()
+
+    async def run():
+        book = PriceBook(max_age=float('inf'))
+        async with websockets.serve(serve, '127.0.0.1', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            feed = MarketDataStream(book, ['BTCUSDT', 'ETHUSDT'], url=f'ws://127.0.0.1:{port}')
+            await consume(feed, lambda: book.get('ETHUSDT') is not None)
+        return book
+
+    book = asyncio.run(run())
+    assert [s['param']['symbol'] for s in subscriptions] == ['BTC_USDT', 'ETH_USDT']
+    assert all(s['method'] == 'sub.ticker' for s in subscriptions)
+    tick = book.get('BTCUSDT')
+    prices = (tick.mark, tick.last, tick.bid, tick.ask)
+    assert prices == (50000.0, 50001.0, 49999.5, 50000.5)
+    assert book.get_mark_price('ETHUSDT') == 3000.0
+
+
+def test_stream_reconnects_and_resubscribes():
+    connections = []
+
+    async def serve(ws):
+        connections.append(json.loads(await ws.recv()))
+        # Drop the first connection after one tick
+        await ws.send(ticker('BTC_USDT', 100.0 * len(connections)))
+        if len(connections) > 1:
+            await ws.wait_closed()
+
+    async def run():
+        book = PriceBook(max_age=float('inf'))
+        async with websockets.serve(serve, '127.0.0.1', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            feed = MarketDataStream(book, ['BTCUSDT'], url=f'ws://127.0.0.1:{port}')
+            await consume(feed, lambda: book.get_mark_price('BTCUSDT') == 200.0)
+        return book
+
+    asyncio.run(run())
+    assert len(connections) == 2
+    assert connections[1] == connections[0]
+
+
+def test_staleness():
+    book = PriceBook(max_age=5.0)
+    assert book.age('BTCUSDT') == float('inf')
+    assert book.is_stale('BTCUSDT')
+    assert book.get_mark_price('BTCUSDT') is None
+
+    book.update('BTCUSDT', mark=100.0, timestamp=time.time() - 10)
+    assert book.is_stale('BTCUSDT')
+    assert book.get_mark_price('BTCUSDT') is None
+    assert book.get_mark_price('BTCUSDT', max_age=60) == 100.0
+
+    # Partial updates keep the other fields and refresh the timestamp
+    book.update('BTCUSDT', bid=99.5)
+    assert not book.is_stale('BTCUSDT')
+    assert book.get('BTCUSDT').bid == 99.5
+    assert book.get_mark_price('BTCUSDT') == 100.0
+
+
+def test_rest_fallback():
+    book = PriceBook(max_age=5.0)
+    with MEXCSimulator() as sim:
+        bot = TradingBot('key', 'secret', base_url=sim.url, price_book=book)
+        try:
+            book.update('BTCUSDT', mark=49000.0)
+            assert bot._get_mark_price('BTCUSDT') == 49000.0
+            assert sim.stats()['requests'] == 0
+
+            # A stale price goes to REST and refreshes the book
+            book.update('BTCUSDT', mark=49000.0, timestamp=time.time() - 60)
+            assert bot._get_mark_price('BTCUSDT') == 50000.0
+            assert sim.stats()['requests'] == 1
+            assert book.get_mark_price('BTCUSDT') == 50000.0
+
+            # No price at all
+            assert bot._get_mark_price('ETHUSDT') == 3000.0
+            assert sim.stats()['requests'] == 2
+        finally:
+            bot.close()
+
+
+def test_stream_from_simulator():
+    async def run():
+        book = PriceBook()
+        with MEXCSimulator(websocket=True) as sim:
+            feed = MarketDataStream(book, ['BTCUSDT'], url=sim.ws_url)
+
+            def moved():
+                sim.set_mark_price('BTCUSDT', 51000.0)
+                return book.get_mark_price('BTCUSDT') == 51000.0
+
+            await consume(feed, moved)
+        return book
+
+    assert asyncio.run(run()).get('BTCUSDT').bid == 51000.0
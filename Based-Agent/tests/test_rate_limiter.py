@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from rate_limiter import RequestScheduler
+
+READ = ('GET', '/api/v3/premiumIndex')
+ORDER = ('POST', '/api/v3/order')
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def test_order_jumps_queued_reads():
+    scheduler = RequestScheduler(capacity=10, refill_rate=5.0, order_reserve=0)
+    scheduler.bucket.drain()
+    served = []
+
+    def request(name, method, endpoint):
+        scheduler.acquire(method, endpoint)
+        served.append(name)
+
+    threads = [threading.Thread(target=request, args=(f'read{i}', *READ))
+               for i in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: scheduler.metrics()['queue_depth']['reads'] == 3)
+
+    threads.append(threading.Thread(target=request, args=('order', *ORDER)))
+    threads[-1].start()
+    for thread in threads:
+        thread.join(5)
+    assert served[0] == 'order'
+    assert sorted(served[1:]) == ['read0', 'read1', 'read2']
+    metrics = scheduler.metrics()
+    assert metrics['max_queue_depth'] == 4
+    assert metrics['queue_depth'] == {'orders': 0, 'reads': 0}
+
+
+def test_reads_leave_order_reserve():
+    async def scenario():
+        scheduler = RequestScheduler(capacity=10, refill_rate=1e-3, order_reserve=5)
+        for _ in range(5):
+            assert await scheduler.acquire_async(*READ) < 0.1
+        # A sixth read would eat into the reserve
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.acquire_async(*READ), 0.2)
+        # Orders may spend it
+        for _ in range(5):
+            assert await scheduler.acquire_async(*ORDER) < 0.1
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.metrics()['queue_depth'] == {'orders': 0, 'reads': 0}
+
+
+def test_penalize_blocks_until_retry_after():
+    scheduler = RequestScheduler()
+    assert scheduler.acquire(*ORDER) < 0.05
+    scheduler.penalize(0.3)
+    assert scheduler.acquire(*ORDER) >= 0.25
+    assert scheduler.metrics()['throttled'] == 1
+
+
+def test_coalesced_reads_make_one_call_and_get_copies():
+    scheduler = RequestScheduler()
+    calls = []
+    start = threading.Barrier(5)
+    results = [None] * 5
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'markPrice': '50000', 'levels': [[1, 2]]}
+
+    def read(i):
+        start.wait()
+        results[i] = scheduler.coalesce(('premiumIndex', 'BTCUSDT'), fetch)
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert scheduler.metrics()['coalesced'] == 4
+    assert all(r == {'markPrice': '50000', 'levels': [[1, 2]]} for r in results)
+    results[0]['levels'][0].append(3)
+    assert results[1]['levels'] == [[1, 2]]
+    assert len({id(r['levels']) for r in results}) == 5
+
+
+def test_cancelled_async_waiter_wakes_next_head():
+    async def scenario():
+        weights = {('GET', '/big'): 10, ('GET', '/small'): 1}
+        scheduler = RequestScheduler(capacity=10, refill_rate=5.0, order_reserve=0,
+                                     weights=weights)
+        scheduler.bucket.drain()
+        # The head waits ~2s on the clock; the read behind it waits to be woken
+        head = asyncio.ensure_future(scheduler.acquire_async('GET', '/big'))
+        await asyncio.sleep(0.01)
+        behind = asyncio.ensure_future(scheduler.acquire_async('GET', '/small'))
+        await asyncio.sleep(0.05)
+        assert scheduler.metrics()['queue_depth']['reads'] == 2
+
+        head.cancel()
+        waited = await asyncio.wait_for(behind, 1.0)
+        assert waited < 1.0
+        assert head.cancelled()
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.metrics()['queue_depth'] == {'orders': 0, 'reads': 0}
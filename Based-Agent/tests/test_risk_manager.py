@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from price_book import PriceBook
+from risk_manager import BATCH_SIZE_RTOL, RiskManager
+
+
+def test_price_book_ticks_move_stops_and_flag_exits():
+    book = PriceBook()
+    manager = RiskManager({'trailingStop': 1.0}, price_book=book)
+    manager.open_position('BTCUSDT', 'LONG', Decimal('1'), Decimal('100'),
+                          stop_loss=Decimal('95'), take_profit=Decimal('120'))
+    manager.open_position('ETHUSDT', 'SHORT', Decimal('1'), Decimal('100'),
+                          stop_loss=Decimal('105'), take_profit=Decimal('80'))
+    events = []
+    manager.stop_engine.subscribe(events.extend)
+
+    # Breakeven, then the trailing stop follows the price up
+    book.update('BTCUSDT', mark=103.0)
+    assert manager.open_positions['BTCUSDT']['stop_loss'] == Decimal(str(103.0 * 0.99))
+    book.update('BTCUSDT', mark=110.0)
+    assert manager.open_positions['BTCUSDT']['stop_loss'] == Decimal(str(110.0 * 0.99))
+    assert [e.kind for e in events] == ['trailing', 'trailing']
+
+    # The short's stop is crossed, but it stays in the book until the
+    # exchange fill is confirmed
+    book.update('ETHUSDT', mark=106.0)
+    assert events[-1].kind == 'stop_loss' and events[-1].key == 'ETHUSDT'
+    assert manager.open_positions['ETHUSDT']['exit_pending'] == 'stop_loss'
+    assert manager.symbol_exposure == {'BTCUSDT': Decimal('100'),
+                                       'ETHUSDT': Decimal('100')}
+    manager.update_position('ETHUSDT', Decimal('-6'), is_closed=True)
+    assert 'ETHUSDT' not in manager.open_positions
+    assert manager.symbol_exposure == {'BTCUSDT': Decimal('100')}
+    assert manager.daily_pnl == Decimal('-6')
+
+    manager.close()
+    book.update('BTCUSDT', mark=50.0)
+    assert 'exit_pending' not in manager.open_positions['BTCUSDT']
+
+
+def test_get_adjusted_stops_is_read_only():
+    manager = RiskManager({})
+    position = manager.open_position('BTCUSDT', 'LONG', Decimal('1'), Decimal('100'),
+                                     stop_loss=Decimal('95'),
+                                     take_profit=Decimal('120'))
+
+    def stop_at(price: str) -> Decimal:
+        stops = manager.get_adjusted_stops('BTCUSDT', Decimal(price), position)
+        return stops['stop_loss']
+
+    # Prices reach the engine only through on_tick (or the price book)
+    assert stop_at('102') == Decimal('95')
+    manager.stop_engine.on_tick('BTCUSDT', 102.0)
+    assert stop_at('101') == Decimal('100')
+    assert stop_at('90') == Decimal('100')
+    assert 'BTCUSDT' in manager.open_positions
+
+    # An untracked position moves to breakeven without being registered
+    hedge = manager.open_position('ETHUSDT', 'SHORT', Decimal('1'), Decimal('100'),
+                                  key='ETHUSDT:SHORT')
+    hedge.update(stop_loss=Decimal('105'), take_profit=Decimal('90'))
+    stops = manager.get_adjusted_stops('ETHUSDT:SHORT', Decimal('97'), hedge)
+    assert stops == {'stop_loss': Decimal('100'), 'take_profit': Decimal('90')}
+    assert manager.get_adjusted_stops('ETHUSDT:SHORT', Decimal('99'),
+                                      hedge)['stop_loss'] == Decimal('105')
+    assert set(manager.stop_engine.positions) == {'BTCUSDT'}
+    assert manager.get_adjusted_stops('ETHUSDT', Decimal('97'), hedge) == {}
+
+
+def test_var_gate_rejects_correlated_add():
+    book = PriceBook()
+    config = {'maxTotalRisk': 1e9, 'maxPortfolioVaR': 400, 'varBarSeconds': 60}
+    manager = RiskManager(config, price_book=book)
+    rng = np.random.default_rng(3)
+    btc = eth = 100.0
+    for bar in range(40):
+        move = rng.normal(0, 0.01)
+        btc *= np.exp(move)
+        eth *= np.exp(move + rng.normal(0, 0.001))
+        book.update('BTCUSDT', mark=btc, timestamp=bar * 60.0)
+        book.update('ETHUSDT', mark=eth, timestamp=bar * 60.0 + 1)
+    assert manager.var_engine.ready('BTCUSDT') and manager.var_engine.ready('ETHUSDT')
+    assert manager.var_engine.correlation('BTCUSDT', 'ETHUSDT') > 0.9
+
+    manager.open_position('BTCUSDT', 'LONG', Decimal('100'), Decimal('100'))
+    size, price = Decimal('100'), Decimal(str(eth))
+    # Doubling up through a correlated symbol breaches the limit, hedging does not
+    assert not manager.can_open_position('ETHUSDT', 'LONG', size, 1, price)['allowed']
+    assert manager.can_open_position('ETHUSDT', 'SHORT', size, 1, price)['allowed']
+
+    # The same size in the batch: 2% of 5000 risked over a stop 1.0 away
+    batch = manager.calculate_position_sizes(5000.0, eth, eth - 1.0, leverages=1,
+                                             symbols=['ETHUSDT', 'ETHUSDT'],
+                                             sides=['LONG', 'SHORT'])
+    assert batch['allowed'].tolist() == [False, True]
+
+
+def test_batch_sizes_broadcast_leverages_and_stops():
+    manager = RiskManager({'maxLeverage': 2})
+    batch = manager.calculate_position_sizes(1000.0, 100.0, leverages=[1, 2, 3])
+    assert batch['allowed'].tolist() == [True, True, False]
+    assert batch['size'].shape == (3,)
+    single = manager.calculate_position_size(Decimal('1000'), Decimal('100'))
+    assert batch['size'][0] == pytest.approx(float(single['size']), rel=BATCH_SIZE_RTOL)
+
+    # NaN stops fall back to the default
+    batch = manager.calculate_position_sizes(1000.0, 100.0, [95.0, np.nan])
+    assert batch['stop_loss'].tolist() == [95.0, 98.0]
+    assert batch['size'].tolist() == [4.0, 10.0]
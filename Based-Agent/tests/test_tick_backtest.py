@@ -0,0 +1,162 @@
+import itertools
+
+import pytest
+
+from tick_backtest import (
+    DEPTH,
+    ORDER,
+    TRADE,
+    BookMatchingEngine,
+    DepthSnapshot,
+    EventQueue,
+    LatencyModel,
+    SignalBracketStrategy,
+    SlippageModel,
+    TickBacktest,
+    TickExchange,
+    TickStrategy,
+    TradeTick,
+)
+
+
+def tick(timestamp, price):
+    return TradeTick(timestamp, price, 1.0, 'BUY')
+
+
+def book(timestamp, bids, asks):
+    return DepthSnapshot(timestamp, bids, asks)
+
+
+def engine(**slippage):
+    return BookMatchingEngine('BTCUSDT', 1000.0, SlippageModel(**slippage))
+
+
+def arrive(matching, order_id, side, order_type, quantity, stop_price=None):
+    return matching.arrive({'orderId': order_id, 'side': side, 'type': order_type,
+                            'quantity': quantity, 'stopPrice': stop_price,
+                            'positionSide': 'LONG'})
+
+
+def test_event_queue_orders_ties_by_kind_then_arrival():
+    queue = EventQueue()
+    queue.add_source(TRADE, [tick(5, 100.0), tick(10, 101.0)])
+    queue.add_source(DEPTH, [book(5, [], []), book(10, [], [])])
+    queue.push(5, ORDER, 'first')
+    queue.push(5, ORDER, 'second')
+    queue.push(1, ORDER, 'early')
+    # One pending event per source, plus the pushed orders
+    assert len(queue) == 5
+
+    popped = []
+    while queue:
+        timestamp, kind, payload = queue.pop()
+        popped.append((timestamp, kind, payload if kind == ORDER else None))
+    assert popped == [(1, ORDER, 'early'), (5, TRADE, None), (5, DEPTH, None),
+                      (5, ORDER, 'first'), (5, ORDER, 'second'),
+                      (10, TRADE, None), (10, DEPTH, None)]
+
+
+def test_take_walks_levels_then_prices_beyond_book():
+    matching = engine(beyond_book_bps=100.0)
+    matching.on_depth(book(0, [(99.0, 1.0)], [(100.0, 1.0), (101.0, 2.0)]))
+    assert matching._take('BUY', 2.0) == pytest.approx(100.5)
+    assert matching._asks == [[101.0, 1.0]]
+
+    # One lot left on the book, two past it at 1% beyond the last level
+    assert matching._take('BUY', 3.0) == pytest.approx((101.0 + 2 * 102.01) / 3)
+    assert matching._asks == []
+
+    # A limit stops the walk, and the rest is priced at the limit
+    assert matching._take('SELL', 2.0, limit=98.0) == pytest.approx(98.5)
+    assert matching._bids == []
+
+
+def test_one_print_through_stop_and_take_profit_fills_only_one():
+    matching = engine()
+    exchange = TickExchange(matching, EventQueue(), LatencyModel())
+    fills = []
+
+    def one_cancels_other(fill):
+        fills.append(fill)
+        exchange.cancel_order(3 if fill.order_id == 2 else 2)
+    matching.subscribe(one_cancels_other)
+
+    matching.on_depth(book(0, [(99.0, 5.0)], [(100.0, 5.0)]))
+    arrive(matching, 1, 'BUY', 'MARKET', 1.0)
+    # Placed before any trade, so neither is checked on arrival; a print at
+    # 100 is through both
+    arrive(matching, 2, 'SELL', 'STOP_MARKET', 1.0, stop_price=101.0)
+    arrive(matching, 3, 'SELL', 'TAKE_PROFIT_MARKET', 1.0, stop_price=99.5)
+    fills.clear()
+    matching.on_trade(tick(1, 100.0))
+
+    assert [f.order_id for f in fills] == [3]
+    assert matching.orders[2]['status'] == 'CANCELED'
+    assert matching.positions[('BTCUSDT', 'LONG')]['amount'] == 0
+    # Only the take profit's lot left the book
+    assert matching._bids == [[99.0, 4.0]]
+
+
+class CancelInFlight(TickStrategy):
+    """Sends a market order on the first trade and cancels it at once"""
+
+    def __init__(self):
+        self.order_id = None
+
+    def on_trade(self, _tick, exchange):
+        if self.order_id is None:
+            self.order_id = exchange.place_order('BUY', 'MARKET', 1.0)
+            exchange.cancel_order(self.order_id)
+
+
+def test_leg_cancelled_in_flight_never_fills():
+    strategy = CancelInFlight()
+    backtest = TickBacktest('BTCUSDT', [tick(0, 100.0), tick(100, 100.0)], strategy,
+                            depth=[book(0, [(99.0, 1.0)], [(100.0, 1.0)])])
+    result = backtest.run()
+    order = backtest.engine.orders[strategy.order_id]
+    assert (order['status'], order['updateTime']) == ('CANCELED', 50)
+    assert result['fills'] == []
+    assert backtest.engine._asks == [[100.0, 1.0]]
+
+
+class AlwaysLong:
+    """CrossoverSignal stand-in that signals long on every bar"""
+
+    def update(self, _close):
+        return 1
+
+
+class ScriptedLatency(LatencyModel):
+    """Entry slower than its legs, so they reach the exchange first"""
+
+    def __init__(self):
+        super().__init__()
+        self._delays = itertools.cycle([50, 10, 10])
+
+    def delay(self):
+        return next(self._delays)
+
+
+def test_leg_arriving_crossed_before_entry_abandons_bracket():
+    strategy = SignalBracketStrategy(bar_ms=1000)
+    strategy.signal = AlwaysLong()
+    # The bracket goes out at 1000 with its stop at 98; the price falls
+    # through it before the stop leg lands at 1010
+    trades = [tick(0, 100.0), tick(1000, 100.0), tick(1005, 97.0), tick(2000, 97.0)]
+    depth = [book(0, [(99.0, 5.0), (96.0, 5.0)], [(101.0, 5.0)])]
+    backtest = TickBacktest('BTCUSDT', trades, strategy, depth=depth,
+                            latency=ScriptedLatency())
+    backtest.run()
+
+    first, second = strategy.brackets
+    assert first['expired'] == first['stop_loss']
+    orders = backtest.engine.orders
+    assert [orders[first[leg]]['status']
+            for leg in ('entry', 'stop_loss', 'take_profit')] == [
+        'CANCELED', 'EXPIRED', 'CANCELED']
+    # The expired stop took nothing from the bids
+    assert backtest.engine._bids == [[96.0, 5.0]]
+    # The strategy was free to open the next bracket, which filled
+    assert orders[second['entry']]['status'] == 'FILLED'
+    assert [f.order_id for f in backtest.fills] == [second['entry']]
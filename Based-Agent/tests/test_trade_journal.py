@@ -0,0 +1,74 @@
+from trade_journal import TradeJournal
+
+
+def bracket(stop_id: int, take_profit_id: int) -> dict:
+    return {'side': 'LONG',
+            'stop_loss_order': {'orderId': stop_id},
+            'take_profit_order': {'orderId': take_profit_id}}
+
+
+def test_recovers_open_trades_before_and_after_compaction(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    journal = TradeJournal(path, snapshot_every=10**6)
+    journal.record_open('BTCUSDT', bracket(1, 2))
+    journal.record_open('ETHUSDT', bracket(3, 4))
+    journal.record_update('BTCUSDT', {'stop_loss': 100.0})
+    journal.record_close('ETHUSDT')
+    journal.flush()
+    # Simulate a crash: reopen the file without closing this instance
+    expected = dict(bracket(1, 2), stop_loss=100.0)
+    recovered = TradeJournal(path)
+    assert recovered.open_trades == {'BTCUSDT': expected}
+    recovered.close()
+
+    journal.compact()
+    journal.record_open('SOLUSDT', bracket(5, 6))
+    journal.close()
+    reopened = TradeJournal(path)
+    try:
+        assert reopened.open_trades == {'BTCUSDT': expected, 'SOLUSDT': bracket(5, 6)}
+        # Only the event after the snapshot is replayed
+        count = reopened._conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+        assert count == 1
+    finally:
+        reopened.close()
+
+
+def test_compacts_every_snapshot_every_events(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    with TradeJournal(path, snapshot_every=4) as journal:
+        for i in range(10):
+            journal.record_open(f'T{i}', bracket(i, i + 100))
+            journal.flush()
+    with TradeJournal(path) as journal:
+        assert sorted(journal.open_trades) == [f'T{i}' for i in range(10)]
+        count = journal._conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+        assert count < 4
+
+
+def test_reconcile_closes_trades_whose_brackets_are_gone(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    with TradeJournal(path) as journal:
+        journal.record_open('BTCUSDT', bracket(1, 2))
+        journal.record_open('ETHUSDT', bracket(3, 4))
+        journal.record_open('SOLUSDT', bracket(5, 6))
+        # One bulk response for every symbol: BTC intact, ETH gone, SOL half
+        result = journal.reconcile([{'orderId': 1}, {'orderId': '2'}, {'orderId': 6}])
+        assert result == {'intact': ['BTCUSDT'], 'closed': ['ETHUSDT'],
+                          'missing_legs': {'SOLUSDT': ['stop_loss_order']}}
+        assert sorted(journal.open_trades) == ['BTCUSDT', 'SOLUSDT']
+
+    # The reconciled close is durable
+    with TradeJournal(path) as journal:
+        assert sorted(journal.open_trades) == ['BTCUSDT', 'SOLUSDT']
+
+
+def test_reconcile_unwraps_data_response(tmp_path):
+    with TradeJournal(str(tmp_path / 'journal.db')) as journal:
+        journal.record_open('BTCUSDT', bracket(1, 2))
+        journal.record_open('ETHUSDT', bracket(3, 4))
+        response = {'code': 0, 'data': [{'orderId': 1}, {'orderId': 2}]}
+        result = journal.reconcile(response)
+        assert result['intact'] == ['BTCUSDT']
+        assert result['closed'] == ['ETHUSDT']
+        assert journal.reconcile({'code': 0, 'data': None})['closed'] == ['BTCUSDT']
@@ -0,0 +1,649 @@
+"""Event-driven tick backtest against recorded trades and depth snapshots.
+
+Market data is streamed from local files (optionally gzipped):
+
+- trades: CSV with a header of timestamp,price,quantity,side, where side is
+  the taker side (BUY or SELL) and timestamp is in milliseconds
+- depth: JSON lines of {"timestamp": ms, "bids": [[price, qty], ...],
+  "asks": [[price, qty], ...]}, best level first
+
+Both files must be in time order. An EventQueue merges them, plus the
+orders in flight, with one heap entry per source, so memory stays bounded
+however long the replay is. A TickStrategy sees every event and places
+orders through the TickExchange. Orders reach the matching engine after
+the LatencyModel's delay. Market orders, and stop and take-profit orders
+once the last trade price crosses them, take liquidity from the latest
+depth snapshot, and the SlippageModel prices anything beyond the visible
+depth. Resting limit orders fill at their price when a trade prints
+through it. Closing orders that find no position to reduce expire
+without touching the book, and the strategy is told.
+"""
+import csv
+import gzip
+import heapq
+import itertools
+import json
+import math
+import random
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from backtest_engine import CrossoverSignal
+from mexc_simulator import MatchingEngine, SimulatorConfig
+from mexc_trading import calculate_bracket_prices
+
+# Event kinds, in the order they are handled when timestamps tie
+TRADE = 0
+DEPTH = 1
+ORDER = 2
+
+class TradeTick(NamedTuple):
+    timestamp: int
+    price: float
+    quantity: float
+    side: str
+
+class DepthSnapshot(NamedTuple):
+    timestamp: int
+    bids: List[Tuple[float, float]]
+    asks: List[Tuple[float, float]]
+
+class Fill(NamedTuple):
+    timestamp: int
+    order_id: int
+    side: str
+    position_side: str
+    order_type: str
+    quantity: float
+    price: float
+    fee: float
+
+def _open(path: str) -> IO[str]:
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', newline='')
+    return open(path, newline='')
+
+def read_trades(path: str) -> Iterator[TradeTick]:
+    """Stream trades from a CSV file, one row at a time"""
+    with _open(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        index = {name.strip(): i for i, name in enumerate(header)}
+        try:
+            columns = [index[name]
+                       for name in ('timestamp', 'price', 'quantity', 'side')]
+        except KeyError as e:
+            raise ValueError(f"Trades file {path} is missing column {e}") from e
+        t, p, q, s = columns
+        for row in reader:
+            if row:
+                yield TradeTick(int(row[t]), float(row[p]), float(row[q]),
+                                row[s].strip().upper())
+
+def read_depth(path: str) -> Iterator[DepthSnapshot]:
+    """Stream depth snapshots from a JSON lines file"""
+    with _open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            yield DepthSnapshot(int(data['timestamp']),
+                                [(float(p), float(q)) for p, q in data['bids']],
+                                [(float(p), float(q)) for p, q in data['asks']])
+
+def write_trades(path: str, trades: Iterable[TradeTick]) -> None:
+    """Record trades in the format read_trades expects"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'price', 'quantity', 'side'])
+        writer.writerows((t.timestamp, repr(t.price), repr(t.quantity), t.side)
+                         for t in trades)
+
+def write_depth(path: str, snapshots: Iterable[DepthSnapshot]) -> None:
+    """Record depth snapshots in the format read_depth expects"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt') as f:
+        for s in snapshots:
+            record = {'timestamp': s.timestamp, 'bids': s.bids, 'asks': s.asks}
+            f.write(json.dumps(record) + '\n')
+
+class EventQueue:
+    """Min-heap of (timestamp, kind, sequence, payload).
+
+    Sources are time-ordered iterators; only the next event of each is in
+    the heap at any time, and it is replaced as soon as it is popped. Other
+    events (orders in flight) are pushed directly.
+    """
+
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._sources: Dict[int, Iterator] = {}
+
+    def add_source(self, kind: int, events: Iterable[NamedTuple]) -> None:
+        iterator = iter(events)
+        self._sources[kind] = iterator
+        self._refill(kind)
+
+    def _refill(self, kind: int) -> None:
+        event = next(self._sources[kind], None)
+        if event is not None:
+            heapq.heappush(self._heap,
+                           (event.timestamp, kind, next(self._sequence), event))
+
+    def push(self, timestamp: int, kind: int, payload: Any) -> None:
+        heapq.heappush(self._heap, (timestamp, kind, next(self._sequence), payload))
+
+    def pop(self) -> Tuple[int, int, Any]:
+        timestamp, kind, _, payload = heapq.heappop(self._heap)
+        if kind in self._sources:
+            self._refill(kind)
+        return timestamp, kind, payload
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+class LatencyModel:
+    """Delay between the event a strategy reacts to and its order reaching
+    the exchange: feed delay plus order round trip, with uniform jitter"""
+
+    def __init__(self,
+                 feed_ms: float = 0.0,
+                 order_ms: float = 50.0,
+                 jitter_ms: float = 0.0,
+                 seed: Optional[int] = None):
+        self.feed_ms = feed_ms
+        self.order_ms = order_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+
+    def delay(self) -> int:
+        jitter = 0.0
+        if self.jitter_ms:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(int(round(self.feed_ms + self.order_ms + jitter)), 0)
+
+class SlippageModel:
+    """Price adjustment for taker fills: fixed_bps against every fill, and
+    quantity beyond the visible depth filled beyond_book_bps past the last
+    level (or the last trade price when there is no book)"""
+
+    def __init__(self, fixed_bps: float = 0.0, beyond_book_bps: float = 10.0):
+        self.fixed_bps = fixed_bps
+        self.beyond_book_bps = beyond_book_bps
+
+    def adjust(self, price: float, side: str, bps: float) -> float:
+        return price * (1 + bps / 10000) if side == 'BUY' else price * (1 - bps / 10000)
+
+class BookMatchingEngine(MatchingEngine):
+    """MatchingEngine that fills from a replayed order book in simulated
+    time. Positions and balance are accounted as in the simulator.
+
+    Triggers (stop and take-profit prices, resting limits) are indexed in
+    a rising and a falling heap, as in StopEngine, so each trade only looks
+    at the triggers it crossed. Cancelled or expired orders are skipped
+    lazily. Taker orders only take the quantity they can execute, so a
+    closing order with nothing to close expires without consuming depth.
+    """
+
+    def __init__(self,
+                 symbol: str,
+                 initial_balance: float,
+                 slippage: SlippageModel,
+                 taker_fee: float = 0.0,
+                 maker_fee: float = 0.0):
+        super().__init__(SimulatorConfig(initial_balance=initial_balance,
+                                         prices={symbol: 0.0}))
+        self.symbol = symbol
+        self.slippage = slippage
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.now = 0
+        self.last_price: Optional[float] = None
+        self.fees = 0.0
+        self._bids: List[List[float]] = []
+        self._asks: List[List[float]] = []
+        self._rising: List[tuple] = []
+        self._falling: List[tuple] = []
+        self._listeners: List[Callable[[Fill], None]] = []
+        self._expiry_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    def subscribe(self,
+                  callback: Callable[[Fill], None],
+                  expired: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        """Call callback with every fill, and expired (if given) with a
+        copy of every order that expired unfilled"""
+        self._listeners.append(callback)
+        if expired is not None:
+            self._expiry_listeners.append(expired)
+
+    def on_depth(self, snapshot: DepthSnapshot) -> None:
+        self._bids = [[p, q] for p, q in snapshot.bids]
+        self._asks = [[p, q] for p, q in snapshot.asks]
+
+    def on_trade(self, tick: TradeTick) -> None:
+        price = tick.price
+        self.last_price = price
+        self.marks[self.symbol] = price
+        # Liquidity the print went through is gone until the next snapshot
+        asks, bids = self._asks, self._bids
+        while asks and asks[0][0] < price:
+            asks.pop(0)
+        while bids and bids[0][0] > price:
+            bids.pop(0)
+
+        while self._rising and self._rising[0][0] <= price:
+            self._trigger(heapq.heappop(self._rising)[1])
+        while self._falling and -self._falling[0][0] >= price:
+            self._trigger(heapq.heappop(self._falling)[1])
+
+    def _trigger(self, order_id: int) -> None:
+        order = self.orders.get(order_id)
+        if order is None or order['status'] != 'NEW':
+            return
+        if order['type'] == 'LIMIT':
+            self._execute(order, order['price'], self.maker_fee)
+        else:
+            self._execute_taker(order)
+
+    def _execute_taker(self,
+                       order: Dict[str, Any],
+                       limit: Optional[float] = None) -> None:
+        """Fill order from the book, taking only the quantity it can execute"""
+        quantity = self._fill_quantity(order)
+        price = self._take(order['side'], quantity, limit) if quantity else 0.0
+        self._execute(order, price, self.taker_fee)
+
+    def _take(self, side: str, quantity: float, limit: Optional[float] = None) -> float:
+        """Average price for taking quantity from the book, consuming it.
+        With limit, levels past it are not taken and the rest is priced at
+        the limit"""
+        levels = self._asks if side == 'BUY' else self._bids
+        remaining = quantity
+        cost = 0.0
+        last = self.last_price
+        while remaining > 0 and levels:
+            price, available = levels[0]
+            if limit is not None and (price > limit if side == 'BUY'
+                                      else price < limit):
+                break
+            taken = min(available, remaining)
+            cost += taken * price
+            remaining -= taken
+            last = price
+            if taken == available:
+                levels.pop(0)
+            else:
+                levels[0][1] = available - taken
+        if remaining > 0:
+            if limit is not None:
+                beyond = limit
+            elif last is None:
+                raise ValueError(f'No price for {self.symbol} yet')
+            else:
+                beyond = self.slippage.adjust(last, side, self.slippage.beyond_book_bps)
+            cost += remaining * beyond
+        return self.slippage.adjust(cost / quantity, side, self.slippage.fixed_bps)
+
+    def _execute(self, order: Dict[str, Any], price: float, fee_rate: float) -> None:
+        self._fill(order, price)
+        order['updateTime'] = self.now
+        if order['status'] == 'EXPIRED':
+            for callback in self._expiry_listeners:
+                callback(dict(order))
+        if order['status'] != 'FILLED':
+            return
+        fee = order['executedQty'] * price * fee_rate
+        self.balance -= fee
+        self.fees += fee
+        fill = Fill(self.now, order['orderId'], order['side'], order['positionSide'],
+                    order['type'], order['executedQty'], price, fee)
+        for callback in self._listeners:
+            callback(fill)
+
+    def _index(self, order: Dict[str, Any]) -> None:
+        """Queue a resting order under the price that fills or triggers it"""
+        side, kind = order['side'], order['type']
+        if kind == 'LIMIT':
+            # Fills once a trade prints through the limit
+            rising = side == 'SELL'
+            direction = math.inf if rising else -math.inf
+            threshold = math.nextafter(order['price'], direction)
+        else:
+            threshold = order['stopPrice']
+            rising = (side == 'BUY') == (kind == 'STOP_MARKET')
+        if rising:
+            heapq.heappush(self._rising, (threshold, order['orderId']))
+        else:
+            heapq.heappush(self._falling, (-threshold, order['orderId']))
+
+    def arrive(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """An order reaching the exchange at self.now"""
+        order_type = params['type']
+        if order_type not in ('MARKET', 'LIMIT', 'STOP_MARKET', 'TAKE_PROFIT_MARKET'):
+            raise ValueError(f'Unsupported order type {order_type}')
+        order_id = params['orderId']
+        order = {
+            'orderId': order_id,
+            'clientOrderId': f'sim-{order_id}',
+            'symbol': self.symbol,
+            'side': params['side'],
+            'type': order_type,
+            'positionSide': params.get('positionSide', 'BOTH'),
+            'origQty': float(params['quantity']),
+            'executedQty': 0.0,
+            'price': float(params.get('price') or 0),
+            'stopPrice': float(params.get('stopPrice') or 0),
+            'avgPrice': 0.0,
+            'reduceOnly': order_type in ('STOP_MARKET', 'TAKE_PROFIT_MARKET'),
+            'status': 'NEW',
+            'updateTime': self.now
+        }
+        self.orders[order_id] = order
+        self.order_count += 1
+
+        if params.get('cancelled'):
+            order['status'] = 'CANCELED'
+        elif order_type == 'MARKET':
+            self._execute_taker(order)
+        elif order_type == 'LIMIT':
+            best = self._asks if order['side'] == 'BUY' else self._bids
+            if order['side'] == 'BUY':
+                marketable = best and best[0][0] <= order['price']
+            else:
+                marketable = best and best[0][0] >= order['price']
+            if marketable:
+                self._execute_taker(order, order['price'])
+            else:
+                self._index(order)
+        elif self.last_price is not None and self._crossed(order, self.last_price):
+            # Already past its stop: triggers straight away
+            self._trigger(order_id)
+        else:
+            self._index(order)
+        return dict(order)
+
+    def equity(self) -> float:
+        """Balance plus unrealised PnL at the last trade price"""
+        if self.last_price is None:
+            return self.balance
+        return self.balance + sum((self.last_price - p['entry_price']) * p['amount']
+                                  for p in self.positions.values())
+
+class TickExchange:
+    """What a strategy sees: the current time and prices, its position, and
+    order entry that goes through the latency model"""
+
+    def __init__(self,
+                 engine: BookMatchingEngine,
+                 queue: EventQueue,
+                 latency: LatencyModel):
+        self.engine = engine
+        self._queue = queue
+        self._latency = latency
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Dict[str, Any]] = {}
+
+    @property
+    def now(self) -> int:
+        return self.engine.now
+
+    @property
+    def last_price(self) -> Optional[float]:
+        return self.engine.last_price
+
+    @property
+    def balance(self) -> float:
+        return self.engine.balance
+
+    def position(self, position_side: str = 'BOTH') -> float:
+        """Signed position amount"""
+        position = self.engine.positions.get((self.engine.symbol, position_side))
+        return position['amount'] if position else 0.0
+
+    def place_order(self,
+                    side: str,
+                    order_type: str,
+                    quantity: float,
+                    price: Optional[float] = None,
+                    stop_price: Optional[float] = None,
+                    position_side: str = 'BOTH') -> int:
+        """Send an order; it reaches the matching engine after the latency
+        delay. Returns its order ID"""
+        order_id = next(self._ids)
+        params = {'orderId': order_id, 'side': side, 'type': order_type,
+                  'quantity': quantity, 'price': price, 'stopPrice': stop_price,
+                  'positionSide': position_side}
+        self._pending[order_id] = params
+        self._queue.push(self.now + self._latency.delay(), ORDER, params)
+        return order_id
+
+    def cancel_order(self, order_id: int) -> None:
+        """Cancel an order, in flight or resting. Cancels are assumed to
+        take effect immediately"""
+        params = self._pending.get(order_id)
+        if params is not None:
+            params['cancelled'] = True
+            return
+        order = self.engine.orders.get(order_id)
+        if order is not None and order['status'] == 'NEW':
+            order['status'] = 'CANCELED'
+
+    def place_bracket(self,
+                      side: str,
+                      quantity: float,
+                      stop_loss_percent: float,
+                      take_profit_percent: float) -> Dict[str, Any]:
+        """Market entry with STOP_MARKET and TAKE_PROFIT_MARKET legs, priced
+        from the last trade as TradingBot.place_leveraged_trade prices them
+        from the mark. All three legs are sent at once"""
+        entry_side, stop_loss, take_profit = calculate_bracket_prices(
+            self.last_price, side, stop_loss_percent, take_profit_percent)
+        exit_side = 'SELL' if side == 'LONG' else 'BUY'
+        return {
+            'entry': self.place_order(entry_side, 'MARKET', quantity,
+                                      position_side=side),
+            'stop_loss': self.place_order(exit_side, 'STOP_MARKET', quantity,
+                                          stop_price=stop_loss, position_side=side),
+            'take_profit': self.place_order(exit_side, 'TAKE_PROFIT_MARKET', quantity,
+                                            stop_price=take_profit, position_side=side),
+            'stop_price': stop_loss,
+            'take_profit_price': take_profit
+        }
+
+    def arrived(self, params: Dict[str, Any]) -> None:
+        """Hand an order that finished its delay to the engine"""
+        self._pending.pop(params['orderId'], None)
+        self.engine.arrive(params)
+
+class TickStrategy:
+    """Base class for strategies driven by replayed events"""
+
+    def on_trade(self, tick: TradeTick, exchange: TickExchange) -> None:
+        pass
+
+    def on_depth(self, snapshot: DepthSnapshot, exchange: TickExchange) -> None:
+        pass
+
+    def on_fill(self, fill: Fill, exchange: TickExchange) -> None:
+        pass
+
+    def on_expired(self, order: Dict[str, Any], exchange: TickExchange) -> None:
+        """order expired unfilled, e.g. a closing leg with no position"""
+        pass
+
+class SignalBracketStrategy(TickStrategy):
+    """The Backtester's crossover strategy at tick level: trades are rolled
+    into bar_ms bars, each closed bar feeds a CrossoverSignal, and a signal
+    while flat opens a bracket sized like Backtester.simulate_trades"""
+
+    def __init__(self,
+                 bar_ms: int = 60_000,
+                 stop_loss_percent: float = 2.0,
+                 take_profit_percent: float = 6.0,
+                 risk_per_trade: float = 0.02,
+                 leverage: Optional[float] = None,
+                 **signal_params):
+        self.bar_ms = bar_ms
+        self.stop_loss_percent = stop_loss_percent
+        self.take_profit_percent = take_profit_percent
+        self.risk_per_trade = risk_per_trade
+        self.leverage = leverage
+        self.signal = CrossoverSignal(**signal_params)
+        self.brackets: List[Dict[str, Any]] = []
+        self._bar: Optional[int] = None
+        self._close: Optional[float] = None
+        self._active: Optional[Dict[str, Any]] = None
+
+    def on_trade(self, tick: TradeTick, exchange: TickExchange) -> None:
+        bar = tick.timestamp - tick.timestamp % self.bar_ms
+        if self._bar is not None and bar != self._bar:
+            self._on_bar(self._close, exchange)
+        self._bar = bar
+        self._close = tick.price
+
+    def _on_bar(self, close: float, exchange: TickExchange) -> None:
+        signal = self.signal.update(close)
+        if not signal or self._active is not None:
+            return
+        side = 'LONG' if signal > 0 else 'SHORT'
+        stop_distance = exchange.last_price * self.stop_loss_percent / 100
+        quantity = exchange.balance * self.risk_per_trade / stop_distance
+        if self.leverage is not None:
+            cap = exchange.balance * self.leverage / exchange.last_price
+            quantity = min(quantity, cap)
+        self._active = exchange.place_bracket(side, quantity, self.stop_loss_percent,
+                                              self.take_profit_percent)
+        self._active['side'] = side
+        self.brackets.append(self._active)
+
+    def on_fill(self, fill: Fill, exchange: TickExchange) -> None:
+        active = self._active
+        if active is None or fill.order_id == active['entry']:
+            return
+        if fill.order_id in (active['stop_loss'], active['take_profit']):
+            # One leg closed the position; pull the other
+            if fill.order_id == active['stop_loss']:
+                exchange.cancel_order(active['take_profit'])
+            else:
+                exchange.cancel_order(active['stop_loss'])
+            active['exit'] = fill
+            self._active = None
+
+    def on_expired(self, order: Dict[str, Any], exchange: TickExchange) -> None:
+        active = self._active
+        if active is None:
+            return
+        if order['orderId'] in (active['stop_loss'], active['take_profit']):
+            # A leg arrived already crossed before the entry filled: the
+            # price is past the bracket, so abandon it
+            for leg in ('entry', 'stop_loss', 'take_profit'):
+                exchange.cancel_order(active[leg])
+            active['expired'] = order['orderId']
+            self._active = None
+
+class TickBacktest:
+    """Replay one symbol's recorded trades (and optionally depth) through a
+    strategy and the book matching engine"""
+
+    def __init__(self,
+                 symbol: str,
+                 trades: Iterable[TradeTick],
+                 strategy: TickStrategy,
+                 depth: Optional[Iterable[DepthSnapshot]] = None,
+                 latency: Optional[LatencyModel] = None,
+                 slippage: Optional[SlippageModel] = None,
+                 initial_balance: float = 1000.0,
+                 taker_fee: float = 0.0,
+                 maker_fee: float = 0.0,
+                 equity_interval_ms: int = 60_000):
+        """
+        Args:
+            trades: TradeTicks in time order, e.g. read_trades(path)
+            depth: DepthSnapshots in time order, e.g. read_depth(path)
+            latency: Order delay model (default 50ms, no jitter)
+            slippage: Taker price model (default: book walk only)
+            taker_fee: Fee rate on taker fills
+            maker_fee: Fee rate on resting limit fills
+            equity_interval_ms: Spacing of equity curve points
+        """
+        self.queue = EventQueue()
+        self.queue.add_source(TRADE, trades)
+        if depth is not None:
+            self.queue.add_source(DEPTH, depth)
+        self.engine = BookMatchingEngine(symbol, initial_balance,
+                                         slippage or SlippageModel(),
+                                         taker_fee, maker_fee)
+        self.exchange = TickExchange(self.engine, self.queue, latency or LatencyModel())
+        self.strategy = strategy
+        self.initial_balance = initial_balance
+        self.equity_interval_ms = equity_interval_ms
+        self.fills: List[Fill] = []
+        self.engine.subscribe(self._on_fill, self._on_expired)
+
+    def _on_fill(self, fill: Fill) -> None:
+        self.fills.append(fill)
+        self.strategy.on_fill(fill, self.exchange)
+
+    def _on_expired(self, order: Dict[str, Any]) -> None:
+        self.strategy.on_expired(order, self.exchange)
+
+    def run(self) -> Dict[str, Any]:
+        """Replay everything.
+
+        Returns:
+            Dict with fills, equity_curve, final_balance, final_equity,
+            total_return (%), fees and events processed
+        """
+        queue, engine = self.queue, self.engine
+        exchange, strategy = self.exchange, self.strategy
+        step = self.equity_interval_ms
+        equity_curve = []
+        next_point = None
+        events = 0
+        while queue:
+            timestamp, kind, payload = queue.pop()
+            events += 1
+            if next_point is not None and timestamp >= next_point:
+                equity_curve.append({'timestamp': next_point - step,
+                                     'equity': engine.equity()})
+                next_point = timestamp - timestamp % step + step
+            engine.now = timestamp
+            if kind == TRADE:
+                engine.on_trade(payload)
+                if next_point is None:
+                    next_point = timestamp - timestamp % step + step
+                strategy.on_trade(payload, exchange)
+            elif kind == DEPTH:
+                engine.on_depth(payload)
+                strategy.on_depth(payload, exchange)
+            else:
+                exchange.arrived(payload)
+        if next_point is not None:
+            equity_curve.append({'timestamp': next_point - step,
+                                 'equity': engine.equity()})
+
+        final_equity = engine.equity()
+        return {
+            'fills': self.fills,
+            'equity_curve': equity_curve,
+            'final_balance': engine.balance,
+            'final_equity': final_equity,
+            'total_return': ((final_equity - self.initial_balance)
+                             / self.initial_balance * 100),
+            'fees': engine.fees,
+            'events': events
+        }
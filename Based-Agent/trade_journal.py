@@ -0,0 +1,234 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+INSERT_EVENTS = ('INSERT INTO events (ts, trade_key, event, payload) '
+                 'VALUES (?, ?, ?, ?)')
+
+
+class TradeJournal:
+    """Crash-safe, append-only journal of trade lifecycle events.
+
+    Events ('opened', 'updated', 'closed') are appended to a SQLite database
+    in WAL mode. Writes are buffered and committed in batches, so one fsync
+    covers many events: a batch is flushed when it reaches batch_size or
+    flush_interval seconds after its first event, whichever comes first.
+    Every snapshot_every events the open trades are written to a snapshot
+    table and older events are deleted, so recovery reads the snapshot plus
+    a short tail, which is O(open trades) rather than O(history).
+
+    record() never touches the database: commits happen on a background
+    flush thread, so it is safe to call from a coroutine.
+
+    The journal mirrors the open trades in memory (open_trades), keyed the
+    same way as TradingBot.active_trades.
+    """
+
+    def __init__(self,
+                 path: str = 'trade_journal.db',
+                 batch_size: int = 64,
+                 flush_interval: float = 0.05,
+                 snapshot_every: int = 1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # FULL fsyncs each commit; batching keeps that to one fsync per batch
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                trade_key TEXT NOT NULL,
+                event TEXT NOT NULL,
+                payload TEXT
+            );
+            CREATE TABLE IF NOT EXISTS snapshot (
+                trade_key TEXT PRIMARY KEY,
+                state TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        ''')
+
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._events_since_snapshot = 0
+        self._closed = False
+        self._wakeup = threading.Event()
+        self._batch_full = threading.Event()
+
+        self.open_trades: Dict[str, Dict[str, Any]] = self._recover()
+
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def _recover(self) -> Dict[str, Dict[str, Any]]:
+        """Rebuild open trades from the snapshot plus the events after it"""
+        snapshot = self._conn.execute('SELECT trade_key, state FROM snapshot')
+        trades = {key: json.loads(state) for key, state in snapshot}
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'snapshot_seq'").fetchone()
+        snapshot_seq = int(row[0]) if row else 0
+        tail = self._conn.execute(
+            'SELECT trade_key, event, payload FROM events WHERE seq > ? ORDER BY seq',
+            (snapshot_seq,))
+        for key, event, payload in tail:
+            self._apply(trades, key, event, json.loads(payload) if payload else None)
+            self._events_since_snapshot += 1
+        return trades
+
+    @staticmethod
+    def _apply(trades: Dict[str, Dict[str, Any]],
+               key: str,
+               event: str,
+               payload: Optional[Dict]) -> None:
+        if event == 'opened':
+            trades[key] = payload
+        elif event == 'updated' and key in trades:
+            trades[key] = dict(trades[key], **(payload or {}))
+        elif event == 'closed':
+            trades.pop(key, None)
+
+    def record(self,
+               key: str,
+               event: str,
+               payload: Optional[Dict[str, Any]] = None) -> None:
+        """Append an event. Returns immediately; the write is committed with
+        the next batch"""
+        if self._closed:
+            raise ValueError('Trade journal is closed')
+        data = json.dumps(payload, default=str) if payload is not None else None
+        with self._lock:
+            # Round-trip through JSON so the mirror matches what recovery sees
+            mirrored = json.loads(data) if data else None
+            self._apply(self.open_trades, key, event, mirrored)
+            self._pending.append((time.time(), key, event, data))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            # Flush now rather than at the end of the interval
+            self._batch_full.set()
+        self._wakeup.set()
+
+    def record_open(self, key: str, trade: Dict[str, Any]) -> None:
+        self.record(key, 'opened', trade)
+
+    def record_update(self, key: str, changes: Dict[str, Any]) -> None:
+        self.record(key, 'updated', changes)
+
+    def record_close(self, key: str, details: Optional[Dict[str, Any]] = None) -> None:
+        self.record(key, 'closed', details)
+
+    def flush(self) -> None:
+        """Commit buffered events in one transaction (one fsync)"""
+        with self._db_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            with self._conn:
+                self._conn.execute('BEGIN')
+                self._conn.executemany(INSERT_EVENTS, batch)
+            self._events_since_snapshot += len(batch)
+        if self._events_since_snapshot >= self.snapshot_every:
+            self.compact()
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._closed:
+                break
+            # Let the batch fill up for at most flush_interval
+            self._batch_full.wait(self.flush_interval)
+            self._batch_full.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Trade journal flush failed: {str(e)}")
+
+    def compact(self) -> None:
+        """Snapshot the open trades and drop the events they summarise"""
+        with self._db_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                trades = dict(self.open_trades)
+            with self._conn:
+                self._conn.execute('BEGIN')
+                if batch:
+                    self._conn.executemany(INSERT_EVENTS, batch)
+                last_seq = self._conn.execute(
+                    'SELECT COALESCE(MAX(seq), 0) FROM events').fetchone()[0]
+                self._conn.execute('DELETE FROM snapshot')
+                self._conn.executemany(
+                    'INSERT INTO snapshot (trade_key, state) VALUES (?, ?)',
+                    [(key, json.dumps(state, default=str))
+                     for key, state in trades.items()])
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) "
+                                   "VALUES ('snapshot_seq', ?)", (str(last_seq),))
+                self._conn.execute('DELETE FROM events WHERE seq <= ?', (last_seq,))
+            self._events_since_snapshot = 0
+
+    def reconcile(self,
+                  open_orders: Union[List[Dict[str, Any]], Dict[str, Any]]) -> Dict:
+        """Compare journaled brackets with the exchange's open orders.
+
+        Takes a single bulk open-orders response (all symbols) instead of
+        querying each symbol. A trade whose stop loss and take profit orders
+        are both gone has been closed on the exchange (a leg triggered), and
+        is recorded as closed. A trade missing one leg is reported so the
+        caller can re-protect or close it.
+
+        Args:
+            open_orders: Open orders (a list, or a dict wrapping one in 'data')
+
+        Returns:
+            Dict with 'intact', 'closed' and 'missing_legs' trade keys
+        """
+        if isinstance(open_orders, dict):
+            open_orders = open_orders.get('data') or []
+        live = {str(order.get('orderId')) for order in open_orders}
+        result = {'intact': [], 'closed': [], 'missing_legs': {}}
+        for key, trade in list(self.open_trades.items()):
+            legs = {}
+            for leg in ('stop_loss_order', 'take_profit_order'):
+                order = trade.get(leg) or {}
+                if 'orderId' in order:
+                    legs[leg] = str(order['orderId']) in live
+            if not legs:
+                continue
+            if all(legs.values()):
+                result['intact'].append(key)
+            elif not any(legs.values()):
+                self.record_close(key, {'reason': 'reconciled'})
+                result['closed'].append(key)
+            else:
+                missing = [leg for leg, alive in legs.items() if not alive]
+                result['missing_legs'][key] = missing
+        return result
+
+    def close(self) -> None:
+        """Flush outstanding events and close the database"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._wakeup.set()
+        self._batch_full.set()
+        self._flusher.join(timeout=5)
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,179 @@
+import math
+import threading
+from statistics import NormalDist
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class CovarianceVaR:
+    """Parametric portfolio VaR from an exponentially weighted covariance
+    matrix of per-bar returns (RiskMetrics style, zero mean).
+
+    The covariance is updated in place once per bar. Alongside it the engine
+    keeps the signed notional exposure per symbol (w), the vector Σw and the
+    scalar w'Σw, so "VaR if I add this position" is answered in O(1):
+
+        w'Σw + 2·δ·(Σw)_i + δ²·Σ_ii
+
+    Exposure changes update Σw in O(n); each bar recomputes it exactly, so
+    rounding never accumulates.
+    """
+
+    def __init__(self,
+                 decay: float = 0.94,
+                 confidence: float = 0.99,
+                 horizon_bars: float = 1.0,
+                 min_observations: int = 20,
+                 capacity: int = 16):
+        """
+        Args:
+            decay: EWMA lambda; higher reacts more slowly
+            confidence: VaR confidence level
+            horizon_bars: VaR horizon in bars (scaled by its square root)
+            min_observations: Bars a symbol needs before its VaR is trusted
+            capacity: Initial number of symbol slots (grows as needed)
+        """
+        self.decay = decay
+        self.confidence = confidence
+        self.horizon_bars = horizon_bars
+        self.min_observations = min_observations
+        self._z = NormalDist().inv_cdf(confidence) * math.sqrt(horizon_bars)
+
+        self.symbols: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._cov = np.zeros((capacity, capacity))
+        self._exposure = np.zeros(capacity)
+        self._cov_w = np.zeros(capacity)
+        self._variance = 0.0
+        self._observations = np.zeros(capacity, dtype=np.int64)
+        self._last_prices: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, symbol: str) -> int:
+        """Index of symbol, adding (and growing the arrays) if new. Caller
+        holds the lock"""
+        index = self._index.get(symbol)
+        if index is not None:
+            return index
+        index = len(self.symbols)
+        if index == len(self._exposure):
+            size = 2 * index
+            cov = np.zeros((size, size))
+            cov[:index, :index] = self._cov
+            self._cov = cov
+            for name in ('_exposure', '_cov_w', '_observations'):
+                old = getattr(self, name)
+                grown = np.zeros(size, dtype=old.dtype)
+                grown[:index] = old
+                setattr(self, name, grown)
+        self.symbols.append(symbol)
+        self._index[symbol] = index
+        return index
+
+    def update_returns(self, returns: Dict[str, float]) -> None:
+        """Fold in one bar of returns. Known symbols missing from the bar
+        count as an unchanged price"""
+        with self._lock:
+            for symbol in returns:
+                self._slot(symbol)
+            n = len(self.symbols)
+            r = np.zeros(n)
+            for symbol, value in returns.items():
+                r[self._index[symbol]] = value
+                self._observations[self._index[symbol]] += 1
+
+            cov = self._cov[:n, :n]
+            cov *= self.decay
+            cov += (1 - self.decay) * np.outer(r, r)
+            self._cov_w[:n] = cov @ self._exposure[:n]
+            self._variance = float(self._exposure[:n] @ self._cov_w[:n])
+
+    def update_prices(self, prices: Dict[str, float]) -> None:
+        """Fold in one bar of closing prices as log returns"""
+        returns = {}
+        for symbol, price in prices.items():
+            last = self._last_prices.get(symbol)
+            if last:
+                returns[symbol] = math.log(price / last)
+            self._last_prices[symbol] = price
+        if returns:
+            self.update_returns(returns)
+
+    def add_exposure(self, symbol: str, delta: float) -> None:
+        """Change a symbol's signed notional (long positive)"""
+        with self._lock:
+            i = self._slot(symbol)
+            n = len(self.symbols)
+            column = self._cov[:n, i]
+            self._variance += 2 * delta * self._cov_w[i] + delta * delta * column[i]
+            self._cov_w[:n] += delta * column
+            self._exposure[i] += delta
+
+    def set_exposure(self, symbol: str, notional: float) -> None:
+        self.add_exposure(symbol, notional - self.exposure(symbol))
+
+    def exposure(self, symbol: str) -> float:
+        index = self._index.get(symbol)
+        return float(self._exposure[index]) if index is not None else 0.0
+
+    def ready(self, symbol: str) -> bool:
+        """Whether the symbol has enough history for its VaR to mean anything"""
+        index = self._index.get(symbol)
+        return index is not None and self._observations[index] >= self.min_observations
+
+    def portfolio_var(self) -> float:
+        """VaR of the current exposure, in the same units as the notional"""
+        return self._z * math.sqrt(max(self._variance, 0.0))
+
+    def var_with(self, symbol: str, delta: float) -> float:
+        """Portfolio VaR if symbol's signed notional changed by delta"""
+        index = self._index.get(symbol)
+        if index is None:
+            # No history: no variance to add yet
+            return self.portfolio_var()
+        with self._lock:
+            variance = (self._variance + 2 * delta * self._cov_w[index] +
+                        delta * delta * self._cov[index, index])
+        return self._z * math.sqrt(max(variance, 0.0))
+
+    def vars_with(self, symbols: Sequence[str], deltas: np.ndarray) -> np.ndarray:
+        """var_with for many (symbol, delta) pairs at once"""
+        deltas = np.asarray(deltas, dtype=np.float64)
+        names, inverse = np.unique(np.asarray(symbols), return_inverse=True)
+        with self._lock:
+            index = np.array([self._index.get(name, -1) for name in names],
+                             dtype=np.int64)[inverse.ravel()]
+            known = index >= 0
+            index = np.where(known, index, 0)
+            # Unknown symbols have no variance to add yet
+            cov_w = np.where(known, self._cov_w[index], 0.0)
+            cov_ii = np.where(known, self._cov[index, index], 0.0)
+            variance = self._variance + 2 * deltas * cov_w + deltas * deltas * cov_ii
+        return self._z * np.sqrt(np.maximum(variance, 0.0))
+
+    def incremental_var(self, symbol: str, delta: float) -> float:
+        """Change in portfolio VaR from adding delta of symbol"""
+        return self.var_with(symbol, delta) - self.portfolio_var()
+
+    def volatility(self, symbol: str) -> Optional[float]:
+        """Per-bar return volatility"""
+        index = self._index.get(symbol)
+        return math.sqrt(self._cov[index, index]) if index is not None else None
+
+    def correlation(self, a: str, b: str) -> Optional[float]:
+        i, j = self._index.get(a), self._index.get(b)
+        if i is None or j is None:
+            return None
+        denominator = math.sqrt(self._cov[i, i] * self._cov[j, j])
+        return float(self._cov[i, j] / denominator) if denominator else None
+
+    def correlation_matrix(self) -> Tuple[List[str], np.ndarray]:
+        """Symbols and their correlation matrix"""
+        with self._lock:
+            n = len(self.symbols)
+            cov = self._cov[:n, :n].copy()
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+        return list(self.symbols), np.nan_to_num(corr)
@@ -1,32 +1,45 @@
-import { backtest_strategy } from '../../../../Based-Agent/backtester';
+import { submit_backtest, backtest_job, cancel_backtest } from '../../../../Based-Agent/backtest_service';
 
 export default async function handler(req, res) {
-  if (req.method !== 'POST') {
-    return res.status(405).json({ message: 'Method not allowed' });
-  }
-
   try {
-    const config = req.body;
-    
-    // Validate required fields
-    const requiredFields = ['startDate', 'endDate', 'initialBalance', 'pairs'];
-    for (const field of requiredFields) {
-      if (!config[field]) {
-        return res.status(400).json({
-          status: 'error',
-          message: `Missing required field: ${field}`
-        });
+    if (req.method === 'POST') {
+      const config = req.body;
+
+      // Validate required fields
+      const requiredFields = ['startDate', 'endDate', 'initialBalance', 'pairs'];
+      for (const field of requiredFields) {
+        if (!config[field]) {
+          return res.status(400).json({
+            status: 'error',
+            message: `Missing required field: ${field}`
+          });
+        }
+      }
+
+      // Queue the backtest; cached configs come back finished
+      const job = await submit_backtest(config);
+
+      if (job.status === 'error') {
+        return res.status(503).json(job);
       }
+
+      return res.status(job.status === 'accepted' ? 202 : 200).json(job);
     }
 
-    // Run backtest
-    const results = await backtest_strategy(config);
+    if (req.method === 'GET') {
+      // Progress, new events since `since`, and results once done
+      const { jobId, since = 0 } = req.query;
+      const job = await backtest_job(jobId, Number(since));
+      return res.status(job.status === 'error' && !job.jobId ? 404 : 200).json(job);
+    }
 
-    if (results.status === 'error') {
-      return res.status(500).json(results);
+    if (req.method === 'DELETE') {
+      const { jobId } = req.query;
+      const result = await cancel_backtest(jobId);
+      return res.status(result.status === 'error' ? 404 : 200).json(result);
     }
 
-    return res.status(200).json(results);
+    return res.status(405).json({ message: 'Method not allowed' });
   } catch (error) {
     console.error('Backtest error:', error);
     return res.status(500).json({
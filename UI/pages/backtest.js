@@ -11,6 +11,7 @@ export default function Backtest() {
     leverageRange: [1, 10],
     pairs: [],
     signalPatterns: [],
+    monteCarlo: true,
     running: false,
     results: null
   });
@@ -25,7 +26,7 @@ export default function Backtest() {
 
   const runBacktest = async () => {
     try {
-      setBacktest({ ...backtest, running: true });
+      setBacktest({ ...backtest, running: true, progress: 0 });
       const response = await fetch('/api/bot/backtest', {
         method: 'POST',
         headers: {
@@ -33,16 +34,30 @@ export default function Backtest() {
         },
         body: JSON.stringify(backtest)
       });
-      
-      const results = await response.json();
+
+      let job = await response.json();
+      let since = 0;
+
+      // Poll the job until it finishes, showing progress as pairs complete
+      while (job.status === 'accepted' || job.status === 'queued' || job.status === 'running') {
+        const poll = await fetch(`/api/bot/backtest?jobId=${job.jobId}&since=${since}`);
+        job = { ...(await poll.json()), jobId: job.jobId };
+        since = job.next ?? since;
+        if (job.status === 'queued' || job.status === 'running') {
+          setBacktest((current) => ({ ...current, progress: job.progress }));
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+        }
+      }
+
       setBacktest({
         ...backtest,
         running: false,
-        results
+        progress: null,
+        results: job.results || null
       });
     } catch (error) {
       console.error('Backtest error:', error);
-      setBacktest({ ...backtest, running: false });
+      setBacktest({ ...backtest, running: false, progress: null });
     }
   };
 
@@ -128,7 +143,9 @@ export default function Backtest() {
                   disabled={backtest.running}
                   className="w-full bg-blue-500 hover:bg-blue-600 text-white p-3 rounded font-medium disabled:opacity-50"
                 >
-                  {backtest.running ? 'Running...' : 'Start Backtest'}
+                  {backtest.running
+                    ? `Running... ${Math.round((backtest.progress || 0) * 100)}%`
+                    : 'Start Backtest'}
                 </button>
               </div>
             </CardContent>
@@ -156,6 +173,26 @@ export default function Backtest() {
                     </div>
                   </div>
 
+                  {/* Monte Carlo Robustness */}
+                  {backtest.results.monteCarlo && (
+                    <div className="grid grid-cols-3 gap-4">
+                      <div className="p-4 bg-gray-50 rounded">
+                        <p className="text-sm text-gray-500">Risk of Ruin</p>
+                        <p className="text-2xl font-bold">{backtest.results.monteCarlo.bootstrap.risk_of_ruin.toFixed(1)}%</p>
+                      </div>
+                      <div className="p-4 bg-gray-50 rounded">
+                        <p className="text-sm text-gray-500">Final Equity (5th-95th pct)</p>
+                        <p className="text-lg font-bold">
+                          {backtest.results.monteCarlo.bootstrap.final_equity.p5.toFixed(0)} - {backtest.results.monteCarlo.bootstrap.final_equity.p95.toFixed(0)}
+                        </p>
+                      </div>
+                      <div className="p-4 bg-gray-50 rounded">
+                        <p className="text-sm text-gray-500">Max Drawdown (95th pct)</p>
+                        <p className="text-2xl font-bold">{backtest.results.monteCarlo.shuffle.max_drawdown.p95.toFixed(1)}%</p>
+                      </div>
+                    </div>
+                  )}
+
                   {/* Performance Chart */}
                   <RealTimeChart data={backtest.results.equityCurve} />
 